@@ -1,15 +1,26 @@
 import sys
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import streamlit as st
 from dotenv import load_dotenv
 
 # --- SYSTEM INITIALIZATION ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from utils.jikan_client import get_sync_client
+from utils.metrics import start_metrics_server
+from utils.index_versions import IndexVersions
+from utils.pipeline_holder import PipelineHolder
+from config.config import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, POSTER_FETCH_WORKERS, STREAMLIT_METRICS_PORT
+
+# Streamlit has no API of its own; Prometheus scrapes a side port when configured
+start_metrics_server(STREAMLIT_METRICS_PORT)
+
 # Defensive Import Pattern for Production
 try:
     from pipeline.pipeline import AnimeRecommendationPipeline
+    from src.recommendation_cache import RecommendationCache
     PIPELINE_AVAILABLE = True
 except Exception as e:
     st.error(f"Critical System Failure: Could not load Recommendation Pipeline. {e}")
@@ -17,11 +28,22 @@ except Exception as e:
 
 # ... [Other code] ...
 
+def build_pipeline(index_version):
+    return AnimeRecommendationPipeline(index_paths=IndexVersions().paths(index_version) if index_version else None)
+
 @st.cache_resource
-def init_pipeline():
+def pipeline_holder():
+    # One pipeline per process; moving to a new index version closes the previous one
+    return PipelineHolder(load=build_pipeline)
+
+def load_pipeline(index_version):
     if not PIPELINE_AVAILABLE:
         st.stop() # Prevents NameError by halting execution gracefully
-    return AnimeRecommendationPipeline()
+    return pipeline_holder().get(index_version)
+
+def live_index_version():
+    # A build flips INDEX_ROOT/CURRENT; the next rerun loads that version
+    return IndexVersions().current()
 
 
 # --- 1. PAGE ARCHITECTURE ---
@@ -234,71 +256,44 @@ st.markdown("""
 load_dotenv()
 
 @st.cache_resource
-def init_pipeline():
-    return AnimeRecommendationPipeline()
+def poster_pool():
+    # Shared across sessions; the Jikan client's rate limiter still paces the calls
+    return ThreadPoolExecutor(max_workers=POSTER_FETCH_WORKERS, thread_name_prefix="poster")
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def get_recommendation(query_key, index_version, _user_query):
+    """
+    One LLM call per distinct normalized query and index version, shared by every
+    rerun and session. Only `query_key` is hashed (Streamlit skips `_` params);
+    the LLM gets the user's own wording.
+    """
+    # Held for the call, so a version switch in another session cannot close it underneath
+    with pipeline_holder().use(index_version) as pipeline:
+        titles, explanations = pipeline.parse(pipeline.recommend(_user_query))
+    if not titles or not explanations:
+        # Raising keeps a malformed answer out of the cache
+        raise ValueError("Pipeline returned malformed output format.")
+    return titles, explanations
 
-@st.cache_data(ttl=3600)
 def fetch_api_data(title):
     try:
-        url = f"https://api.jikan.moe/v4/anime?q={title}&limit=1"
-        res = requests.get(url, timeout=10).json()
-        if 'data' in res and len(res['data']) > 0:
-            anime = res['data'][0]
-            return {
-                "image": anime['images']['jpg']['large_image_url'],
-                "score": anime.get('score', 'N/A'),
-                "url": anime['url'],
-                "title": anime['title_english'] or anime['title']
-            }
+        # Shared pooled client with the persistent SQLite metadata cache
+        return get_sync_client().search_anime(title)
     except Exception:
         return None
 
-# --- UPDATED RECOMMENDATION ROUTE ---
-if st.session_state.active_page == "recommend":
-    pipeline = init_pipeline()
-    user_query = st.text_input("", placeholder="Enter your vibe (e.g., 'Dark psychological thriller like Death Note')...")
-
-    if user_query:
-        with st.status("✨ Shifting through the archives...", expanded=True) as status:
-            # Generate response
-            raw_out = pipeline.recommend(user_query)
-            status.update(label="✅ Matches Found!", state="complete", expanded=False)
-            
-            # ROBUST PARSING ENGINE
-            try:
-                parts = raw_out.split('\n', 1)
-                title_line = parts[0]
-                titles = [t.strip() for t in title_line.split(',')]
-                
-                analysis_body = parts[1] if len(parts) > 1 else ""
-                explanations = [e.strip() for e in analysis_body.split('|||') if e.strip()]
-                
-                st.divider()
-                st.markdown("## ✨ Personalized Matches")
-                
-                # Render Poster Grid
-                res_grid = st.columns(3)
-                for i, title in enumerate(titles[:3]):
-                    meta = fetch_api_data(title)
-                    with res_grid[i]:
-                        if meta:
-                            st.image(meta['image'], use_container_width=True)
-                            st.markdown(f"#### {meta['title']}")
-                            st.markdown(f"**⭐ Score: {meta['score']}**")
-                            st.link_button("View on MAL", meta['url'], use_container_width=True)
-
-                # STREAMING NARRATIVE CONNECTION
-                st.markdown("### 📝 The Narrative Connection")
-                for exp in explanations:
-                    with st.container():
-                        st.markdown('<div class="rec-item-container">', unsafe_allow_html=True)
-                        # Types the explanation out chunk by chunk
-                        st.write_stream(iter(exp.split(' '))) 
-                        st.markdown('</div>', unsafe_allow_html=True)
-            
-            except Exception as e:
-                st.error("The Connoisseur is having trouble describing these. Please try a different vibe!")
-                st.debug(f"Parsing error: {e}")
+def render_poster(title, meta):
+    if meta:
+        if meta.get('image'):
+            st.image(meta['image'], use_container_width=True)
+        else:
+            # Offline metadata (METADATA_OFFLINE) comes from the title index and has no poster
+            st.caption("🖼️ Poster unavailable")
+        st.markdown(f"#### {meta['title']}")
+        st.markdown(f"**⭐ Score: {meta['score']}**")
+        st.link_button("View on MAL", meta['url'], use_container_width=True)
+    else:
+        st.info(f"Details for '{title}' not found.")
 
 # --- 4. HEADER & NAV DOCK ---
 st.markdown("<h1 class='main-title'>AI Anime Explorer</h1>", unsafe_allow_html=True)
@@ -326,58 +321,53 @@ with nav_c5:
 
 # ROUTE: RECOMMENDATION PAGE (Primary RAG Interface)
 if st.session_state.active_page == "recommend":
-    pipeline = init_pipeline()
+    index_version = live_index_version()
+    load_pipeline(index_version)
     user_query = st.text_input("", placeholder="Describe your vibe (e.g., 'A rainy day in a futuristic Tokyo')")
 
     if user_query:
+        query_key = RecommendationCache.normalize(user_query)
+
         # Using st.status for better observability of the background process
         with st.status("🔍 Analyzing Vibe & Querying Vector DB...", expanded=True) as status:
-            raw_out = pipeline.recommend(user_query)
-            
-            # STAGE 1: Data Normalization & Robust Parsing
             try:
-                # Splitting the initial title line from the analytical body
-                parts = raw_out.split('\n', 1)
-                title_line = parts[0]
-                
-                # Handling the body split using the Master Delimiter '|||'
-                # We filter out empty strings to prevent rendering empty cards
-                analysis_body = parts[1] if len(parts) > 1 else ""
-                titles = [t.strip() for t in title_line.split(',')]
-                explanations = [e.strip() for e in analysis_body.split('|||') if e.strip()]
-                
+                # Title line + '|||'-delimited analysis sections, cached per query
+                titles, explanations = get_recommendation(query_key, index_version, user_query)
                 status.update(label="✅ Analysis Complete!", state="complete", expanded=False)
-
-                st.divider()
-                st.markdown("## ✨ Personalized Matches")
-                
-                # --- Poster Grid (Visual Identification) ---
-                res_grid = st.columns(3)
-                for i, title in enumerate(titles[:3]):
-                    meta = fetch_api_data(title)
-                    with res_grid[i]:
-                        if meta:
-                            st.image(meta['image'], use_container_width=True)
-                            st.markdown(f"#### {meta['title']}")
-                            st.markdown(f"**⭐ Score: {meta['score']}**")
-                            st.link_button("View on MAL", meta['url'], use_container_width=True)
-                        else:
-                            st.info(f"Details for '{title}' not found.")
-
-                # --- Enhanced Separation Rendering (Narrative Analysis) ---
-                st.markdown("### 📝 Detailed Narrative Connection")
-                for idx, exp in enumerate(explanations):
-                    # Each explanation is isolated in its own CSS container for clear distinction
-                    st.markdown(f"""
-                    <div class="rec-item-container">
-                        <div class="rec-label">Match Rank #{idx + 1}</div>
-                        <div class="rec-text">{exp}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            
             except Exception as e:
                 status.update(label="❌ Engine Error", state="error")
                 st.error(f"The Connoisseur is having trouble parsing this vibe. Error: {str(e)}")
+                titles = []
+
+        if titles:
+            st.divider()
+            st.markdown("## ✨ Personalized Matches")
+
+            # --- Poster Grid (Visual Identification) ---
+            # All lookups start at once; each card renders as soon as its own lookup returns
+            res_grid = st.columns(3)
+            slots = {}
+            for i, title in enumerate(titles[:3]):
+                with res_grid[i]:
+                    placeholder = st.empty()
+                placeholder.caption(f"Loading {title}…")
+                slots[poster_pool().submit(fetch_api_data, title)] = (placeholder, title)
+
+            # --- Enhanced Separation Rendering (Narrative Analysis) ---
+            st.markdown("### 📝 Detailed Narrative Connection")
+            for idx, exp in enumerate(explanations):
+                # Each explanation is isolated in its own CSS container for clear distinction
+                st.markdown(f"""
+                <div class="rec-item-container">
+                    <div class="rec-label">Match Rank #{idx + 1}</div>
+                    <div class="rec-text">{exp}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            for future in as_completed(slots):
+                placeholder, title = slots[future]
+                with placeholder.container():
+                    render_poster(title, future.result())
 
 # --- SECONDARY ROUTES (Placeholders for Expansion) ---
 
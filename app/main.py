@@ -1,19 +1,47 @@
+import gc
 import os
 import sys
+import json
 import logging
-import httpx  # Async HTTP client for better performance
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+import time
+from contextlib import AsyncExitStack
+from typing import List, Optional
+from fastapi import Depends, FastAPI, Request, HTTPException, Query
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
 from dotenv import load_dotenv
 
 # --- 1. SYSTEM INITIALIZATION ---
 # Ensures our modules in /src and /pipeline are discoverable
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Importing the core logic you built in the src/pipeline folders
-from pipeline.pipeline import AnimeRecommendationPipeline
+# Only light modules load at import time; the pipeline (LangChain, Chroma, torch)
+# is imported by the background startup loader so the port binds immediately
+from config.config import (
+    MAX_CONCURRENT_REQUESTS, MAX_QUEUE_SIZE, QUEUE_TIMEOUT_SECONDS,
+    METADATA_BATCH_DEADLINE_SECONDS, METADATA_BATCH_MAX_TITLES,
+    TOP_LISTS_REFRESH_SECONDS, TOP_LISTS_SNAPSHOT_DIR, INDEX_ROOT, INDEX_WATCH_SECONDS,
+    STARTUP_RETRY_SECONDS, STARTUP_MAX_RETRY_SECONDS, PRELOAD_PIPELINE,
+    REQUEST_DEADLINE_SECONDS, DEADLINE_SPLIT
+)
+from utils.admission import AdmissionController, QueueFullError, QueueTimeoutError
+from src.metadata_index import MetadataFilter, split_genres
+from src.output_parser import RecommendationStreamParser, retrieval_only_recommendation
+from src.title_resolver import load_title_resolver
+from src.knn_graph import KnnGraph
+from utils.jikan_client import JikanClient, get_metadata_cache
+from utils.top_lists import TopListSnapshot, fetch_top_anime, fetch_top_characters
+from utils.startup import StartupLoader
+from utils.deadline import Deadline, DeadlineExceeded, parse_split
+from utils.index_versions import IndexVersions
+from utils.index_reloader import IndexReloader
+from utils.metrics import (
+    ADMISSION_ACTIVE, HTTP_LATENCY, HTTP_REQUESTS, IN_FLIGHT, QUEUE_DEPTH,
+    gauge_function, observe_stage, render_metrics, start_gauge_refresher
+)
+from utils.memory_report import process_memory
 
 # Load environment variables (Groq API Keys, etc.)
 load_dotenv()
@@ -23,23 +51,209 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- 2. PIPELINE LIFECYCLE MANAGEMENT ---
-# We load the heavy AI models ONCE on startup using the lifespan pattern
+# Heavy AI models load ONCE, in the background; the instance is published only after warmup
 pipeline_instance = None
 
-async def lifespan(app: FastAPI):
+# Precomputed "more like this" neighbours; served without the pipeline or the LLM
+knn_graph = None
+
+# Admission control: bounded concurrency plus a bounded wait queue for /api/recommend
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_REQUESTS,
+    max_queue=MAX_QUEUE_SIZE,
+    queue_timeout=QUEUE_TIMEOUT_SECONDS
+)
+gauge_function(ADMISSION_ACTIVE, lambda: admission.active)
+gauge_function(QUEUE_DEPTH, lambda: admission.waiting)
+
+# Per-request time budget, split across retrieval / generation / metadata
+deadline_split = parse_split(DEADLINE_SPLIT)
+
+# One pooled, cached Jikan client shared by every metadata endpoint. Built in the lifespan:
+# its SQLite cache must be opened per process, never before a gunicorn fork
+jikan = None
+
+# Local Name -> MAL_ID index; may be loaded before the client exists (preload)
+title_resolver = None
+
+# Homepage rankings are served from background-refreshed snapshots, never live
+top_anime_snapshot = TopListSnapshot(
+    "top-anime", lambda: fetch_top_anime(jikan),
+    os.path.join(TOP_LISTS_SNAPSHOT_DIR, "top_anime.json"), TOP_LISTS_REFRESH_SECONDS
+)
+top_characters_snapshot = TopListSnapshot(
+    "top-characters", lambda: fetch_top_characters(jikan),
+    os.path.join(TOP_LISTS_SNAPSHOT_DIR, "top_characters.json"), TOP_LISTS_REFRESH_SECONDS
+)
+
+# Indexes are read from the version INDEX_ROOT/CURRENT points at (legacy flat dirs before the first one)
+index_versions = IndexVersions(INDEX_ROOT)
+
+def _open_knn_graph(graph_dir):
+    if not KnnGraph.exists(graph_dir):
+        logger.warning(f"No kNN graph in {graph_dir}; /api/similar is disabled until the next build.")
+        return None
+    graph = KnnGraph(graph_dir)
+    logger.info(f"kNN graph loaded for {len(graph)} titles.")
+    return graph
+
+# Startup phases, run in order by the background loader (a failed phase is retried)
+_loading = {}
+
+def _resolve_index_version():
+    _loading["paths"] = index_versions.resolve()
+    logger.info(f"Index version: {_loading['paths'].version or 'legacy'}")
+
+def _publish_title_resolver(resolver):
+    global title_resolver
+    title_resolver = resolver
+    if jikan is not None:
+        jikan.resolver = resolver
+
+def _load_title_index():
+    # Local Name -> MAL_ID index: metadata is fetched by id instead of fuzzy search
+    _publish_title_resolver(load_title_resolver(_loading["paths"].title_index_path))
+
+def _load_knn_graph():
+    global knn_graph
+    knn_graph = _open_knn_graph(_loading["paths"].knn_graph_dir)
+
+def _import_pipeline():
+    from pipeline.pipeline import AnimeRecommendationPipeline
+    _loading["pipeline_class"] = AnimeRecommendationPipeline
+
+def _load_pipeline():
+    _loading["pipeline"] = _loading["pipeline_class"](index_paths=_loading["paths"])
+
+def _warmup_pipeline():
     global pipeline_instance
-    logger.info("🚀 Initializing AI Recommendation Pipeline...")
+    _loading["pipeline"].warmup()
+    pipeline_instance = _loading.pop("pipeline")
+    logger.info("✅ Pipeline loaded and warmed up.")
+    # Started here, after any fork: from now on new index versions are hot-swapped in
+    reloader.start(serving=pipeline_instance.index_version)
     try:
-        pipeline_instance = AnimeRecommendationPipeline()
-        logger.info("✅ Pipeline loaded successfully.")
-    except Exception as e:
-        logger.error(f"❌ Failed to load pipeline: {e}")
+        logger.info(f"Process {os.getpid()} memory (MB): {process_memory()}")
+    except OSError:
+        pass  # no /proc (non-Linux)
+
+# --- HOT SWAP OF INDEX VERSIONS ---
+def _load_index_version(paths):
+    """Builds and warms a complete replacement next to the live pipeline (background thread)."""
+    manifest = index_versions.manifest(paths.version) or {}
+    current = pipeline_instance
+    # The embedding model is reused unless the new version was built with a different one
+    embedding = None
+    if current is not None and manifest.get("embedding_model") == current.embedding_model:
+        embedding = current.embedding
+    pipeline = _loading["pipeline_class"](index_paths=paths, embedding=embedding)
+    pipeline.warmup()
+    return {
+        "pipeline": pipeline,
+        "resolver": load_title_resolver(paths.title_index_path),
+        "knn_graph": _open_knn_graph(paths.knn_graph_dir),
+    }
+
+def _swap_index_version(loaded):
+    """Publishes the new version; requests already running keep the pipeline they started with."""
+    global pipeline_instance, knn_graph
+    previous = pipeline_instance
+    pipeline_instance, knn_graph = loaded["pipeline"], loaded["knn_graph"]
+    _publish_title_resolver(loaded["resolver"])
+    return previous
+
+def _retire_pipeline(pipeline):
+    logger.info(f"Closing pipeline of index version {pipeline.index_version or 'legacy'}.")
+    pipeline.close()
+
+reloader = IndexReloader(
+    index_versions,
+    load=_load_index_version,
+    swap=_swap_index_version,
+    retire=_retire_pipeline,
+    poll_seconds=INDEX_WATCH_SECONDS,
+    # Every request is bounded by its deadline, so none still uses the old pipeline after this
+    grace_seconds=REQUEST_DEADLINE_SECONDS + 10
+)
+
+startup = StartupLoader(
+    [
+        ("index_version", _resolve_index_version),
+        ("title_index", _load_title_index),
+        ("knn_graph", _load_knn_graph),
+        ("import_pipeline", _import_pipeline),
+        ("load_pipeline", _load_pipeline),
+        ("warmup", _warmup_pipeline),
+    ],
+    retry_seconds=STARTUP_RETRY_SECONDS,
+    max_retry_seconds=STARTUP_MAX_RETRY_SECONDS
+)
+
+if PRELOAD_PIPELINE:
+    # gunicorn master (preload_app): load everything but warmup before forking so workers
+    # share the model copy-on-write; freezing keeps gc from writing to (copying) those pages
+    startup.preload(until="warmup")
+    gc.freeze()
+
+async def lifespan(app: FastAPI):
+    global jikan
+    start_gauge_refresher()
+    jikan = JikanClient(cache=get_metadata_cache())
+    jikan.resolver = title_resolver
+    await jikan.start()
+    top_anime_snapshot.start()
+    top_characters_snapshot.start()
+    logger.info("🚀 Initializing AI Recommendation Pipeline in the background...")
+    startup.start()
     yield
     logger.info("🛑 Shutting down AI Engine...")
+    startup.stop()
+    reloader.stop()
+    await top_anime_snapshot.stop()
+    await top_characters_snapshot.stop()
+    await jikan.aclose()
 
 # Initialize FastAPI with the Lifespan handler
 app = FastAPI(lifespan=lifespan)
 
+class _ObservedResponse(Response):
+    """
+    Sends the response from `call_next` unchanged and runs `finish` once its body
+    is fully sent or abandoned, so a streamed recommendation counts as in flight
+    until its last frame rather than until its handler returns.
+    """
+
+    def __init__(self, response: Response, finish):
+        super().__init__(status_code=response.status_code)
+        self.raw_headers = response.raw_headers
+        self.response = response
+        self.finish = finish
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.finish(self.status_code)
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Request counts, latency and in-flight gauge, labelled by route template."""
+    IN_FLIGHT.inc()
+    start = time.perf_counter()
+
+    def finish(status: int):
+        IN_FLIGHT.dec()
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.labels(method=request.method, route=route, status=str(status)).inc()
+        HTTP_LATENCY.labels(route=route).observe(time.perf_counter() - start)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        finish(500)
+        raise
+    return _ObservedResponse(response, finish)
+
 # --- 3. STATIC FILES & TEMPLATES ---
 # Connecting your folders to the API
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -52,35 +266,97 @@ async def read_root(request: Request):
     """Serves the main frontend page."""
     return templates.TemplateResponse("index.html", {"request": request})
 
-# --- 5. CORE API ENDPOINTS ---
+# --- 5. HEALTH PROBES ---
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process and event loop are responsive (models may still be loading)."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 only once the pipeline is loaded and warmed up; reports load progress."""
+    status = startup.status()
+    if pipeline_instance is None:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+def _engine_unavailable():
+    """503 while the pipeline is still loading, with a hint on how long to wait."""
+    status = startup.status()
+    detail = "AI Engine is warming up." if not status["last_error"] else "AI Engine failed to load; retrying."
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+def metadata_filter(
+    genre: Optional[List[str]] = Query(None),
+    exclude_genre: Optional[List[str]] = Query(None),
+    min_score: Optional[float] = Query(None, ge=0.0, le=10.0),
+    max_score: Optional[float] = Query(None, ge=0.0, le=10.0),
+    mal_id: Optional[List[int]] = Query(None)
+) -> MetadataFilter:
+    """Structured filters; genres may repeat (?genre=Action&genre=Drama) or be comma-separated."""
+    if min_score is not None and max_score is not None and min_score > max_score:
+        raise HTTPException(status_code=400, detail="min_score cannot exceed max_score.")
+    return MetadataFilter(
+        genres=tuple(g for value in genre or [] for g in split_genres(value)),
+        exclude_genres=tuple(g for value in exclude_genre or [] for g in split_genres(value)),
+        min_score=min_score,
+        max_score=max_score,
+        mal_ids=tuple(mal_id or ())
+    )
+
+def _request_options(pipeline, dense_weight, sparse_weight, top_k, filters: MetadataFilter):
+    """Per-request retrieval options; unknown genres are a client error."""
+    try:
+        return pipeline.retrieval_options(dense_weight, sparse_weight, top_k, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+NO_MATCHES = "No titles match the given filters."
+
+# --- 6. CORE API ENDPOINTS ---
 
 @app.get("/api/recommend")
-async def get_recommendation(query: str):
+async def get_recommendation(
+    query: str,
+    dense_weight: Optional[float] = Query(None, ge=0.0),
+    sparse_weight: Optional[float] = Query(None, ge=0.0),
+    top_k: Optional[int] = Query(None, ge=1, le=20),
+    filters: MetadataFilter = Depends(metadata_filter)
+):
     """
     Main AI endpoint. Communicates with /src/ logic.
     Returns dynamic 5-8 recommendations with sync'd explanations.
+    Optional dense/sparse weights and top_k tune the hybrid retrieval per request;
+    genre / exclude_genre / min_score / max_score / mal_id narrow the candidates.
     """
-    if not pipeline_instance:
-        raise HTTPException(status_code=503, detail="AI Engine is offline.")
+    # Bound once: a hot swap mid-request must not mix two index versions
+    pipeline = pipeline_instance
+    if not pipeline:
+        raise _engine_unavailable()
 
     if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty.")
 
+    # The clock starts on arrival: queueing for a slot spends the same budget
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS, deadline_split)
+    options = _request_options(pipeline, dense_weight, sparse_weight, top_k, filters)
+    if pipeline.filter_matches(options) == 0:
+        # Nothing to retrieve: skip the LLM call entirely
+        return {"success": True, "titles": [], "explanations": [], "count": 0,
+                "unresolved": [], "message": NO_MATCHES}
+
     try:
-        # Trigger the core logic in src/recommender.py via the pipeline
-        raw_out = pipeline_instance.recommend(query)
+        # Trigger the core logic in src/recommender.py via the pipeline.
+        # The async path keeps the event loop free while Groq is generating.
+        async with admission.slot():
+            raw_out = await pipeline.arecommend(query, options, deadline)
         
         # Robust Parsing: Splitting titles and explanations using '|||'
-        parts = raw_out.split('\n', 1)
-        if len(parts) < 2:
+        titles, explanations = pipeline.parse(raw_out)
+        if not titles or not explanations:
             raise ValueError("Pipeline returned malformed output format.")
 
-        title_line = parts[0]
-        analysis_body = parts[1]
-
-        titles = [t.strip() for t in title_line.split(',') if t.strip()]
-        explanations = [e.strip() for e in analysis_body.split('|||') if e.strip()]
-
         # Structural Validation: Ensure data is perfectly paired for the UI
         min_count = min(len(titles), len(explanations))
         
@@ -88,9 +364,26 @@ async def get_recommendation(query: str):
             "success": True,
             "titles": titles[:min_count], 
             "explanations": explanations[:min_count],
-            "count": min_count
+            "count": min_count,
+            "unresolved": _unresolved_titles(titles[:min_count])
         }
 
+    except DeadlineExceeded as e:
+        return _retrieval_only_response(e)
+    except QueueFullError as e:
+        logger.warning(f"Admission rejected: {str(e)}")
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "error": "Too many requests. Please retry shortly."},
+            headers={"Retry-After": "1"}
+        )
+    except QueueTimeoutError as e:
+        logger.warning(f"Admission timed out: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "error": "AI Engine is busy. Please retry shortly."},
+            headers={"Retry-After": "2"}
+        )
     except Exception as e:
         logger.error(f"Inference Error: {str(e)}")
         return JSONResponse(
@@ -98,92 +391,251 @@ async def get_recommendation(query: str):
             content={"success": False, "error": "Internal AI Logic Error."}
         )
 
+def _retrieval_only_response(error: DeadlineExceeded):
+    """Generation ran out of time: answer from the fused retrieval results instead of a 500."""
+    if not error.documents:
+        return JSONResponse(
+            status_code=504,
+            content={"success": False, "error": "AI Engine timed out. Please retry shortly."}
+        )
+    titles, explanations = retrieval_only_recommendation(error.documents)
+    return {
+        "success": True,
+        "titles": titles,
+        "explanations": explanations,
+        "count": len(titles),
+        "unresolved": _unresolved_titles(titles),
+        "degraded": True
+    }
+
+def _unresolved_titles(titles):
+    """Titles missing from the catalog (likely hallucinations); empty without a resolver."""
+    resolver = title_resolver
+    if resolver is None:
+        return []
+    return resolver.resolve_many(titles)[1]
+
+def _sse(event: str, data) -> str:
+    """Formats one server-sent event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """
+    Runs `release` however the response ends. The body generator's own `finally`
+    never runs when the client disconnects before the first chunk, and Starlette
+    skips background tasks on a disconnect.
+    """
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.release()
+
+@app.get("/api/recommend/stream")
+async def stream_recommendation(
+    query: str,
+    dense_weight: Optional[float] = Query(None, ge=0.0),
+    sparse_weight: Optional[float] = Query(None, ge=0.0),
+    top_k: Optional[int] = Query(None, ge=1, le=20),
+    filters: MetadataFilter = Depends(metadata_filter)
+):
+    """
+    Streaming variant of /api/recommend (Server-Sent Events).
+    Emits the title list as soon as the first line is generated, then each
+    analysis section as it completes, so the UI can render before generation ends.
+    """
+    # Bound once: a hot swap mid-request must not mix two index versions
+    pipeline = pipeline_instance
+    if not pipeline:
+        raise _engine_unavailable()
+
+    if not query:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    deadline = Deadline(REQUEST_DEADLINE_SECONDS, deadline_split)
+    options = _request_options(pipeline, dense_weight, sparse_weight, top_k, filters)
+    if pipeline.filter_matches(options) == 0:
+        return StreamingResponse(
+            iter([_sse("done", {"count": 0, "message": NO_MATCHES})]), media_type="text/event-stream"
+        )
+
+    # Admission happens before the response starts so saturation still yields 429/503
+    stack = AsyncExitStack()
+    try:
+        await stack.enter_async_context(admission.slot())
+    except QueueFullError:
+        raise HTTPException(status_code=429, detail="Too many requests.", headers={"Retry-After": "1"})
+    except QueueTimeoutError:
+        raise HTTPException(status_code=503, detail="AI Engine is busy.", headers={"Retry-After": "2"})
+
+    async def event_stream():
+        parser = RecommendationStreamParser()
+        sent_sections = [0]
+        parse_seconds = 0.0
+
+        def to_frames(events):
+            for event, payload in events:
+                if event == "titles":
+                    yield _sse("titles", {"titles": payload, "unresolved": _unresolved_titles(payload)})
+                else:
+                    yield _sse("section", {"index": sent_sections[0], "text": payload})
+                    sent_sections[0] += 1
+
+        try:
+            async for chunk in pipeline.astream_recommend(query, options, deadline):
+                start = time.perf_counter()
+                events = parser.feed(chunk)
+                parse_seconds += time.perf_counter() - start
+                for frame in to_frames(events):
+                    yield frame
+
+            start = time.perf_counter()
+            events = parser.close()
+            observe_stage("parse", parse_seconds + time.perf_counter() - start)
+            for frame in to_frames(events):
+                yield frame
+
+            yield _sse("done", {"count": min(len(parser.titles), len(parser.sections))})
+        except DeadlineExceeded as e:
+            # Keep whatever already streamed; before the title line, fall back to retrieval-only
+            if parser.titles is None and e.documents:
+                titles, explanations = retrieval_only_recommendation(e.documents)
+                for frame in to_frames([("titles", titles)] + [("section", x) for x in explanations]):
+                    yield frame
+                yield _sse("done", {"count": len(titles), "degraded": True})
+            elif parser.titles is not None:
+                yield _sse("done", {"count": min(len(parser.titles), sent_sections[0]), "degraded": True})
+            else:
+                yield _sse("error", {"error": "AI Engine timed out. Please retry shortly."})
+        except Exception as e:
+            logger.error(f"Streaming Inference Error: {str(e)}")
+            yield _sse("error", {"error": "Internal AI Logic Error."})
+        finally:
+            # Free the slot as soon as generation ends; the response releases it
+            # otherwise (AsyncExitStack.aclose is a no-op the second time)
+            await stack.aclose()
+
+    return _ReleasingStreamingResponse(
+        event_stream(),
+        release=stack.aclose,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (stage latencies, cache, admission, Jikan counters)."""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/api/metadata")
 async def get_metadata(title: str):
     """
     Fetches poster images and scores from Jikan API.
     Used for the 'Personalized Matches' grid.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            url = f"https://api.jikan.moe/v4/anime?q={title}&limit=1"
-            res = await client.get(url, timeout=10.0)
-            data = res.json()
-            if 'data' in data and len(data['data']) > 0:
-                anime = data['data'][0]
-                return {
-                    "image": anime['images']['jpg']['large_image_url'],
-                    "score": anime.get('score', 'N/A'),
-                    "url": anime['url'],
-                    "title": anime['title_english'] or anime['title']
-                }
-            return {"error": "Not found"}
-        except Exception as e:
-            return {"error": str(e)}
+    try:
+        meta = await jikan.search_anime(title)
+        if meta:
+            return meta
+        return {"error": "Not found"}
+    except Exception as e:
+        return {"error": str(e)}
+
+class MetadataBatchRequest(BaseModel):
+    titles: list[str]
+
+@app.post("/api/metadata/batch")
+async def get_metadata_batch(body: MetadataBatchRequest):
+    """
+    Resolves every title of a result page in one round trip.
+    Lookups run concurrently behind the Jikan rate limiter; whatever has not
+    resolved by the deadline is listed under 'pending' (and keeps warming the cache).
+    """
+    titles = [t.strip() for t in body.titles if t.strip()]
+    if not titles:
+        raise HTTPException(status_code=400, detail="No titles given.")
+    if len(titles) > METADATA_BATCH_MAX_TITLES:
+        raise HTTPException(status_code=400, detail=f"At most {METADATA_BATCH_MAX_TITLES} titles per batch.")
+
+    results, pending = await jikan.search_many(titles, deadline=METADATA_BATCH_DEADLINE_SECONDS)
+    return {
+        "success": True,
+        "results": {
+            title: (meta if meta else {"error": "Not found"})
+            for title, meta in results.items()
+        },
+        "pending": pending
+    }
+
+@app.get("/admin/index")
+async def index_status():
+    """Which index version this worker serves, what CURRENT points at, and any reload in progress."""
+    return reloader.status()
+
+@app.post("/admin/index/reload")
+async def reload_index():
+    """
+    Checks CURRENT now instead of waiting for the watcher. Only this worker
+    reloads; under gunicorn the others follow on their next poll.
+    """
+    if pipeline_instance is None:
+        raise _engine_unavailable()
+    started = reloader.check(force=True)
+    return JSONResponse(status_code=202 if started else 200, content={"reloading": started, **reloader.status()})
+
+@app.get("/api/similar")
+async def get_similar(id: int, k: int = Query(10, ge=1, le=50)):
+    """
+    'More like this' for one title (by MAL_ID): a row lookup in the precomputed
+    kNN graph, so it answers without retrieval or the LLM, even during startup.
+    """
+    graph = knn_graph
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Similar titles are not available.")
+    similar = graph.neighbors(id, k)
+    if similar is None:
+        raise HTTPException(status_code=404, detail=f"Unknown MAL_ID: {id}")
+    return {
+        "success": True,
+        "id": id,
+        "title": graph.name(id),
+        "similar": [{"mal_id": mal_id, "title": name, "score": score} for mal_id, name, score in similar],
+        "count": len(similar)
+    }
 
 @app.get("/api/top-anime")
 async def get_top_anime():
     """
-    Fetches the live Top 50 global rankings.
+    Serves the Top 50 global rankings from the in-process snapshot.
     Triggered by the 'More >' link in the Trending section.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            all_anime = []
-            # Fetching two pages to get a full Top 50
-            for page in [1, 2]:
-                url = f"https://api.jikan.moe/v4/top/anime?page={page}"
-                res = await client.get(url, timeout=10.0)
-                page_data = res.json()
-                if 'data' in page_data:
-                    all_anime.extend(page_data['data'])
-            final_data = sorted(all_anime, key=lambda x: x['rank'])[:50]
-            return {
-                "success": True, 
-                "data": [
-                    {
-                        "rank": i + 1,
-                        "title": a['title_english'] or a['title'],
-                        "score": a['score']
-                    } for i, a in enumerate(all_anime[:50])
-                ]
-            }
-        except Exception as e:
-            return JSONResponse(
-                status_code=500, 
-                content={"success": False, "error": f"Jikan API Error: {str(e)}"}
-            )
+    try:
+        data = await top_anime_snapshot.get()
+        return {"success": True, "data": data, "updated_at": top_anime_snapshot.updated_at}
+    except Exception as e:
+        return JSONResponse(
+            status_code=500, 
+            content={"success": False, "error": f"Jikan API Error: {str(e)}"}
+        )
+
 @app.get("/api/top-characters")
 async def get_top_characters():
     """
-    Fetches the top 50 most popular anime characters from the live Jikan API.
+    Serves the top 50 most popular anime characters from the in-process snapshot.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            all_chars = []
-            # Jikan returns 25 per page; fetch two pages
-            for page in [1, 2]:
-                url = f"https://api.jikan.moe/v4/top/characters?page={page}"
-                res = await client.get(url, timeout=10.0)
-                page_data = res.json()
-                if 'data' in page_data:
-                    all_chars.extend(page_data['data'])
-            
-            # Slice to exactly 50 and return clean data
-            return {
-                "success": True, 
-                "data": [
-                    {
-                        "rank": i + 1,
-                        "name": c['name'],
-                        "anime": c['about'] if 'about' in c else "N/A" # or c['anime'][0]['anime']['title']
-                    } for i, c in enumerate(all_chars[:50])
-                ]
-            }
-        except Exception as e:
-            return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+    try:
+        data = await top_characters_snapshot.get()
+        return {"success": True, "data": data, "updated_at": top_characters_snapshot.updated_at}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
 
-# --- 6. EXECUTION BLOCK ---
+# --- 7. EXECUTION BLOCK ---
 if __name__ == "__main__":
     import uvicorn
     # In production/deployment, uvicorn will be called via the Dockerfile command.
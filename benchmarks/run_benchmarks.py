@@ -0,0 +1,267 @@
+"""
+Synthetic-scale benchmarks for ingestion, index build and retrieval.
+
+Each catalog size runs in its own subprocess so peak RSS is per size. Results go
+to a JSON report that can be diffed across commits:
+
+    python -m benchmarks.run_benchmarks --sizes 1k,10k,100k --stub-embedder --out bench_report.json
+    python -m benchmarks.run_benchmarks --compare old_report.json bench_report.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageRecorder:
+    """Accumulates wall time and item counts per stage, plus the peak RSS seen after it."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name: str, seconds: float, items: int = 0, unit: str = "items"):
+        stage = self.stages.setdefault(name, {"wall_s": 0.0, "items": 0, "unit": unit})
+        stage["wall_s"] += seconds
+        stage["items"] += items
+        stage["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    def timed(self, name: str, fn, *args, unit: str = "items", items: int = 0):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.add(name, time.perf_counter() - start, items, unit)
+        return result
+
+    def latencies(self, name: str, samples):
+        samples = sorted(samples)
+        self.stages[name] = {
+            "wall_s": sum(samples),
+            "items": len(samples),
+            "unit": "queries",
+            "p50_ms": round(1000 * statistics.median(samples), 3),
+            "p95_ms": round(1000 * samples[int(0.95 * (len(samples) - 1))], 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+
+    def report(self) -> dict:
+        for stage in self.stages.values():
+            stage["wall_s"] = round(stage["wall_s"], 4)
+            stage["throughput_per_s"] = round(stage["items"] / stage["wall_s"], 1) if stage["wall_s"] else None
+        return self.stages
+
+
+def run_single_size(rows: int, stub_embedder: bool, queries: int, workdir: str) -> dict:
+    """Runs every stage for one catalog size inside the current process."""
+    from benchmarks.synthetic_catalog import write_catalog, load_vocabulary
+    from benchmarks.stubs import HashingEmbeddings, StubEmbeddingPool, stub_llm
+    from src.bm25_index import BM25IndexWriter
+    from src.data_loader import AnimeDataLoader
+    from src.document_store import DocumentStoreWriter
+    from src.vector_store import VectorStoreBuilder
+    from pipeline.pipeline import AnimeRecommendationPipeline
+    from utils.index_versions import IndexPaths
+    from config.config import EMBEDDING_MODEL_PATH, EMBED_BATCH_SIZE, EMBED_WORKERS, BUILD_WRITE_BATCH
+
+    rec = StageRecorder()
+    vocab = load_vocabulary()
+    csv_path = os.path.join(workdir, "catalog.csv")
+    rec.timed("generate_catalog", write_catalog, csv_path, rows, unit="rows", items=rows)
+
+    chroma_dir = os.path.join(workdir, "chroma_db")
+    docstore_dir = os.path.join(workdir, "docstore")
+    bm25_dir = os.path.join(workdir, "bm25_index")
+
+    embedding = HashingEmbeddings() if stub_embedder else None
+    builder = VectorStoreBuilder("", persist_dir=chroma_dir, model_name=EMBEDDING_MODEL_PATH, embedding=embedding)
+    db = builder.load_vector_store()
+    store_writer = DocumentStoreWriter(docstore_dir)
+    bm25_writer = BM25IndexWriter()
+
+    # Build: stream the same way pipeline/build_pipeline.py does, timing each stage separately
+    loader = AnimeDataLoader(csv_path)
+    batches = loader.iter_batches()
+    if stub_embedder:
+        pool = StubEmbeddingPool(embedding)
+    else:
+        from src.embedding_pool import EmbeddingPool
+        pool = EmbeddingPool(EMBEDDING_MODEL_PATH, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS)
+    with pool:
+        while True:
+            start = time.perf_counter()
+            rows_batch = next(batches, None)
+            if rows_batch is None:
+                rec.add("load_process", time.perf_counter() - start, 0, "rows")
+                break
+            rec.add("load_process", time.perf_counter() - start, len(rows_batch), "rows")
+
+            chunks = rec.timed("split", lambda: next(builder.split_batches([rows_batch])), unit="chunks")
+            rec.stages["split"]["items"] += len(chunks)
+
+            for i in range(0, len(chunks), BUILD_WRITE_BATCH):
+                part = chunks[i:i + BUILD_WRITE_BATCH]
+                vectors = rec.timed("embed", pool.embed, [d.page_content for d in part], unit="chunks", items=len(part))
+
+                start = time.perf_counter()
+                builder.upsert_vectors(db, part, vectors)
+                for doc in part:
+                    store_writer.add(doc.page_content, doc.metadata, doc.metadata["doc_id"])
+                    bm25_writer.add(doc.page_content)
+                rec.add("index_write", time.perf_counter() - start, len(part), "chunks")
+
+        start = time.perf_counter()
+        store_writer.close()
+        bm25_writer.save(bm25_dir)
+        rec.add("index_write", time.perf_counter() - start, 0, "chunks")
+    del db, builder
+
+    # Serving side
+    pipeline = rec.timed(
+        "pipeline_startup",
+        lambda: AnimeRecommendationPipeline(
+            index_paths=IndexPaths.under(None, workdir),
+            embedding=embedding, llm=stub_llm(), cache_enabled=False
+        ),
+        unit="startups", items=1
+    )
+    recommender = pipeline.recommender
+    rng = random.Random(11)
+    query_set = [" ".join(rng.choices(vocab[:2000], k=rng.randint(3, 8))) for _ in range(queries)]
+
+    dense, sparse, fusion, e2e = [], [], [], []
+    for q in query_set:
+        t0 = time.perf_counter()
+        dense_docs = recommender.dense_retriever.invoke(q)
+        t1 = time.perf_counter()
+        sparse_docs = recommender.sparse_retriever.invoke(q)
+        t2 = time.perf_counter()
+        recommender._fuse(dense_docs, sparse_docs, recommender.default_options)
+        t3 = time.perf_counter()
+        pipeline.recommend(q)
+        t4 = time.perf_counter()
+        dense.append(t1 - t0)
+        sparse.append(t2 - t1)
+        fusion.append(t3 - t2)
+        e2e.append(t4 - t3)
+
+    rec.latencies("dense_query", dense)
+    rec.latencies("sparse_query", sparse)
+    rec.latencies("fusion", fusion)
+    rec.latencies("recommend_stub_llm", e2e)
+
+    return {
+        "rows": rows,
+        "ingestion": loader.stats.as_dict(),
+        "stages": rec.report(),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def run_all(sizes, stub_embedder: bool, queries: int, out_path: str):
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "embedder": "hashing-stub" if stub_embedder else "sentence-transformers",
+        },
+        "results": {},
+    }
+
+    for label in sizes:
+        rows = SIZES.get(label) or int(label)
+        print(f"[bench] {label}: {rows} rows ...", flush=True)
+        with tempfile.TemporaryDirectory(prefix=f"anime-bench-{label}-") as workdir:
+            result_path = os.path.join(workdir, "result.json")
+            cmd = [sys.executable, "-m", "benchmarks.run_benchmarks", "--single", str(rows),
+                   "--queries", str(queries), "--workdir", workdir, "--result", result_path]
+            if stub_embedder:
+                cmd.append("--stub-embedder")
+            subprocess.run(cmd, check=True)
+            with open(result_path, encoding="utf-8") as f:
+                report["results"][label] = json.load(f)
+
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"[bench] report written to {out_path}")
+    return report
+
+
+def compare(old_path: str, new_path: str, threshold: float = 0.10) -> int:
+    """Prints per-stage wall-time ratios; returns 1 if any stage regressed beyond threshold."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    regressed = False
+    for label, result in new["results"].items():
+        before = old["results"].get(label)
+        if before is None:
+            continue
+        for stage, stats in result["stages"].items():
+            prev = before["stages"].get(stage)
+            if not prev or not prev["wall_s"]:
+                continue
+            key = "p95_ms" if "p95_ms" in stats else "wall_s"
+            ratio = stats[key] / prev[key] if prev.get(key) else float("nan")
+            flag = "  REGRESSION" if ratio > 1 + threshold else ""
+            regressed |= bool(flag)
+            print(f"{label:>5} {stage:<20} {key:<7} {prev[key]:>10} -> {stats[key]:>10}  x{ratio:.2f}{flag}")
+    return 1 if regressed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k,10k", help="comma list of 1k,10k,100k,1m or row counts")
+    parser.add_argument("--stub-embedder", action="store_true", help="use the hashing stub instead of MiniLM")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", default="bench_report.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.10)
+    # Internal: one size per subprocess
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare, threshold=args.threshold))
+
+    if args.single:
+        result = run_single_size(args.single, args.stub_embedder, args.queries, args.workdir)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    run_all([s.strip() for s in args.sizes.split(",") if s.strip()], args.stub_embedder, args.queries, args.out)
+
+
+if __name__ == "__main__":
+    main()
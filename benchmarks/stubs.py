@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+STUB_RESPONSE = (
+    "Stub Title One, Stub Title Two, Stub Title Three\n|||\n"
+    "**[Stub Title One]**\n**THEMATIC CORE**: stub\n|||\n"
+    "**[Stub Title Two]**\n**THEMATIC CORE**: stub\n|||\n"
+    "**[Stub Title Three]**\n**THEMATIC CORE**: stub"
+)
+
+
+def stub_llm(response: str = STUB_RESPONSE, first_token_delay: float = 0.0, token_delay: float = None):
+    """Chat model that answers with a well-formed recommendation (instantly by default)."""
+    if first_token_delay or token_delay:
+        return LatencyChatModel(responses=[response], first_token_delay=first_token_delay, sleep=token_delay)
+    return FakeListChatModel(responses=[response])
+
+
+class LatencyChatModel(FakeListChatModel):
+    """
+    Fake chat model with injectable latency: waits `first_token_delay` seconds
+    before the first chunk and `sleep` between chunks. Lets deadline and
+    hedging behaviour be exercised without a real upstream.
+    """
+
+    first_token_delay: float = 0.0
+
+    def _stream(self, *args, **kwargs):
+        time.sleep(self.first_token_delay)
+        yield from super()._stream(*args, **kwargs)
+
+    async def _astream(self, *args, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        async for chunk in super()._astream(*args, **kwargs):
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Tiny deterministic embedder (feature hashing of word tokens) with the same
+    dimension as all-MiniLM-L6-v2. Lets benchmarks exercise index build and
+    retrieval at scale without paying for a transformer forward pass.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class StubEmbeddingPool:
+    """Same interface as src.embedding_pool.EmbeddingPool, backed by HashingEmbeddings."""
+
+    def __init__(self, embeddings: HashingEmbeddings = None):
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.documents_embedded = 0
+        self.seconds_embedding = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def embed(self, texts):
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self.seconds_embedding += time.perf_counter() - start
+        self.documents_embedded += len(texts)
+        return vectors
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents_embedded / self.seconds_embedding if self.seconds_embedding else 0.0
@@ -0,0 +1,49 @@
+import csv
+import random
+import re
+
+GENRES = [
+    "Action", "Adventure", "Comedy", "Drama", "Sci-Fi", "Space", "Mystery", "Psychological",
+    "Thriller", "Romance", "Slice of Life", "Fantasy", "Supernatural", "Mecha", "Sports",
+    "Horror", "Music", "School", "Historical", "Military", "Shounen", "Seinen", "Josei",
+]
+
+SYLLABLES = ["ka", "ze", "no", "mi", "ra", "shi", "to", "ri", "yu", "ki", "ha", "ne", "su", "ko", "ma", "ta"]
+
+
+def load_vocabulary(sample_csv: str = "data/anime_with_synopsis.csv", limit: int = 5000):
+    """Real synopsis vocabulary, so BM25 term statistics look like the production catalog."""
+    words = {}
+    try:
+        with open(sample_csv, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for word in re.findall(r"[A-Za-z']+", row.get("sypnopsis", "")):
+                    words[word.lower()] = words.get(word.lower(), 0) + 1
+    except FileNotFoundError:
+        pass
+    vocab = sorted(words, key=words.get, reverse=True)[:limit]
+    return vocab or [f"word{i}" for i in range(limit)]
+
+
+def write_catalog(path: str, rows: int, synopsis_words: int = 120, seed: int = 7, vocabulary=None):
+    """
+    Streams a synthetic catalog in the source schema
+    (MAL_ID,Name,Score,Genres,sypnopsis) to `path` without holding it in memory.
+    """
+    rng = random.Random(seed)
+    vocab = vocabulary or load_vocabulary()
+    # Zipf-like word choice: frequent words stay frequent, like real text
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["MAL_ID", "Name", "Score", "Genres", "sypnopsis"])
+        for mal_id in range(1, rows + 1):
+            name = " ".join(
+                "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                for _ in range(rng.randint(1, 3))
+            )
+            genres = ", ".join(rng.sample(GENRES, rng.randint(1, 5)))
+            words = rng.choices(vocab, weights=weights, k=rng.randint(synopsis_words // 2, synopsis_words * 3 // 2))
+            writer.writerow([mal_id, f"{name} {mal_id}", round(rng.uniform(4.0, 9.3), 2), genres, " ".join(words).capitalize() + "."])
+    return path
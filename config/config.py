@@ -4,4 +4,140 @@ from dotenv import load_dotenv
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-MODEL_NAME = "llama-3.1-8b-instant"
\ No newline at end of file
+MODEL_NAME = "llama-3.1-8b-instant"
+# Optional faster model for hedged requests (empty = hedge to MODEL_NAME itself)
+FALLBACK_MODEL_NAME = os.getenv("FALLBACK_MODEL_NAME", "")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Pre-baked copy of the embedding model (pipeline/bake_model.py); preferred when present so
+# startup never touches the network
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", "models")
+_BAKED_EMBEDDING_MODEL = os.path.join(EMBEDDING_MODEL_DIR, os.path.basename(EMBEDDING_MODEL))
+EMBEDDING_MODEL_PATH = _BAKED_EMBEDDING_MODEL if os.path.isdir(_BAKED_EMBEDDING_MODEL) else EMBEDDING_MODEL
+
+# --- INDEX LOCATIONS ---
+# Builds write versioned directories under INDEX_ROOT and flip INDEX_ROOT/CURRENT when done.
+# The flat directories below are used only until the first versioned build.
+INDEX_ROOT = os.getenv("INDEX_ROOT", "indexes")
+# Complete versions kept on disk (the live one included) for rollback
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+# How often the API checks CURRENT for a new version to hot-swap in; 0 disables the watcher
+INDEX_WATCH_SECONDS = float(os.getenv("INDEX_WATCH_SECONDS", "30"))
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+DOCSTORE_DIR = os.getenv("DOCSTORE_DIR", "docstore")
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "bm25_index")
+# Memory-mapped NumPy copy of the embeddings (rows = document store positions)
+DENSE_INDEX_DIR = os.getenv("DENSE_INDEX_DIR", "dense_index")
+# float16 halves memory and disk; search upcasts it block by block and is several times slower
+DENSE_INDEX_DTYPE = os.getenv("DENSE_INDEX_DTYPE", "float32")
+# Dense retrieval backend: "chroma" or "numpy" (in-process exact search over DENSE_INDEX_DIR)
+DENSE_BACKEND = os.getenv("DENSE_BACKEND", "chroma").lower()
+# Genre bitmaps + sorted score index for structured filters (rows = document store positions)
+METADATA_INDEX_DIR = os.getenv("METADATA_INDEX_DIR", "metadata_index")
+# Precomputed "more like this" neighbours per MAL_ID (/api/similar), written by the build
+KNN_GRAPH_DIR = os.getenv("KNN_GRAPH_DIR", "knn_graph")
+KNN_NEIGHBORS = int(os.getenv("KNN_NEIGHBORS", "20"))
+# Share of the similarity score that comes from genre overlap (0 = embeddings only)
+KNN_GENRE_WEIGHT = float(os.getenv("KNN_GENRE_WEIGHT", "0.2"))
+# Name -> MAL_ID resolver for LLM titles, written by the build
+TITLE_INDEX_PATH = os.getenv("TITLE_INDEX_PATH", "title_index.json")
+
+# --- SERVING / ADMISSION CONTROL ---
+# How many recommendations may run at once, and how many more may wait for a slot
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "8"))
+MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "16"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "5"))
+
+# --- DEADLINES & HEDGING ---
+# End-to-end budget for /api/recommend, split across stages (unused time rolls forward)
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "20"))
+DEADLINE_SPLIT = os.getenv("DEADLINE_SPLIT", "retrieval:0.15,generation:0.85")
+# Without a first token after this long, a second (hedged) request goes out; 0 disables
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "2.5"))
+# Per-call client limits for the Groq API
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+# Threads used for CPU-bound retrieval (Chroma + BM25) off the event loop
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+
+# --- STARTUP / READINESS ---
+# Retrieval-only query run once after loading so the first user request is warm
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "dark psychological thriller with a genius detective")
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+STARTUP_MAX_RETRY_SECONDS = float(os.getenv("STARTUP_MAX_RETRY_SECONDS", "60"))
+# Load the pipeline at import time, before gunicorn forks its workers (set by gunicorn.conf.py)
+PRELOAD_PIPELINE = os.getenv("PRELOAD_PIPELINE", "false").lower() == "true"
+
+# --- QUERY EMBEDDING (micro-batching + LRU) ---
+QUERY_EMBED_MAX_BATCH = int(os.getenv("QUERY_EMBED_MAX_BATCH", "32"))
+# How long the first query waits for others to join its batch
+QUERY_EMBED_MAX_WAIT_MS = float(os.getenv("QUERY_EMBED_MAX_WAIT_MS", "2"))
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "4096"))
+
+# --- RECOMMENDATION CACHE ---
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+# Answers for known queries (pipeline/batch_recommend.py), loaded into the cache at startup
+PREWARM_CACHE_PATH = os.getenv("PREWARM_CACHE_PATH", "cache/prewarm.jsonl")
+# Offline batch runs: queries retrieved per batch and LLM calls in flight
+BATCH_RECOMMEND_SIZE = int(os.getenv("BATCH_RECOMMEND_SIZE", "32"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+# Cosine similarity above which two vibes are treated as the same question
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.92"))
+
+# --- HYBRID RETRIEVAL (reciprocal-rank fusion) ---
+DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", "1.0"))
+SPARSE_WEIGHT = float(os.getenv("SPARSE_WEIGHT", "1.0"))
+FUSION_TOP_K = int(os.getenv("FUSION_TOP_K", "5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Chroma backend: filters matching up to this many titles go in as a mal_id $in list; broader
+# ones use Chroma's own where / where_document clauses, over-fetching by this factor
+CHROMA_FILTER_MAX_IDS = int(os.getenv("CHROMA_FILTER_MAX_IDS", "500"))
+CHROMA_FILTER_OVERFETCH = int(os.getenv("CHROMA_FILTER_OVERFETCH", "4"))
+
+# --- CONTEXT PACKING (prompt token budget) ---
+# Estimated tokens of retrieved context sent to the LLM (0 disables packing)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))
+CONTEXT_MIN_DOC_TOKENS = int(os.getenv("CONTEXT_MIN_DOC_TOKENS", "48"))
+
+# --- OFFLINE BUILD: EMBEDDING STAGE ---
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Worker processes for embedding (defaults to every core)
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(os.cpu_count() or 1)))
+# Documents embedded and written to the store per hand-off
+BUILD_WRITE_BATCH = int(os.getenv("BUILD_WRITE_BATCH", "1024"))
+# Raw CSV rows parsed per streaming ingestion chunk
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "10000"))
+
+# --- JIKAN (MyAnimeList metadata) ---
+# Point JIKAN_BASE_URL at a local stand-in server for tests
+JIKAN_BASE_URL = os.getenv("JIKAN_BASE_URL", "https://api.jikan.moe/v4")
+JIKAN_TIMEOUT_SECONDS = float(os.getenv("JIKAN_TIMEOUT_SECONDS", "10"))
+JIKAN_MAX_CONNECTIONS = int(os.getenv("JIKAN_MAX_CONNECTIONS", "10"))
+METADATA_CACHE_PATH = os.getenv("METADATA_CACHE_PATH", "cache/metadata.sqlite3")
+METADATA_CACHE_TTL_SECONDS = float(os.getenv("METADATA_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Serve card metadata from the local title index only (no Jikan calls, no posters)
+METADATA_OFFLINE = os.getenv("METADATA_OFFLINE", "false").lower() == "true"
+# Titles Jikan could not find are retried sooner
+METADATA_NEGATIVE_TTL_SECONDS = float(os.getenv("METADATA_NEGATIVE_TTL_SECONDS", "3600"))
+# Jikan allows ~3 requests/second; the scheduler stays under it and retries 429s
+JIKAN_RATE_PER_SECOND = float(os.getenv("JIKAN_RATE_PER_SECOND", "3"))
+JIKAN_BURST = int(os.getenv("JIKAN_BURST", "3"))
+JIKAN_MAX_RETRIES = int(os.getenv("JIKAN_MAX_RETRIES", "3"))
+JIKAN_BACKOFF_SECONDS = float(os.getenv("JIKAN_BACKOFF_SECONDS", "1"))
+# /api/metadata/batch returns whatever resolved within this deadline
+METADATA_BATCH_DEADLINE_SECONDS = float(os.getenv("METADATA_BATCH_DEADLINE_SECONDS", "4"))
+METADATA_BATCH_MAX_TITLES = int(os.getenv("METADATA_BATCH_MAX_TITLES", "25"))
+# Streamlit poster cards are looked up concurrently on this many threads
+POSTER_FETCH_WORKERS = int(os.getenv("POSTER_FETCH_WORKERS", "6"))
+
+# --- TRENDING SNAPSHOTS (top anime / top characters) ---
+TOP_LISTS_REFRESH_SECONDS = float(os.getenv("TOP_LISTS_REFRESH_SECONDS", str(6 * 3600)))
+TOP_LISTS_SNAPSHOT_DIR = os.getenv("TOP_LISTS_SNAPSHOT_DIR", "cache")
+
+# --- OBSERVABILITY ---
+# FastAPI serves /metrics itself; Streamlit gets a side port (0 disables it)
+STREAMLIT_METRICS_PORT = int(os.getenv("STREAMLIT_METRICS_PORT", "0"))
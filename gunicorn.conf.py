@@ -0,0 +1,48 @@
+"""
+Multi-worker serving for the FastAPI app:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The master imports the app and loads the pipeline (embedding model, document
+store, BM25 / dense / metadata indexes) once, then forks the workers:
+
+- model weights are shared copy-on-write (gc.freeze keeps the collector from
+  touching, and so copying, the preloaded objects);
+- index files are memory-mapped read-only, so every worker reads the same
+  page-cache pages;
+- the dense backend defaults to the NumPy index: a Chroma client holds its own
+  in-memory HNSW and SQLite handles per process and must not cross a fork.
+
+Warmup (the first forward pass) runs in each worker after the fork, so the
+torch thread pool is never inherited. Check the result with
+`python -m utils.memory_report <master_pid>`.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Read by config/config.py and utils/metrics.py when the app is imported (after this file)
+os.environ.setdefault("PRELOAD_PIPELINE", "true")
+os.environ.setdefault("DENSE_BACKEND", "numpy")
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "anime_prometheus"))
+
+# Prepared here, not in on_starting: with preload_app the app (and its metrics) is
+# imported before any server hook runs. Stale files would leak into /metrics.
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+# One torch/BLAS pool per worker would oversubscribe the cores
+os.environ.setdefault("OMP_NUM_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,26 @@
+import os
+
+from sentence_transformers import SentenceTransformer
+from utils.logger import get_logger
+from utils.custom_exception import CustomException
+from config.config import EMBEDDING_MODEL, EMBEDDING_MODEL_DIR
+
+logger = get_logger(__name__)
+
+def main():
+    """
+    Saves the embedding model under EMBEDDING_MODEL_DIR so containers load it
+    from local disk (config.EMBEDDING_MODEL_PATH) instead of the Hugging Face hub.
+    Run at image build time.
+    """
+    try:
+        target = os.path.join(EMBEDDING_MODEL_DIR, os.path.basename(EMBEDDING_MODEL))
+        logger.info(f"Baking embedding model {EMBEDDING_MODEL} into {target}")
+        SentenceTransformer(EMBEDDING_MODEL, device="cpu").save(target)
+        logger.info("Embedding model baked successfully.")
+    except Exception as e:
+        logger.error(f"Failed to bake embedding model {str(e)}")
+        raise CustomException("Error while baking embedding model", e)
+
+if __name__=="__main__":
+    main()
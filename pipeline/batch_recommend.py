@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+from src.recommendation_cache import RecommendationCache, prewarm_record, read_prewarm_file
+from utils.logger import get_logger
+from utils.custom_exception import CustomException
+from config.config import MODEL_NAME, PREWARM_CACHE_PATH, BATCH_RECOMMEND_SIZE, BATCH_LLM_CONCURRENCY
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+
+def read_queries(path: str):
+    """One query per line (.txt) or {"query": ...} per line (.jsonl); duplicates dropped."""
+    queries, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            query = json.loads(line)["query"] if path.endswith(".jsonl") else line
+            key = RecommendationCache.normalize(query)
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(query)
+    return queries
+
+
+def pending_queries(queries, out_path: str, scope: tuple):
+    """Resume: queries already answered in `out_path` for the same retrieval settings are skipped."""
+    answered = {
+        RecommendationCache.normalize(query)
+        for query, _, record_scope in read_prewarm_file(out_path) if record_scope == scope
+    }
+    return [q for q in queries if RecommendationCache.normalize(q) not in answered]
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+async def run_batches(pipeline, queries, out_path: str, batch_size: int, concurrency: int):
+    """
+    Retrieval runs batch by batch (vectorized), generations go out through the
+    chat model's abatch with bounded concurrency. Each finished batch is
+    appended to `out_path` and fsynced, so the output file is the checkpoint.
+    """
+    recommender = pipeline.recommender
+    scope = recommender.default_options.cache_scope()
+    done, failed = 0, 0
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "a", encoding="utf-8") as out:
+        # An interrupted run can leave half a line; start the next record on a fresh one
+        if out.tell() and not _ends_with_newline(out_path):
+            out.write("\n")
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            batch_start = time.perf_counter()
+
+            # 1. Vectorized retrieval for the whole batch (kept off the event loop)
+            docs = await asyncio.get_running_loop().run_in_executor(
+                recommender.executor, recommender.retrieve_batch, batch
+            )
+
+            # 2. Bounded-concurrency generation
+            responses = await recommender.agenerate_batch(batch, docs, max_concurrency=concurrency)
+
+            # 3. Only well-formed answers are written; failures are retried on the next run
+            for query, response in zip(batch, responses):
+                if isinstance(response, Exception):
+                    logger.error(f"Generation failed for '{query}': {str(response)}")
+                    failed += 1
+                    continue
+                titles, sections = pipeline.parse(response)
+                if not titles or not sections:
+                    logger.error(f"Malformed answer for '{query}', skipping.")
+                    failed += 1
+                    continue
+                out.write(json.dumps(prewarm_record(query, response, scope, MODEL_NAME)) + "\n")
+                done += 1
+            out.flush()
+            os.fsync(out.fileno())
+
+            logger.info(f"Batch {start // batch_size + 1}: {len(batch)} queries in "
+                        f"{time.perf_counter() - batch_start:.1f}s ({done} done, {failed} failed)")
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer known queries offline and write a cache pre-warm file")
+    parser.add_argument("queries", help="Query file: one query per line (.txt) or JSONL with a 'query' field")
+    parser.add_argument("--out", default=PREWARM_CACHE_PATH, help="Output JSONL (also the resume checkpoint)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_RECOMMEND_SIZE)
+    parser.add_argument("--concurrency", type=int, default=BATCH_LLM_CONCURRENCY,
+                        help="LLM calls in flight at once")
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N queries (0 = all)")
+    args = parser.parse_args()
+
+    try:
+        queries = read_queries(args.queries)
+        if args.limit:
+            queries = queries[:args.limit]
+
+        # Imported here so the batching helpers load without the model stack
+        from pipeline.pipeline import AnimeRecommendationPipeline
+
+        # The response cache is skipped: every answer here is meant to be generated
+        pipeline = AnimeRecommendationPipeline(cache_enabled=False)
+        scope = pipeline.recommender.default_options.cache_scope()
+
+        pending = pending_queries(queries, args.out, scope)
+        logger.info(f"{len(queries)} queries, {len(queries) - len(pending)} already answered, "
+                    f"{len(pending)} to run.")
+
+        done, failed = asyncio.run(
+            run_batches(pipeline, pending, args.out, args.batch_size, args.concurrency)
+        )
+        logger.info(f"Batch recommendation finished: {done} written to {args.out}, {failed} failed.")
+    except Exception as e:
+        logger.error(f"Failed to run batch recommendations {str(e)}")
+        raise CustomException("Error during batch recommendation", e)
+
+
+if __name__ == "__main__":
+    main()
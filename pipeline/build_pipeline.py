@@ -1,29 +1,101 @@
-from src.data_loader import AnimeDataLoader
+import os
+import shutil
+
+from src.data_loader import AnimeDataLoader, prefetch
 from src.vector_store import VectorStoreBuilder
+from src.title_resolver import TitleIndexWriter
+from src.document_store import DocumentStore
+from src.metadata_index import build_metadata_index
+from src.dense_index import DenseIndex
+from src.knn_graph import build_knn_graph
+from utils.index_versions import IndexVersions
 from dotenv import load_dotenv
 from utils.logger import get_logger
 from utils.custom_exception import CustomException
+from config.config import (
+    INDEX_ROOT, INDEX_KEEP_VERSIONS, DENSE_INDEX_DTYPE, EMBEDDING_MODEL, EMBEDDING_MODEL_PATH,
+    EMBED_BATCH_SIZE, EMBED_WORKERS, BUILD_WRITE_BATCH, INGEST_CHUNK_ROWS, KNN_NEIGHBORS, KNN_GENRE_WEIGHT
+)
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
+DATA_PATH = "data/anime_with_synopsis.csv"
+
 def main():
+    # Every build goes into a fresh version directory; the live one is never touched
+    versions = IndexVersions(INDEX_ROOT)
+    paths = versions.new_version()
     try:
-        logger.info("Starting to build pipeline...")
+        logger.info(f"Starting to build pipeline into {INDEX_ROOT}/{paths.version}...")
+
+        # Start from the live vectors so only new/changed rows are embedded (diff build)
+        seeded_from = versions.seed_vector_store(paths)
+        if seeded_from:
+            logger.info(f"Vector store seeded from {seeded_from}; only changed rows will be embedded.")
+        else:
+            logger.info("No live index version; embedding every row (full build).")
+
+        # Streaming ingestion: CSV chunks -> validation/text -> split -> embedding batches.
+        # Parsing runs one chunk ahead in a background thread so it overlaps with embedding.
+        loader = AnimeDataLoader(DATA_PATH, chunksize=INGEST_CHUNK_ROWS)
+        vector_builder = VectorStoreBuilder("", persist_dir=paths.chroma_dir, model_name=EMBEDDING_MODEL_PATH)
+
+        # The title resolver index is collected from the same row stream
+        title_writer = TitleIndexWriter()
+        row_batches = title_writer.tap(loader.iter_batches())
+
+        chunk_batches = prefetch(vector_builder.split_batches(row_batches), depth=2)
+        vector_builder.build_incremental(
+            chunk_batches,
+            batch_size=EMBED_BATCH_SIZE,
+            workers=EMBED_WORKERS,
+            write_batch=BUILD_WRITE_BATCH,
+            docstore_dir=paths.docstore_dir,
+            bm25_dir=paths.bm25_dir
+        )
+        loader.stats.report()
+
+        # NumPy dense backend: export every stored embedding, aligned with the new document store
+        document_store = DocumentStore(paths.docstore_dir)
+        vector_builder.export_dense_index(
+            vector_builder.load_vector_store(), document_store, paths.dense_dir, DENSE_INDEX_DTYPE
+        )
+
+        # Genre bitmaps + sorted score index for /api/recommend filters
+        metadata_writer = build_metadata_index(document_store, paths.metadata_dir)
+        logger.info(f"Metadata index written with {len(metadata_writer.genres)} genres.")
 
-        loader = AnimeDataLoader("data/anime_with_synopsis.csv" , "data/anime_updated.csv")
-        processed_csv = loader.load_and_process()
+        # Item-to-item neighbours for /api/similar, from the exported embeddings
+        n_titles = build_knn_graph(
+            DenseIndex(paths.dense_dir), document_store, paths.knn_graph_dir, KNN_NEIGHBORS, KNN_GENRE_WEIGHT
+        )
+        logger.info(f"kNN graph written for {n_titles} titles ({KNN_NEIGHBORS} neighbours each).")
 
-        logger.info("Data  loaded and processed...")
+        title_writer.save(paths.title_index_path)
+        logger.info(f"Title index written with {len(title_writer.entries)} titles.")
 
-        vector_builder = VectorStoreBuilder(processed_csv)
-        vector_builder.build_and_save_vectorstore()
+        logger.info("Vector store and BM25 index built sucesfully....")
 
-        logger.info("Vector store Built sucesfully....")
+        # The manifest marks the version complete; flipping CURRENT publishes it to running servers
+        versions.write_manifest(paths.version, {
+            "source": DATA_PATH,
+            "embedding_model": EMBEDDING_MODEL,
+            "dense_dtype": DENSE_INDEX_DTYPE,
+            "documents": len(document_store),
+            "titles": n_titles,
+            "genres": len(metadata_writer.genres),
+        })
+        versions.activate(paths.version)
+        removed = versions.prune(INDEX_KEEP_VERSIONS)
+        logger.info(f"Index version {paths.version} is live"
+                    + (f"; pruned {', '.join(removed)}." if removed else "."))
 
         logger.info("Pipelien built sucesfuly....")
     except Exception as e:
+            # An unfinished version has no manifest and can never be activated; drop it
+            shutil.rmtree(os.path.join(INDEX_ROOT, paths.version), ignore_errors=True)
             logger.error(f"Failed to execute pipeline {str(e)}")
             raise CustomException("Error during pipeline " , e)
     
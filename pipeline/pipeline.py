@@ -1,39 +1,166 @@
 from src.vector_store import VectorStoreBuilder
 from src.recommender import AnimeRecommender
-from config.config import GROQ_API_KEY, MODEL_NAME
+from src.recommendation_cache import RecommendationCache, read_prewarm_file
+from src.bm25_index import BM25Index, BM25IndexRetriever, build_sparse_index
+from src.document_store import DocumentStore
+from src.dense_index import DenseIndex, DenseIndexRetriever
+from src.metadata_index import MetadataFilter, MetadataIndex, build_metadata_index
+from src.fusion import RetrievalOptions
+from src.context_packer import ContextPacker
+from src.query_embedding import QueryEmbeddingService
+from src.output_parser import parse_recommendation
+from config.config import (
+    GROQ_API_KEY, MODEL_NAME, FALLBACK_MODEL_NAME, HEDGE_DELAY_SECONDS, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+    EMBEDDING_MODEL, EMBEDDING_MODEL_PATH, RETRIEVAL_WORKERS, DENSE_BACKEND, DENSE_INDEX_DTYPE,
+    QUERY_EMBED_MAX_BATCH, QUERY_EMBED_MAX_WAIT_MS, QUERY_EMBED_CACHE_SIZE,
+    CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_SIMILARITY_THRESHOLD, PREWARM_CACHE_PATH,
+    DENSE_WEIGHT, SPARSE_WEIGHT, FUSION_TOP_K, RRF_K, WARMUP_QUERY, CHROMA_FILTER_MAX_IDS, CHROMA_FILTER_OVERFETCH,
+    CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_DUPLICATE_THRESHOLD, CONTEXT_MIN_DOC_TOKENS
+)
 from utils.logger import get_logger
+from utils.metrics import CACHE_HIT_RATIO, gauge_function, stage_timer, track_recommendation
 from utils.custom_exception import CustomException
+from utils.deadline import DeadlineExceeded
+from utils.index_versions import IndexPaths, IndexVersions
 from langchain_core.documents import Document #
 
 logger = get_logger(__name__)
 
 class AnimeRecommendationPipeline:
-    def __init__(self, persist_dir="chroma_db"):
+    def __init__(self, persist_dir=None, docstore_dir=None, bm25_dir=None,
+                 embedding=None, llm=None, cache_enabled=CACHE_ENABLED,
+                 dense_backend=DENSE_BACKEND, dense_dir=None, metadata_dir=None,
+                 fallback_llm=None, hedge_delay=HEDGE_DELAY_SECONDS, prewarm_path=PREWARM_CACHE_PATH,
+                 index_paths: IndexPaths = None):
         try:
-            logger.info("Initializing Hybrid Recommendation Pipeline")
+            # Directories not given explicitly come from the live index version (INDEX_ROOT/CURRENT)
+            index_paths = index_paths or IndexVersions().resolve()
+            persist_dir = persist_dir or index_paths.chroma_dir
+            docstore_dir = docstore_dir or index_paths.docstore_dir
+            bm25_dir = bm25_dir or index_paths.bm25_dir
+            dense_dir = dense_dir or index_paths.dense_dir
+            metadata_dir = metadata_dir or index_paths.metadata_dir
+            self.index_version = index_paths.version
+            logger.info(f"Initializing Hybrid Recommendation Pipeline (index version: {self.index_version or 'legacy'})")
 
             # 1. Load the Vector Store Builder
-            vector_builder = VectorStoreBuilder(csv_path="", persist_dir=persist_dir)
-            vector_store = vector_builder.load_vector_store()
-            
-            # 2. Extract ALL documents for BM25 (Keyword search)
-            logger.info("Extracting documents from vector store for BM25 indexing...")
-            raw_data = vector_store.get(include=["documents", "metadatas"])
-            
-            # Reconstruct LangChain Document objects using the core class
-            all_documents = [
-                Document(page_content=doc, metadata=meta) 
-                for doc, meta in zip(raw_data["documents"], raw_data["metadatas"])
-            ]
-
-            # 3. Initialize the Hybrid Recommender
-            retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+            vector_builder = VectorStoreBuilder(
+                csv_path="", persist_dir=persist_dir, model_name=EMBEDDING_MODEL_PATH, embedding=embedding
+            )
+            # Kept so a hot-swapped index version can reuse the loaded model (same EMBEDDING_MODEL)
+            self.embedding = vector_builder.embedding
+            self.embedding_model = EMBEDDING_MODEL
+            # Queries go through one micro-batched, LRU-cached embedder shared by Chroma and the cache
+            self.query_embedder = QueryEmbeddingService(
+                vector_builder.embedding,
+                max_batch=QUERY_EMBED_MAX_BATCH,
+                max_wait_ms=QUERY_EMBED_MAX_WAIT_MS,
+                cache_size=QUERY_EMBED_CACHE_SIZE
+            )
+
+            # Chroma is opened only for the chroma backend or to rebuild a missing on-disk index
+            vector_store = None
+
+            def chroma():
+                nonlocal vector_store
+                if vector_store is None:
+                    vector_store = vector_builder.load_vector_store(embedding=self.query_embedder)
+                return vector_store
+
+            # 2. Load the prebuilt BM25 index (Keyword search), memory-mapped from disk
+            if not (DocumentStore.exists(docstore_dir) and BM25Index.exists(bm25_dir)):
+                logger.warning("BM25 index not found. Building it once from the vector store; "
+                               "run pipeline/build_pipeline.py to prebuild it.")
+                raw_data = chroma().get(include=["documents", "metadatas"])
+                build_sparse_index(
+                    (Document(page_content=doc, metadata=meta or {})
+                     for doc, meta in zip(raw_data["documents"], raw_data["metadatas"])),
+                    docstore_dir, bm25_dir
+                )
+
+            self.document_store = DocumentStore(docstore_dir)
+            self.bm25_index = BM25Index(bm25_dir)
+            sparse_retriever = BM25IndexRetriever(index=self.bm25_index, store=self.document_store, k=5)
+            logger.info(f"BM25 index loaded with {len(self.document_store)} documents.")
+
+            # 2b. Structured filters: genre bitmaps + sorted scores, rebuilt from the store if stale
+            if not (MetadataIndex.exists(metadata_dir) and MetadataIndex(metadata_dir).matches(self.document_store)):
+                logger.warning("Metadata index missing or out of date. Building it from the document store.")
+                build_metadata_index(self.document_store, metadata_dir)
+            self.metadata_index = MetadataIndex(metadata_dir)
+            logger.info(f"Metadata index loaded with {len(self.metadata_index.genres)} genres.")
+
+            # 3. Dense backend: Chroma, or exact in-process search over the memory-mapped matrix
+            self.dense_index = None
+            if dense_backend == "numpy":
+                if not (DenseIndex.exists(dense_dir) and DenseIndex(dense_dir).matches(self.document_store)):
+                    logger.warning("Dense index missing or out of date. Exporting it once from the vector store; "
+                                   "run pipeline/build_pipeline.py to prebuild it.")
+                    VectorStoreBuilder.export_dense_index(chroma(), self.document_store, dense_dir, DENSE_INDEX_DTYPE)
+                self.dense_index = DenseIndex(dense_dir)
+                retriever = DenseIndexRetriever(
+                    index=self.dense_index, store=self.document_store, embeddings=self.query_embedder, k=5
+                )
+                embedding_lookup = lambda ids: self.dense_index.lookup(ids, self.document_store)
+                logger.info(f"NumPy dense index loaded: {self.dense_index.meta['n_docs']} x "
+                            f"{self.dense_index.meta['dim']} {self.dense_index.meta['dtype']}.")
+            else:
+                retriever = chroma().as_retriever(search_kwargs={"k": 5})
+                embedding_lookup = lambda ids: VectorStoreBuilder.stored_embeddings(vector_store, ids)
+
+            # Response cache reuses the query embedder for its semantic tier (same vector, one encode)
+            self.cache = None
+            if cache_enabled:
+                self.cache = RecommendationCache(
+                    embed_fn=self.query_embedder.embed_query,
+                    max_entries=CACHE_MAX_ENTRIES,
+                    ttl_seconds=CACHE_TTL_SECONDS,
+                    similarity_threshold=CACHE_SIMILARITY_THRESHOLD
+                )
+                gauge_function(CACHE_HIT_RATIO, lambda: self.cache.stats()["hit_ratio"])
+
+                # Known queries answered offline (pipeline/batch_recommend.py) never reach the LLM
+                if prewarm_path:
+                    loaded = self.cache.preload(
+                        read_prewarm_file(prewarm_path), embed_documents=self.query_embedder.embed_documents
+                    )
+                    if loaded:
+                        logger.info(f"Pre-warmed response cache with {loaded} answers from {prewarm_path}.")
+
+            # Token-budgeted context: MMR over the embeddings already stored by the dense backend
+            context_packer = None
+            if CONTEXT_TOKEN_BUDGET > 0:
+                context_packer = ContextPacker(
+                    token_budget=CONTEXT_TOKEN_BUDGET,
+                    embedding_lookup=embedding_lookup,
+                    mmr_lambda=CONTEXT_MMR_LAMBDA,
+                    duplicate_threshold=CONTEXT_DUPLICATE_THRESHOLD,
+                    min_doc_tokens=CONTEXT_MIN_DOC_TOKENS
+                )
 
             self.recommender = AnimeRecommender(
                 chroma_retriever=retriever,
-                all_documents=all_documents,
+                sparse_retriever=sparse_retriever,
                 api_key=GROQ_API_KEY,
-                model_name=MODEL_NAME
+                model_name=MODEL_NAME,
+                retrieval_workers=RETRIEVAL_WORKERS,
+                cache=self.cache,
+                default_options=RetrievalOptions(
+                    dense_weight=DENSE_WEIGHT,
+                    sparse_weight=SPARSE_WEIGHT,
+                    top_k=FUSION_TOP_K
+                ),
+                rrf_k=RRF_K,
+                llm=llm,
+                context_packer=context_packer,
+                metadata_index=self.metadata_index,
+                fallback_llm=fallback_llm,
+                fallback_model_name=FALLBACK_MODEL_NAME,
+                hedge_delay=hedge_delay,
+                llm_timeout=LLM_TIMEOUT_SECONDS,
+                llm_max_retries=LLM_MAX_RETRIES,
+                chroma_filter_max_ids=CHROMA_FILTER_MAX_IDS,
+                chroma_filter_overfetch=CHROMA_FILTER_OVERFETCH
             )
 
             logger.info("Pipeline initialized successfully with Hybrid Search.")
@@ -43,12 +170,86 @@ class AnimeRecommendationPipeline:
             # This captures the version conflict or missing package errors
             raise CustomException("Error during hybrid pipeline initialization", e)
         
-    def recommend(self, query: str) -> str:
+    def retrieval_options(self, dense_weight: float = None, sparse_weight: float = None,
+                          top_k: int = None, filters: MetadataFilter = None) -> RetrievalOptions:
+        """Builds per-request retrieval options on top of the configured defaults."""
+        defaults = self.recommender.default_options
+        if filters is not None:
+            unknown = self.metadata_index.unknown_genres(filters.genres + filters.exclude_genres)
+            if unknown:
+                raise ValueError(f"Unknown genre(s): {', '.join(unknown)}")
+        return RetrievalOptions(
+            dense_weight=defaults.dense_weight if dense_weight is None else dense_weight,
+            sparse_weight=defaults.sparse_weight if sparse_weight is None else sparse_weight,
+            top_k=defaults.top_k if top_k is None else top_k,
+            filters=filters if filters is not None and filters.active() else None
+        )
+
+    def filter_matches(self, options: RetrievalOptions):
+        """How many documents pass the request's filters (None when unfiltered)."""
+        if options.filters is None:
+            return None
+        return len(self.metadata_index.candidates(options.filters))
+
+    def warmup(self, query: str = WARMUP_QUERY):
+        """
+        Runs one retrieval (no LLM call) so the embedding model, Chroma and the
+        BM25 memory maps are loaded before the first real request.
+        """
+        try:
+            docs = self.recommender.retrieve(query)
+            logger.info(f"Warmup retrieval returned {len(docs)} documents.")
+        except Exception as e:
+            logger.error(f"Warmup failed: {str(e)}")
+            raise CustomException("Error during pipeline warmup", e)
+
+    def close(self):
+        """Stops the background embedder and retrieval threads (a swapped-out index version)."""
+        self.query_embedder.close()
+        self.recommender.executor.shutdown(wait=False)
+
+    @staticmethod
+    def parse(raw_output: str):
+        """Splits a finished response into (titles, explanations)."""
+        with stage_timer("parse"):
+            return parse_recommendation(raw_output)
+
+    def recommend(self, query: str, options: RetrievalOptions = None) -> str:
         try:
             logger.info(f"Received query: {query}")
-            recommendation = self.recommender.get_recommendation(query)
+            with track_recommendation("sync"):
+                recommendation = self.recommender.get_recommendation(query, options)
             logger.info("Recommendation generated successfully.")
             return recommendation
         except Exception as e:
             logger.error(f"Failed to get recommendation: {str(e)}")
-            raise CustomException("Error during recommendation generation", e)
\ No newline at end of file
+            raise CustomException("Error during recommendation generation", e)
+
+    async def arecommend(self, query: str, options: RetrievalOptions = None, deadline=None) -> str:
+        try:
+            logger.info(f"Received async query: {query}")
+            with track_recommendation("async"):
+                recommendation = await self.recommender.aget_recommendation(query, options, deadline)
+            logger.info("Recommendation generated successfully.")
+            return recommendation
+        except DeadlineExceeded as e:
+            # Not a failure of the engine: the caller degrades to retrieval-only results
+            logger.warning(f"{str(e)} for query: {query}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get recommendation: {str(e)}")
+            raise CustomException("Error during recommendation generation", e)
+
+    async def astream_recommend(self, query: str, options: RetrievalOptions = None, deadline=None):
+        try:
+            logger.info(f"Received streaming query: {query}")
+            with track_recommendation("stream"):
+                async for chunk in self.recommender.astream_recommendation(query, options, deadline):
+                    yield chunk
+            logger.info("Streaming recommendation completed.")
+        except DeadlineExceeded as e:
+            logger.warning(f"{str(e)} for streaming query: {query}")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to stream recommendation: {str(e)}")
+            raise CustomException("Error during streaming recommendation", e)
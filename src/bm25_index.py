@@ -0,0 +1,159 @@
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.document_store import DocumentStoreWriter
+
+VOCAB_FILE = "vocab.json"
+META_FILE = "bm25_meta.json"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25IndexWriter:
+    """
+    Builds a BM25 term-document matrix in CSR layout (one row per term).
+
+    Because k1, b and the corpus statistics are fixed at build time, the full
+    BM25 contribution of every (term, doc) pair is precomputed, so scoring a
+    query is just summing a few posting rows.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self._term_ids = array("i")
+        self._doc_ids = array("i")
+        self._tfs = array("i")
+        self._doc_lens = array("i")
+
+    def add(self, text: str):
+        doc = len(self._doc_lens)
+        tokens = tokenize(text)
+        self._doc_lens.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocab.setdefault(term, len(self.vocab))
+            self._term_ids.append(term_id)
+            self._doc_ids.append(doc)
+            self._tfs.append(tf)
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+
+        n_docs = len(self._doc_lens)
+        term_ids = np.frombuffer(self._term_ids, dtype=np.int32)
+        doc_ids = np.frombuffer(self._doc_ids, dtype=np.int32)
+        tfs = np.frombuffer(self._tfs, dtype=np.int32).astype(np.float32)
+        doc_lens = np.frombuffer(self._doc_lens, dtype=np.int32).astype(np.float32)
+
+        # Corpus statistics: document frequency, IDF and per-document length norms
+        df = np.bincount(term_ids, minlength=len(self.vocab)).astype(np.float32)
+        idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0).astype(np.float32)
+        avgdl = float(doc_lens.mean()) if n_docs else 0.0
+        length_norm = (self.k1 * (1 - self.b + self.b * doc_lens / avgdl)) if avgdl else doc_lens
+
+        weights = idf[term_ids] * tfs * (self.k1 + 1) / (tfs + length_norm[doc_ids])
+
+        # Sort postings by term to get CSR rows
+        order = np.argsort(term_ids, kind="stable")
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=indptr[1:])
+
+        np.save(os.path.join(index_dir, "indptr.npy"), indptr)
+        np.save(os.path.join(index_dir, "postings_docs.npy"), doc_ids[order])
+        np.save(os.path.join(index_dir, "postings_weights.npy"), weights[order].astype(np.float32))
+        np.save(os.path.join(index_dir, "idf.npy"), idf)
+        np.save(os.path.join(index_dir, "length_norm.npy"), np.asarray(length_norm, dtype=np.float32))
+
+        with open(os.path.join(index_dir, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.vocab, f)
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "n_docs": n_docs, "avgdl": avgdl}, f)
+
+
+class BM25Index:
+    """Memory-mapped BM25 index with vectorized scoring and top-k selection."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, VOCAB_FILE), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.indptr = load("indptr.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_weights = load("postings_weights.npy")
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, META_FILE))
+
+    def search(self, query: str, k: int = 5, candidates=None):
+        """
+        Returns [(doc_position, score), ...] best first. `candidates` (sorted
+        positions from a metadata filter) restricts scoring to those documents.
+        """
+        rows = [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+        if not rows or (candidates is not None and not len(candidates)):
+            return []
+
+        docs = np.concatenate([self.postings_docs[self.indptr[r]:self.indptr[r + 1]] for r in rows])
+        weights = np.concatenate([self.postings_weights[self.indptr[r]:self.indptr[r + 1]] for r in rows])
+
+        if candidates is not None:
+            keep = np.isin(docs, candidates)
+            docs, weights = docs[keep], weights[keep]
+            if not len(docs):
+                return []
+
+        # Sum contributions per document: cost scales with postings touched, not corpus size
+        order = np.argsort(docs, kind="stable")
+        docs = docs[order]
+        unique_docs, starts = np.unique(docs, return_index=True)
+        scores = np.add.reduceat(weights[order], starts)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(unique_docs[i]), float(scores[i])) for i in top]
+
+
+class BM25IndexRetriever(BaseRetriever):
+    """LangChain retriever over a prebuilt BM25Index + DocumentStore."""
+
+    index: Any
+    store: Any
+    k: int = 5
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, candidates=None
+    ) -> List[Document]:
+        return [self.store.get_document(pos) for pos, _ in self.index.search(query, self.k, candidates)]
+
+
+def build_sparse_index(documents, docstore_dir: str, bm25_dir: str):
+    """Writes the document store and BM25 index for the given chunks."""
+    store_writer = DocumentStoreWriter(docstore_dir)
+    bm25_writer = BM25IndexWriter()
+    for doc in documents:
+        store_writer.add(doc.page_content, doc.metadata, doc.metadata.get("doc_id"))
+        bm25_writer.add(doc.page_content)
+    store_writer.close()
+    bm25_writer.save(bm25_dir)
@@ -0,0 +1,203 @@
+import re
+from dataclasses import dataclass
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.document_store import document_id
+
+# Llama-family tokenizers average ~4 characters per English token
+CHARS_PER_TOKEN = 4
+CONTEXT_SEPARATOR = "\n\n"
+
+# Row text is "Title: ... Overview: <synopsis> Genres: ..."; only the synopsis is cut
+_SECTIONS = re.compile(r"^(?P<head>.*?Overview:\s*)(?P<overview>.*?)(?P<tail>\s*Genres:.*)?$", re.S)
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Cuts `text` to roughly `max_tokens`, preferring a sentence (then word) boundary."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = cut.rfind(". ")
+    if sentence_end >= limit // 2:
+        return cut[:sentence_end + 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > 0 else cut) + "…"
+
+
+@dataclass
+class PackedContext:
+    """Prompt context plus what packing removed."""
+
+    text: str
+    documents: list
+    tokens_in: int
+    tokens_out: int
+    dropped: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+class ContextPacker:
+    """
+    Fits fused retrieval results into a token budget before the LLM call.
+
+    1. Chunks of the same title (mal_id) collapse into one candidate.
+    2. Candidates are ordered by MMR over their stored embeddings, starting from
+       the fusion ranking; near-duplicates (cosine >= duplicate_threshold) are dropped.
+    3. Synopses are truncated (title and genres kept intact) so every surviving
+       title fits the budget; if even `min_doc_tokens` each does not fit, the
+       lowest-ranked titles go first.
+    """
+
+    def __init__(self, token_budget: int, embedding_lookup=None, mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.95, min_doc_tokens: int = 48):
+        self.token_budget = token_budget
+        self.embedding_lookup = embedding_lookup
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_doc_tokens = min_doc_tokens
+
+    # --- 1. COLLAPSE CHUNKS PER TITLE ---
+
+    @staticmethod
+    def _title_key(doc):
+        mal_id = doc.metadata.get("mal_id", doc.metadata.get("MAL_ID"))
+        return f"mal:{mal_id}" if mal_id is not None else document_id(doc)
+
+    def _collapse(self, docs):
+        groups = {}
+        for doc in docs:
+            groups.setdefault(self._title_key(doc), []).append(doc)
+
+        collapsed = []
+        for chunks in groups.values():
+            if len(chunks) == 1:
+                collapsed.append(chunks[0])
+                continue
+            # Best-ranked chunk keeps its metadata (and embedding id); text follows source order
+            ordered = sorted(chunks, key=lambda d: d.metadata.get("chunk", 0))
+            text = " ".join(dict.fromkeys(d.page_content for d in ordered))
+            collapsed.append(Document(page_content=text, metadata=dict(chunks[0].metadata)))
+        return collapsed
+
+    # --- 2. MMR / NEAR-DUPLICATE PRUNING ---
+
+    def _vectors(self, docs):
+        if self.embedding_lookup is None:
+            return None
+        ids = [document_id(doc) for doc in docs]
+        found = self.embedding_lookup(ids)
+
+        dim = next((len(v) for v in found.values() if v is not None), 0)
+        if not dim:
+            return None
+        # Missing embeddings become zero vectors: never similar to anything
+        matrix = np.zeros((len(docs), dim), dtype=np.float32)
+        for i, key in enumerate(ids):
+            if found.get(key) is not None:
+                matrix[i] = found[key]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _mmr_order(self, docs):
+        """Returns (indices in MMR order, number of near-duplicates dropped)."""
+        n = len(docs)
+        vectors = self._vectors(docs)
+        if vectors is None:
+            return list(range(n)), 0
+
+        # Fusion order is the relevance signal: 1.0 for the top hit down to 1/n
+        relevance = 1.0 - np.arange(n) / n
+        similarity = vectors @ vectors.T
+
+        selected, remaining, dropped = [], list(range(n)), 0
+        while remaining:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining))
+
+            duplicates = redundancy >= self.duplicate_threshold
+            if duplicates.any():
+                dropped += int(duplicates.sum())
+                remaining = [r for r, dup in zip(remaining, duplicates) if not dup]
+                redundancy = redundancy[~duplicates]
+                if not remaining:
+                    break
+
+            scores = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            selected.append(remaining.pop(int(np.argmax(scores))))
+        return selected, dropped
+
+    # --- 3. FIT THE BUDGET ---
+
+    def _fit(self, docs):
+        parts = []
+        for doc in docs:
+            match = _SECTIONS.match(doc.page_content)
+            if match and match.group("overview"):
+                parts.append((match.group("head"), match.group("overview"), match.group("tail") or ""))
+            else:
+                parts.append(("", doc.page_content, ""))
+
+        separators = estimate_tokens(CONTEXT_SEPARATOR) * max(len(parts) - 1, 0)
+        fixed = [estimate_tokens(head) + estimate_tokens(tail) for head, _, tail in parts]
+        wanted = [estimate_tokens(overview) for _, overview, _ in parts]
+
+        if sum(fixed) + sum(wanted) + separators <= self.token_budget:
+            return [doc.page_content for doc in docs], 0
+
+        # Drop from the bottom until every title can keep at least min_doc_tokens of synopsis
+        kept = len(parts)
+        while kept > 1:
+            floor = sum(fixed[:kept]) + sum(min(w, self.min_doc_tokens) for w in wanted[:kept])
+            if floor + estimate_tokens(CONTEXT_SEPARATOR) * (kept - 1) <= self.token_budget:
+                break
+            kept -= 1
+        parts, fixed, wanted = parts[:kept], fixed[:kept], wanted[:kept]
+
+        # Water-filling: short synopses keep everything, long ones share what is left
+        available = self.token_budget - sum(fixed) - estimate_tokens(CONTEXT_SEPARATOR) * (kept - 1)
+        allowance = [0] * kept
+        pending = sorted(range(kept), key=lambda i: wanted[i])
+        while pending:
+            share = max(available // len(pending), 0)
+            i = pending.pop(0)
+            allowance[i] = min(wanted[i], max(share, min(wanted[i], self.min_doc_tokens)))
+            available -= allowance[i]
+
+        texts = [
+            head + truncate_text(overview, allowance[i]) + tail
+            for i, (head, overview, tail) in enumerate(parts)
+        ]
+        return texts, len(docs) - kept
+
+    # --- PUBLIC API ---
+
+    def pack(self, docs) -> PackedContext:
+        tokens_in = estimate_tokens(CONTEXT_SEPARATOR.join(doc.page_content for doc in docs))
+        if not docs:
+            return PackedContext("", [], 0, 0, 0)
+
+        candidates = self._collapse(docs)
+        order, duplicates = self._mmr_order(candidates)
+        ranked = [candidates[i] for i in order]
+
+        texts, over_budget = self._fit(ranked)
+        text = CONTEXT_SEPARATOR.join(texts)
+        return PackedContext(
+            text=text,
+            documents=ranked[:len(texts)],
+            tokens_in=tokens_in,
+            tokens_out=estimate_tokens(text),
+            dropped=(len(docs) - len(candidates)) + duplicates + over_budget
+        )
@@ -0,0 +1,173 @@
+import json
+import os
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.fingerprint import ids_fingerprint
+
+MATRIX_FILE = "embeddings.npy"
+IDS_FILE = "ids.npy"
+META_FILE = "dense_meta.json"
+
+# Rows scored per block when the matrix is float16 (upcast block by block, not all at once)
+SCORE_BLOCK_ROWS = 4096
+
+
+class DenseIndexWriter:
+    """
+    Writes an L2-normalized embedding matrix whose row i is DocumentStore position i,
+    so dense and sparse results share document positions. Rows are written straight
+    into a memory-mapped .npy, batch by batch.
+    """
+
+    def __init__(self, index_dir: str, ids, dim: int, dtype: str = "float32"):
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_dir = index_dir
+        self.ids = list(ids)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._matrix = np.lib.format.open_memmap(
+            os.path.join(index_dir, MATRIX_FILE), mode="w+", dtype=self.dtype, shape=(len(self.ids), dim)
+        )
+        self._written = 0
+
+    def write(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        self._matrix[self._written:self._written + len(vectors)] = vectors.astype(self.dtype)
+        self._written += len(vectors)
+
+    def close(self):
+        if self._written != len(self.ids):
+            raise ValueError(f"Dense index incomplete: {self._written} of {len(self.ids)} rows written.")
+        self._matrix.flush()
+        del self._matrix
+        np.save(os.path.join(self.index_dir, IDS_FILE), np.asarray(self.ids, dtype=str))
+        with open(os.path.join(self.index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "n_docs": len(self.ids),
+                "dim": self.dim,
+                "dtype": self.dtype.name,
+                "ids_sha1": ids_fingerprint(self.ids),
+            }, f)
+
+
+class DenseIndex:
+    """
+    Exact cosine search over a memory-mapped embedding matrix: one matrix-vector
+    product plus argpartition top-k. Loading maps the file; nothing is read up front.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.matrix = np.load(os.path.join(index_dir, MATRIX_FILE), mmap_mode="r")
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, META_FILE))
+
+    @property
+    def ids(self):
+        return np.load(os.path.join(self.index_dir, IDS_FILE), mmap_mode="r")
+
+    def matches(self, store) -> bool:
+        """True when the rows line up with the given DocumentStore."""
+        return self.meta["n_docs"] == len(store) and self.meta["ids_sha1"] == store.fingerprint
+
+    def _scores(self, query, candidates=None):
+        if candidates is not None:
+            # Filtered search only gathers and scores the candidate rows
+            return self.matrix[candidates].astype(np.float32, copy=False) @ query
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+        scores = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores
+
+    def search(self, vector, k: int = 5, candidates=None):
+        """
+        Returns [(doc_position, cosine), ...] best first. `candidates` (sorted
+        positions from a metadata filter) restricts the search to those rows.
+        """
+        if not len(self.matrix) or (candidates is not None and not len(candidates)):
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        scores = self._scores(query, candidates)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        positions = top if candidates is None else np.asarray(candidates)[top]
+        return [(int(p), float(scores[i])) for p, i in zip(positions, top)]
+
+    def search_batch(self, vectors, k: int = 5):
+        """
+        Unfiltered search for many queries at once: one (queries x docs) matrix
+        product per block of rows instead of a matrix-vector product per query.
+        """
+        queries = np.asarray(vectors, dtype=np.float32)
+        if not len(queries):
+            return []
+        if not len(self.matrix):
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        scores = np.empty((len(queries), len(self.matrix)), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[:, start:start + len(block)] = queries @ block.astype(np.float32, copy=False).T
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+        return [[(int(p), float(v)) for p, v in zip(row, row_scores)] for row, row_scores in zip(top, top_scores)]
+
+    def lookup(self, ids, store) -> dict:
+        """Stored vectors by document id (same contract as VectorStoreBuilder.stored_embeddings)."""
+        positions = {doc_id: store.position(doc_id) for doc_id in ids}
+        return {
+            doc_id: np.asarray(self.matrix[position], dtype=np.float32)
+            for doc_id, position in positions.items() if position is not None
+        }
+
+
+class DenseIndexRetriever(BaseRetriever):
+    """LangChain retriever over a DenseIndex + DocumentStore; queries embedded by `embeddings`."""
+
+    index: Any
+    store: Any
+    embeddings: Any
+    k: int = 5
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, candidates=None
+    ) -> List[Document]:
+        if candidates is not None and not len(candidates):
+            return []
+        vector = self.embeddings.embed_query(query)
+        return [self.store.get_document(pos) for pos, _ in self.index.search(vector, self.k, candidates)]
+
+    def batch_documents(self, queries) -> List[List[Document]]:
+        """Unfiltered retrieval for many queries: one embedding pass, one blocked matrix product."""
+        vectors = self.embeddings.embed_documents(list(queries))
+        return [
+            [self.store.get_document(pos) for pos, _ in hits]
+            for hits in self.index.search_batch(vectors, self.k)
+        ]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import mmap
+import os
+from collections.abc import Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.fingerprint import ids_fingerprint
+
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata_offsets.npy"
+IDS_FILE = "ids.npy"
+SORTED_IDS_FILE = "sorted_ids.npy"
+SORTED_POSITIONS_FILE = "sorted_positions.npy"
+META_FILE = "store_meta.json"
+
+
+def content_id(text: str) -> str:
+    """Stable id derived from the chunk text itself."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def document_id(doc: Document) -> str:
+    """Id used to match the same chunk across retrievers."""
+    return doc.metadata.get("doc_id") or content_id(doc.page_content)
+
+
+class DocumentStoreWriter:
+    """
+    Streams chunk texts and their JSON metadata into two UTF-8 blobs with offset
+    arrays; ids go into fixed-width byte arrays, plus a sorted copy for lookups.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self._texts = open(os.path.join(store_dir, TEXTS_FILE), "wb")
+        self._metadata = open(os.path.join(store_dir, METADATA_FILE), "wb")
+        self._offsets = [0]
+        self._metadata_offsets = [0]
+        self._ids = []
+
+    def add(self, text: str, metadata: dict = None, doc_id: str = None) -> int:
+        data = text.encode("utf-8")
+        self._texts.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+        meta = json.dumps(metadata or {}).encode("utf-8")
+        self._metadata.write(meta)
+        self._metadata_offsets.append(self._metadata_offsets[-1] + len(meta))
+
+        self._ids.append(doc_id or content_id(text))
+        return len(self._ids) - 1
+
+    def close(self):
+        self._texts.close()
+        self._metadata.close()
+        save = lambda name, array: np.save(os.path.join(self.store_dir, name), array)
+        save(OFFSETS_FILE, np.asarray(self._offsets, dtype=np.int64))
+        save(METADATA_OFFSETS_FILE, np.asarray(self._metadata_offsets, dtype=np.int64))
+
+        ids = np.asarray([doc_id.encode("utf-8") for doc_id in self._ids], dtype=np.bytes_)
+        order = np.argsort(ids, kind="stable")
+        save(IDS_FILE, ids)
+        save(SORTED_IDS_FILE, ids[order])
+        save(SORTED_POSITIONS_FILE, order.astype(np.int64))
+
+        # Written last: its presence marks a complete store
+        with open(os.path.join(self.store_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": len(self._ids), "ids_sha1": ids_fingerprint(self._ids)}, f)
+
+
+def _map_blob(path: str):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+
+class _LazySequence(Sequence):
+    """Read-only list view that decodes one item at a time from the memory maps."""
+
+    def __init__(self, length: int, get):
+        self._length = length
+        self._get = get
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return self._get(index)
+
+
+class DocumentStore:
+    """
+    Read-only, memory-mapped view over the chunk texts written at build time.
+    Positions in this store are the row numbers shared by the on-disk indexes.
+
+    Nothing is decoded up front: texts, metadata and ids are read per position,
+    and an id is found by binary search over the sorted id array. Opening the
+    store costs the same at any size, and forked workers share its pages.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # Fingerprint of the id order, compared by indexes built from this store
+        self.fingerprint = self.meta["ids_sha1"]
+
+        load = lambda name: np.load(os.path.join(store_dir, name), mmap_mode="r")
+        self.offsets = load(OFFSETS_FILE)
+        self.metadata_offsets = load(METADATA_OFFSETS_FILE)
+        self._ids = load(IDS_FILE)
+        self._sorted_ids = load(SORTED_IDS_FILE)
+        self._sorted_positions = load(SORTED_POSITIONS_FILE)
+
+        self._texts = _map_blob(os.path.join(store_dir, TEXTS_FILE))
+        self._metadata = _map_blob(os.path.join(store_dir, METADATA_FILE))
+
+        n_docs = self.meta["n_docs"]
+        self.ids = _LazySequence(n_docs, lambda i: self._ids[i].decode("utf-8"))
+        self.metadatas = _LazySequence(n_docs, self.get_metadata)
+
+    @staticmethod
+    def exists(store_dir: str) -> bool:
+        return os.path.exists(os.path.join(store_dir, META_FILE))
+
+    def __len__(self):
+        return self.meta["n_docs"]
+
+    def position(self, doc_id: str):
+        """Position of a chunk id, or None when it is not in the store."""
+        key = doc_id.encode("utf-8")
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._sorted_positions[i])
+        return None
+
+    def get_text(self, position: int) -> str:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return self._texts[start:end].decode("utf-8")
+
+    def get_metadata(self, position: int) -> dict:
+        start, end = int(self.metadata_offsets[position]), int(self.metadata_offsets[position + 1])
+        return json.loads(self._metadata[start:end])
+
+    def get_document(self, position: int) -> Document:
+        metadata = self.get_metadata(position)
+        metadata["doc_id"] = self.ids[position]
+        return Document(page_content=self.get_text(position), metadata=metadata)
@@ -0,0 +1,57 @@
+import os
+import time
+
+from sentence_transformers import SentenceTransformer
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingPool:
+    """
+    Offline embedding stage for index builds.
+
+    Wraps a SentenceTransformer with a configurable batch size and, when more
+    than one worker is requested, a multi-process pool that spreads batches over
+    all CPU cores. Use as a context manager so worker processes are shut down.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64, workers: int = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.model = None
+        self.pool = None
+
+        self.documents_embedded = 0
+        self.seconds_embedding = 0.0
+
+    def __enter__(self):
+        self.model = SentenceTransformer(self.model_name, device="cpu")
+        if self.workers > 1:
+            logger.info(f"Starting embedding pool with {self.workers} worker processes.")
+            self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+    def embed(self, texts):
+        # Same preprocessing as HuggingFaceEmbeddings so build and query vectors agree
+        texts = [t.replace("\n", " ") for t in texts]
+
+        start = time.perf_counter()
+        if self.pool is not None:
+            vectors = self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size)
+        self.seconds_embedding += time.perf_counter() - start
+        self.documents_embedded += len(texts)
+
+        return vectors.tolist()
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents_embedded / self.seconds_embedding if self.seconds_embedding else 0.0
@@ -0,0 +1,6 @@
+import hashlib
+
+
+def ids_fingerprint(ids) -> str:
+    """Identity of an ordered id list; on-disk indexes store it to detect a stale build."""
+    return hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()
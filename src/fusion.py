@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+from src.document_store import document_id
+from src.metadata_index import MetadataFilter
+
+
+@dataclass(frozen=True)
+class RetrievalOptions:
+    """Per-request knobs for hybrid retrieval."""
+
+    dense_weight: float = 1.0
+    sparse_weight: float = 1.0
+    top_k: int = 5
+    filters: MetadataFilter = None
+
+    def __post_init__(self):
+        if self.dense_weight < 0 or self.sparse_weight < 0:
+            raise ValueError("dense_weight and sparse_weight must not be negative.")
+        if self.dense_weight == 0 and self.sparse_weight == 0:
+            # Fusion would skip both lists and retrieve nothing
+            raise ValueError("At least one of dense_weight and sparse_weight must be greater than 0.")
+
+    def cache_scope(self) -> tuple:
+        """Responses are only reused between requests retrieving the same way."""
+        filters = self.filters.key() if self.filters is not None and self.filters.active() else None
+        return (self.dense_weight, self.sparse_weight, self.top_k, filters)
+
+
+def reciprocal_rank_fusion(ranked_lists, weights, top_k: int = 5, rrf_k: int = 60):
+    """
+    Weighted reciprocal-rank fusion.
+
+    Each document scores sum(weight / (rrf_k + rank)) over the lists it appears in,
+    keyed on its stable document id so the same chunk from both retrievers merges.
+    """
+    scores = {}
+    docs = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        if weight <= 0:
+            continue
+        for rank, doc in enumerate(ranked, start=1):
+            key = document_id(doc)
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [docs[key] for key in best]
@@ -0,0 +1,143 @@
+import json
+import os
+
+import numpy as np
+
+from src.metadata_index import split_genres
+
+MAL_IDS_FILE = "knn_mal_ids.npy"
+NEIGHBORS_FILE = "knn_neighbors.npy"
+SCORES_FILE = "knn_scores.npy"
+NAMES_FILE = "knn_names.json"
+META_FILE = "knn_meta.json"
+
+# Chunk rows summed into title vectors per step (bounds the float32 upcast of a float16 matrix)
+SUM_BLOCK_ROWS = 4096
+
+
+def _title_vectors(dense, store):
+    """Mean of each title's chunk embeddings (L2-normalized), titles sorted by MAL_ID."""
+    mal_ids = np.asarray([m.get("mal_id", -1) if m else -1 for m in store.metadatas], dtype=np.int64)
+    titles, rows = np.unique(mal_ids[mal_ids >= 0], return_inverse=True)
+    positions = np.flatnonzero(mal_ids >= 0)
+
+    vectors = np.zeros((len(titles), dense.matrix.shape[1]), dtype=np.float32)
+    for start in range(0, len(positions), SUM_BLOCK_ROWS):
+        block = positions[start:start + SUM_BLOCK_ROWS]
+        np.add.at(vectors, rows[start:start + len(block)], dense.matrix[block].astype(np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1, norms)
+
+    # Name and genres come from each title's first chunk
+    first = {}
+    for position, row in zip(positions, rows):
+        first.setdefault(int(row), store.metadatas[position])
+    names = [first[i].get("name", str(titles[i])) for i in range(len(titles))]
+    genres = [split_genres(first[i].get("genres")) for i in range(len(titles))]
+    return titles, vectors, names, genres
+
+
+def _genre_matrix(genres):
+    vocab = {}
+    rows = [[vocab.setdefault(g, len(vocab)) for g in title_genres] for title_genres in genres]
+    matrix = np.zeros((len(genres), max(len(vocab), 1)), dtype=np.float32)
+    for i, columns in enumerate(rows):
+        matrix[i, columns] = 1.0
+    return matrix
+
+
+def build_knn_graph(dense, store, graph_dir: str, n_neighbors: int = 20, genre_weight: float = 0.2,
+                    block_rows: int = 512):
+    """
+    Item-to-item nearest neighbours for every title, from the embeddings the
+    dense index already holds. Similarity is cosine between title vectors,
+    blended with genre Jaccard overlap:
+
+        score = (1 - genre_weight) * cosine + genre_weight * jaccard
+
+    Titles are scored `block_rows` at a time against all others, so memory
+    stays at block_rows x titles. Stored as (titles x n_neighbors) arrays of
+    row numbers and float16 scores, rows ordered by MAL_ID.
+    """
+    titles, vectors, names, genres = _title_vectors(dense, store)
+    n_titles = len(titles)
+    n_neighbors = max(0, min(n_neighbors, n_titles - 1))
+
+    genre_matrix = _genre_matrix(genres) if genre_weight > 0 else None
+    genre_counts = genre_matrix.sum(axis=1) if genre_matrix is not None else None
+
+    neighbors = np.zeros((n_titles, n_neighbors), dtype=np.int32)
+    scores = np.zeros((n_titles, n_neighbors), dtype=np.float16)
+    for start in range(0, n_titles, block_rows):
+        end = min(start + block_rows, n_titles)
+        sims = vectors[start:end] @ vectors.T
+        if genre_matrix is not None:
+            overlap = genre_matrix[start:end] @ genre_matrix.T
+            union = genre_counts[start:end, None] + genre_counts[None, :] - overlap
+            sims = (1 - genre_weight) * sims + genre_weight * (overlap / np.maximum(union, 1))
+        sims[np.arange(end - start), np.arange(start, end)] = -np.inf
+        if not n_neighbors:
+            continue
+
+        top = np.argpartition(-sims, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        top_scores = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        neighbors[start:end] = np.take_along_axis(top, order, axis=1)
+        scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+    os.makedirs(graph_dir, exist_ok=True)
+    np.save(os.path.join(graph_dir, MAL_IDS_FILE), titles)
+    np.save(os.path.join(graph_dir, NEIGHBORS_FILE), neighbors)
+    np.save(os.path.join(graph_dir, SCORES_FILE), scores)
+    with open(os.path.join(graph_dir, NAMES_FILE), "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    with open(os.path.join(graph_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "n_titles": n_titles,
+            "n_neighbors": n_neighbors,
+            "genre_weight": genre_weight,
+            "ids_sha1": store.fingerprint,
+        }, f)
+    return n_titles
+
+
+class KnnGraph:
+    """
+    Read-only, memory-mapped neighbour arrays. A lookup is a binary search over
+    the sorted MAL_IDs plus one row read, so it needs no model, index or LLM.
+    """
+
+    def __init__(self, graph_dir: str):
+        with open(os.path.join(graph_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(graph_dir, NAMES_FILE), encoding="utf-8") as f:
+            self.names = json.load(f)
+        load = lambda name: np.load(os.path.join(graph_dir, name), mmap_mode="r")
+        self.mal_ids = load(MAL_IDS_FILE)
+        self.neighbor_rows = load(NEIGHBORS_FILE)
+        self.scores = load(SCORES_FILE)
+
+    @staticmethod
+    def exists(graph_dir: str) -> bool:
+        return os.path.exists(os.path.join(graph_dir, META_FILE))
+
+    def __len__(self):
+        return self.meta["n_titles"]
+
+    def _row(self, mal_id: int):
+        row = int(np.searchsorted(self.mal_ids, mal_id))
+        return row if row < len(self.mal_ids) and self.mal_ids[row] == mal_id else None
+
+    def name(self, mal_id: int):
+        row = self._row(mal_id)
+        return None if row is None else self.names[row]
+
+    def neighbors(self, mal_id: int, k: int = 10):
+        """[(mal_id, name, score), ...] best first; None for an unknown MAL_ID."""
+        row = self._row(mal_id)
+        if row is None:
+            return None
+        rows = self.neighbor_rows[row, :k]
+        mal_ids = self.mal_ids[rows].tolist()
+        scores = self.scores[row, :k].astype(np.float32).tolist()
+        return [(mal_id, self.names[r], round(s, 4)) for mal_id, r, s in zip(mal_ids, rows.tolist(), scores)]
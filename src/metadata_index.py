@@ -0,0 +1,184 @@
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.fingerprint import ids_fingerprint
+
+GENRES_FILE = "genres.json"
+META_FILE = "metadata_meta.json"
+
+
+def split_genres(genres) -> list:
+    if not genres:
+        return []
+    if isinstance(genres, str):
+        genres = genres.split(",")
+    return [g.strip() for g in genres if g and g.strip()]
+
+
+@dataclass(frozen=True)
+class MetadataFilter:
+    """Structured constraints applied before dense / BM25 scoring."""
+
+    genres: tuple = ()            # every listed genre must be present
+    exclude_genres: tuple = ()
+    min_score: float = None
+    max_score: float = None
+    mal_ids: tuple = ()
+
+    def active(self) -> bool:
+        return bool(self.genres or self.exclude_genres or self.mal_ids
+                    or self.min_score is not None or self.max_score is not None)
+
+    def matches_metadata(self, metadata: dict) -> bool:
+        """Exact check of one document's own metadata (results of a coarser backend filter)."""
+        genres = {g.lower() for g in split_genres(metadata.get("genres"))}
+        if any(g.lower() not in genres for g in self.genres):
+            return False
+        if any(g.lower() in genres for g in self.exclude_genres):
+            return False
+        score = metadata.get("score")
+        if self.min_score is not None and (score is None or score < self.min_score):
+            return False
+        if self.max_score is not None and (score is None or score > self.max_score):
+            return False
+        return not self.mal_ids or metadata.get("mal_id") in self.mal_ids
+
+    def key(self) -> tuple:
+        """Order-insensitive form used in cache scopes."""
+        return (
+            tuple(sorted(g.lower() for g in self.genres)),
+            tuple(sorted(g.lower() for g in self.exclude_genres)),
+            self.min_score, self.max_score,
+            tuple(sorted(self.mal_ids)),
+        )
+
+
+class MetadataIndexWriter:
+    """
+    Collects genres, score and MAL_ID per document-store position and writes:
+      genre_bitmaps.npy  one packed bitmap per genre (bit i = position i)
+      scores.npy         score per position (NaN when unknown)
+      score_order.npy    positions with a score, sorted by score (range filters)
+      mal_ids.npy        MAL_ID per position
+    """
+
+    def __init__(self):
+        self.genres = {}
+        self._genre_rows = []
+        self._scores = []
+        self._mal_ids = []
+        self._ids = []
+
+    def add(self, metadata: dict, doc_id: str):
+        names = split_genres(metadata.get("genres"))
+        self._genre_rows.append([self.genres.setdefault(g, len(self.genres)) for g in names])
+        score = metadata.get("score")
+        self._scores.append(np.nan if score is None else float(score))
+        self._mal_ids.append(int(metadata.get("mal_id", -1)))
+        self._ids.append(doc_id)
+
+    def save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        n_docs = len(self._ids)
+
+        bits = np.zeros((len(self.genres), n_docs), dtype=bool)
+        for position, genre_ids in enumerate(self._genre_rows):
+            bits[genre_ids, position] = True
+        np.save(os.path.join(index_dir, "genre_bitmaps.npy"), np.packbits(bits, axis=1))
+
+        scores = np.asarray(self._scores, dtype=np.float32)
+        scored = np.flatnonzero(~np.isnan(scores))
+        np.save(os.path.join(index_dir, "scores.npy"), scores)
+        np.save(os.path.join(index_dir, "score_order.npy"),
+                scored[np.argsort(scores[scored], kind="stable")].astype(np.int32))
+        np.save(os.path.join(index_dir, "mal_ids.npy"), np.asarray(self._mal_ids, dtype=np.int64))
+
+        with open(os.path.join(index_dir, GENRES_FILE), "w", encoding="utf-8") as f:
+            json.dump(list(self.genres), f)
+        with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": n_docs, "ids_sha1": ids_fingerprint(self._ids)}, f)
+
+
+class MetadataIndex:
+    """
+    Memory-mapped genre bitmaps + sorted score index over document-store positions.
+    Filters combine as bitwise ANDs on packed bitmaps and come back as a sorted
+    position array that the dense and BM25 indexes score directly.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, GENRES_FILE), encoding="utf-8") as f:
+            self.genres = json.load(f)
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.genre_ids = {g.lower(): i for i, g in enumerate(self.genres)}
+
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.bitmaps = load("genre_bitmaps.npy")
+        self.scores = load("scores.npy")
+        self.score_order = load("score_order.npy")
+        self.mal_ids = load("mal_ids.npy")
+        self._sorted_scores = np.asarray(self.scores[self.score_order])
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, META_FILE))
+
+    def __len__(self):
+        return self.meta["n_docs"]
+
+    def matches(self, store) -> bool:
+        return self.meta["n_docs"] == len(store) and self.meta["ids_sha1"] == store.fingerprint
+
+    def unknown_genres(self, names) -> list:
+        return [g for g in names if g.lower() not in self.genre_ids]
+
+    def canonical_genre(self, name: str) -> str:
+        """Genre as spelled in the catalog ('action' -> 'Action'); unknown names come back as given."""
+        gid = self.genre_ids.get(name.lower())
+        return name if gid is None else self.genres[gid]
+
+    def _pack(self, positions):
+        bits = np.zeros(len(self), dtype=bool)
+        bits[positions] = True
+        return np.packbits(bits)
+
+    def candidates(self, filters: MetadataFilter):
+        """Sorted positions passing every filter (None when no filter is active)."""
+        if filters is None or not filters.active():
+            return None
+
+        packed = np.full((len(self) + 7) // 8, 0xFF, dtype=np.uint8)
+        for genre in filters.genres:
+            gid = self.genre_ids.get(genre.lower())
+            if gid is None:
+                return np.empty(0, dtype=np.int64)
+            packed &= self.bitmaps[gid]
+        for genre in filters.exclude_genres:
+            gid = self.genre_ids.get(genre.lower())
+            if gid is not None:
+                packed &= ~self.bitmaps[gid]
+
+        if filters.min_score is not None or filters.max_score is not None:
+            lo = 0 if filters.min_score is None else np.searchsorted(self._sorted_scores, filters.min_score, "left")
+            hi = (len(self._sorted_scores) if filters.max_score is None
+                  else np.searchsorted(self._sorted_scores, filters.max_score, "right"))
+            packed &= self._pack(self.score_order[lo:hi])
+
+        if filters.mal_ids:
+            packed &= self._pack(np.flatnonzero(np.isin(self.mal_ids, list(filters.mal_ids))))
+
+        return np.flatnonzero(np.unpackbits(packed, count=len(self)))
+
+
+def build_metadata_index(store, index_dir: str):
+    """Writes the metadata index from the document store (positions stay aligned)."""
+    writer = MetadataIndexWriter()
+    for doc_id, metadata in zip(store.ids, store.metadatas):
+        writer.add(metadata or {}, doc_id)
+    writer.save(index_dir)
+    return writer
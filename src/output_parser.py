@@ -0,0 +1,119 @@
+import re
+
+from src.context_packer import truncate_text
+
+TITLE_DELIMITER = ","
+SECTION_DELIMITER = "|||"
+
+
+class RecommendationStreamParser:
+    """
+    Incremental parser for the recommendation output format.
+
+    The LLM answers with a comma-separated title line followed by analysis
+    sections separated by '|||'. Tokens are fed in as they arrive and events are
+    emitted as soon as each piece is complete:
+      ("titles", [...])   once the first line is finished
+      ("section", "...")  for every finished '|||'-delimited analysis block
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self.titles = None
+        self.sections = []
+
+    @staticmethod
+    def _split_titles(title_line: str):
+        return [t.strip() for t in title_line.split(TITLE_DELIMITER) if t.strip()]
+
+    def _take_title_line(self, final: bool = False):
+        text = self._buffer.lstrip()
+        if not text:
+            return None
+
+        # The title line ends at the first newline or the first delimiter, whichever comes first
+        candidates = [i for i in (text.find("\n"), text.find(SECTION_DELIMITER)) if i >= 0]
+        if not candidates:
+            if not final:
+                return None
+            self._buffer = ""
+            return self._split_titles(text)
+
+        end = min(candidates)
+        self._buffer = text[end + 1:] if text[end] == "\n" else text[end:]
+        return self._split_titles(text[:end])
+
+    def feed(self, chunk: str):
+        self._buffer += chunk
+        events = []
+
+        if self.titles is None:
+            titles = self._take_title_line()
+            if titles is None:
+                return events
+            self.titles = titles
+            events.append(("titles", titles))
+
+        while SECTION_DELIMITER in self._buffer:
+            section, self._buffer = self._buffer.split(SECTION_DELIMITER, 1)
+            section = section.strip()
+            if section:
+                self.sections.append(section)
+                events.append(("section", section))
+
+        return events
+
+    def close(self):
+        """Flushes whatever is left once the stream has ended."""
+        events = []
+
+        if self.titles is None:
+            self.titles = self._take_title_line(final=True) or []
+            events.append(("titles", self.titles))
+
+        events.extend(self.feed(""))
+
+        tail = self._buffer.strip()
+        self._buffer = ""
+        if tail:
+            self.sections.append(tail)
+            events.append(("section", tail))
+
+        return events
+
+
+def parse_recommendation(raw_output: str):
+    """Parses a complete LLM response into (titles, explanations)."""
+    parser = RecommendationStreamParser()
+    parser.feed(raw_output)
+    parser.close()
+    return parser.titles, parser.sections
+
+
+# Row text is "Title: <name>.. Overview: <synopsis>Genres: ..." (see src/data_loader.py)
+_OVERVIEW = re.compile(r"Overview:\s*(?P<overview>.*?)\s*(?:Genres:|$)", re.S)
+_TITLE = re.compile(r"Title:\s*(?P<title>.*?)(?:\.\.)?\s*(?:Overview:|$)", re.S)
+
+
+def retrieval_only_recommendation(documents, limit: int = 5, overview_tokens: int = 60):
+    """
+    (titles, explanations) built straight from fused retrieval results, used
+    when generation misses its deadline. One entry per title, in fusion order.
+    """
+    titles, explanations, seen = [], [], set()
+    for doc in documents:
+        meta = doc.metadata
+        title_match = _TITLE.search(doc.page_content)
+        title = meta.get("name") or (title_match.group("title") if title_match else None)
+        key = meta.get("mal_id", title)
+        if not title or key in seen:
+            continue
+        seen.add(key)
+
+        overview_match = _OVERVIEW.search(doc.page_content)
+        overview = overview_match.group("overview") if overview_match else doc.page_content
+        titles.append(title)
+        explanations.append(f"**[{title}]**\n{truncate_text(overview, overview_tokens)}")
+        if len(titles) == limit:
+            break
+    return titles, explanations
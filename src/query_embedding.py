@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import QUERY_EMBED_BATCH_SIZE, QUERY_EMBED_LOOKUPS
+
+_STOP = object()
+
+
+class QueryEmbeddingService(Embeddings):
+    """
+    Query-side wrapper around an Embeddings model for the serving path.
+
+    Concurrent `embed_query` calls are queued and encoded together: a dispatcher
+    thread takes the first waiting query, collects more for up to `max_wait_ms`
+    (or until `max_batch`), and runs one batched forward pass. While a batch is
+    encoding, new queries pile up and form the next batch, so batch size follows
+    load. Recent query vectors sit in an LRU, and identical queries already in
+    flight share one encode.
+
+    `embed_documents` passes straight through (index builds batch on their own).
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 32, max_wait_ms: float = 2.0,
+                 cache_size: int = 4096):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+        self.batches = 0
+        self.encoded = 0
+
+    # --- EMBEDDINGS INTERFACE ---
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str):
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                QUERY_EMBED_LOOKUPS.labels(result="cache_hit").inc()
+                return list(vector)
+
+            future = self._inflight.get(text)
+            if future is None:
+                future = Future()
+                self._inflight[text] = future
+                self._queue.put(text)
+                QUERY_EMBED_LOOKUPS.labels(result="encoded").inc()
+            else:
+                QUERY_EMBED_LOOKUPS.labels(result="coalesced").inc()
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-embedder", daemon=True)
+                self._thread.start()
+
+        return list(future.result())
+
+    # --- DISPATCHER ---
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._encode(self._collect(first))
+
+    def _encode(self, batch):
+        try:
+            vectors = self.embeddings.embed_documents(batch)
+        except Exception as e:
+            with self._lock:
+                futures = [self._inflight.pop(text) for text in batch]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        QUERY_EMBED_BATCH_SIZE.observe(len(batch))
+        with self._lock:
+            self.batches += 1
+            self.encoded += len(batch)
+            futures = []
+            for text, vector in zip(batch, vectors):
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+                futures.append((self._inflight.pop(text), vector))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for future, vector in futures:
+            future.set_result(vector)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cached": len(self._cache),
+                "batches": self.batches,
+                "encoded": self.encoded,
+                "mean_batch_size": self.encoded / self.batches if self.batches else 0.0,
+            }
@@ -0,0 +1,332 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.deadline import DeadlineExceeded
+from utils.metrics import CACHE_LOOKUPS
+
+# Failures that belong to the leader's request alone (cancelled, or out of its own
+# budget): followers are not failed with them but retry, one becoming the new leader
+LEADER_ONLY_ERRORS = (DeadlineExceeded, asyncio.CancelledError, KeyboardInterrupt, SystemExit)
+
+
+class _LeaderGone(Exception):
+    """Set on an in-flight future whose leader gave up for reasons of its own."""
+
+
+def _consume(waiter):
+    # Marks a follower's outcome as retrieved even after that follower stopped waiting
+    if not waiter.cancelled():
+        waiter.exception()
+
+
+def _freeze(value):
+    # JSON turns scope tuples into lists; cache keys need them hashable again
+    return tuple(_freeze(v) for v in value) if isinstance(value, list) else value
+
+
+def prewarm_record(query: str, response: str, scope: tuple, model: str = None) -> dict:
+    """One line of a pre-warm file (written by pipeline/batch_recommend.py)."""
+    return {
+        "query": query,
+        "normalized": RecommendationCache.normalize(query),
+        "scope": list(scope),
+        "response": response,
+        "model": model,
+        "created_at": time.time(),
+    }
+
+
+def read_prewarm_file(path: str):
+    """Yields (query, response, scope) per valid line; later lines win for the same key."""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                yield record["query"], record["response"], _freeze(record["scope"])
+            except (ValueError, KeyError, TypeError):
+                continue  # partial last line from an interrupted run
+
+
+class _CacheEntry:
+    __slots__ = ("response", "embedding", "expires_at")
+
+    def __init__(self, response: str, embedding, expires_at: float):
+        self.response = response
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+class RecommendationCache:
+    """
+    Two-tier response cache in front of the LLM.
+
+    Tier 1 matches the normalized query string exactly. Tier 2 embeds the query
+    (same all-MiniLM-L6-v2 model as retrieval) and reuses a cached answer whose
+    query is within `similarity_threshold` cosine similarity. Entries are evicted
+    LRU-first and expire after `ttl_seconds`. Concurrent misses for the same
+    normalized query share a single in-flight LLM call; a follower only shares the
+    leader's result or real failure, never its cancellation or deadline.
+
+    Every entry belongs to a `scope` (e.g. the retrieval weights used), and
+    answers are only reused within the same scope.
+    """
+
+    def __init__(self, embed_fn=None, max_entries: int = 512, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.92, executor=None):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.executor = executor
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        # Semantic tier: stacked, L2-normalized embeddings rebuilt lazily on change
+        self._matrix = None
+        self._matrix_keys = []
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    # --- KEYS & EMBEDDINGS ---
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return re.sub(r"\s+", " ", query.strip().lower())
+
+    def make_key(self, query: str, scope: tuple = ()):
+        return (scope, self.normalize(query))
+
+    def _embed(self, query: str):
+        if self.embed_fn is None:
+            return None
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # --- TIER LOOKUPS ---
+
+    def _lookup_exact(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            CACHE_LOOKUPS.labels(result="exact_hit").inc()
+            return entry.response
+
+    def _lookup_semantic(self, embedding, scope: tuple = ()):
+        if embedding is None:
+            return None
+        with self._lock:
+            if self._matrix is None:
+                self._rebuild_matrix()
+            if not self._matrix_keys:
+                return None
+
+            similarities = self._matrix @ embedding
+            in_scope = np.fromiter((k[0] == scope for k in self._matrix_keys), dtype=bool)
+            similarities = np.where(in_scope, similarities, -1.0)
+            candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+
+            # Closest first; expired entries are evicted on the way instead of ending the scan
+            keys = self._matrix_keys
+            now = time.monotonic()
+            for i in candidates[np.argsort(-similarities[candidates], kind="stable")]:
+                entry = self._entries.get(keys[i])
+                if entry is None:
+                    continue
+                if entry.expires_at < now:
+                    self._remove(keys[i])
+                    continue
+                self._entries.move_to_end(keys[i])
+                self.semantic_hits += 1
+                CACHE_LOOKUPS.labels(result="semantic_hit").inc()
+                return entry.response
+            return None
+
+    def _rebuild_matrix(self):
+        keys = [k for k, e in self._entries.items() if e.embedding is not None]
+        self._matrix_keys = keys
+        self._matrix = (
+            np.stack([self._entries[k].embedding for k in keys])
+            if keys else np.empty((0, 0), dtype=np.float32)
+        )
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    # --- PUBLIC API ---
+
+    def lookup(self, query: str, scope: tuple = ()):
+        """Returns (cached_response_or_None, query_embedding)."""
+        key = self.make_key(query, scope)
+        response = self._lookup_exact(key)
+        if response is not None:
+            return response, None
+
+        embedding = self._embed(query)
+        response = self._lookup_semantic(embedding, scope)
+        if response is None:
+            with self._lock:
+                self.misses += 1
+            CACHE_LOOKUPS.labels(result="miss").inc()
+        return response, embedding
+
+    def store(self, query: str, response: str, embedding=None, scope: tuple = (), ttl_seconds: float = None):
+        key = self.make_key(query, scope)
+        if embedding is None:
+            embedding = self._embed(query)
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = _CacheEntry(response, embedding, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def preload(self, records, embed_documents=None) -> int:
+        """
+        Loads (query, response, scope) records, e.g. from `read_prewarm_file`.
+        Pre-warmed answers never expire and capacity grows to hold them, so only
+        LRU pressure from live traffic can push them out. `embed_documents`
+        embeds all queries in one batch for the semantic tier.
+        """
+        latest = {}
+        for query, response, scope in records:
+            latest[self.make_key(query, scope)] = (query, response, scope)
+        if not latest:
+            return 0
+
+        embeddings = [None] * len(latest)
+        if embed_documents is not None:
+            vectors = np.asarray(embed_documents([q for q, _, _ in latest.values()]),
+                                 dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            embeddings = list(vectors / np.where(norms == 0, 1, norms))
+
+        self.max_entries += len(latest)
+        for (query, response, scope), embedding in zip(latest.values(), embeddings):
+            self.store(query, response, embedding, scope, ttl_seconds=float("inf"))
+        return len(latest)
+
+    def _join_or_lead(self, key: str):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                CACHE_LOOKUPS.labels(result="coalesced").inc()
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future, response=None, error: BaseException = None):
+        """Publishes the leader's outcome; the key is free again before followers wake."""
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if error is None:
+            future.set_result(response)
+        elif isinstance(error, LEADER_ONLY_ERRORS):
+            future.set_exception(_LeaderGone())
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, query: str, compute, scope: tuple = ()):
+        key = self.make_key(query, scope)
+        while True:
+            response = self._lookup_exact(key)
+            if response is not None:
+                return response
+
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                try:
+                    return future.result()
+                except _LeaderGone:
+                    continue
+
+            try:
+                response, embedding = self.lookup(query, scope)
+                if response is None:
+                    response = compute()
+                    self.store(query, response, embedding, scope)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, response)
+            return response
+
+    async def aget_or_compute(self, query: str, acompute, scope: tuple = (), timeout: float = None):
+        """
+        `timeout` bounds how long this caller waits as a follower (its own
+        remaining budget); running out raises asyncio.TimeoutError. As leader,
+        `acompute` is expected to respect the same budget.
+        """
+        key = self.make_key(query, scope)
+        loop = asyncio.get_running_loop()
+        wait_until = None if timeout is None else loop.time() + timeout
+        while True:
+            response = self._lookup_exact(key)
+            if response is not None:
+                return response
+
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                # asyncio.wait never cancels what it waits on: a follower timing out or
+                # being cancelled leaves the shared future (and so the leader) alone
+                waiter = asyncio.wrap_future(future)
+                waiter.add_done_callback(_consume)
+                remaining = None if wait_until is None else max(0.0, wait_until - loop.time())
+                done, _ = await asyncio.wait({waiter}, timeout=remaining)
+                if not done:
+                    raise asyncio.TimeoutError()
+                try:
+                    return waiter.result()
+                except _LeaderGone:
+                    continue
+
+            try:
+                # Embedding the query is CPU-bound, keep it off the event loop
+                response, embedding = await loop.run_in_executor(self.executor, self.lookup, query, scope)
+                if response is None:
+                    response = await acompute()
+                    self.store(query, response, embedding, scope)
+            except BaseException as e:
+                self._finish(key, future, error=e)
+                raise
+            self._finish(key, future, response)
+            return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
@@ -1,49 +1,408 @@
 # --- REFINED DECOUPLED IMPORTS ---
-from langchain_community.retrievers import BM25Retriever
-from langchain_core.runnables import RunnablePassthrough
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_groq import ChatGroq
 from src.prompt_template import get_anime_prompt
+from src.fusion import RetrievalOptions, reciprocal_rank_fusion
+from utils.logger import get_logger
+from utils.deadline import DeadlineExceeded
+from utils.metrics import (
+    CONTEXT_TOKENS, CONTEXT_TOKENS_SAVED, DEADLINE_EXCEEDED, LLM_HEDGES, observe_stage, stage_timer
+)
+
+logger = get_logger(__name__)
 
 class AnimeRecommender:
-    def __init__(self, chroma_retriever, all_documents, api_key: str, model_name: str):
-        # 1. Initialize the LLM (Production standard)
-        self.llm = ChatGroq(
+    def __init__(self, chroma_retriever, sparse_retriever, api_key: str, model_name: str,
+                 retrieval_workers: int = 4, cache=None, default_options: RetrievalOptions = None,
+                 rrf_k: int = 60, llm=None, context_packer=None, metadata_index=None,
+                 fallback_llm=None, fallback_model_name: str = None, hedge_delay: float = 0.0,
+                 llm_timeout: float = None, llm_max_retries: int = 2,
+                 chroma_filter_max_ids: int = 500, chroma_filter_overfetch: int = 4):
+        # 1. Initialize the LLM (Production standard); any chat model can be injected
+        self.llm = llm or ChatGroq(
             api_key=api_key,
             model=model_name,
-            temperature=0
+            temperature=0,
+            timeout=llm_timeout,
+            max_retries=llm_max_retries
         )
+
+        # Hedged second request after `hedge_delay` without a first token (0 disables);
+        # it goes to the fallback model when one is configured, else to the primary again
+        self.hedge_delay = hedge_delay
+        self.fallback_llm = fallback_llm
+        if self.fallback_llm is None and fallback_model_name:
+            self.fallback_llm = ChatGroq(
+                api_key=api_key,
+                model=fallback_model_name,
+                temperature=0,
+                timeout=llm_timeout,
+                max_retries=llm_max_retries
+            )
         
         # 2. Setup Retrievers independently
         self.dense_retriever = chroma_retriever
-        self.sparse_retriever = BM25Retriever.from_documents(all_documents)
-        self.sparse_retriever.k = 5
+        self.sparse_retriever = sparse_retriever
+        self.default_options = default_options or RetrievalOptions()
+        self.rrf_k = rrf_k
+
+        # Bounded pool so CPU-bound retrieval never runs on the event loop
+        self.retrieval_workers = retrieval_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=retrieval_workers,
+            thread_name_prefix="retrieval"
+        )
         
+        # Optional RecommendationCache (exact + semantic tiers) in front of the LLM
+        self.cache = cache
+        if self.cache is not None and self.cache.executor is None:
+            self.cache.executor = self.executor
+
+        # Optional MetadataIndex: genre / score / id filters narrow both retrievers up front
+        self.metadata_index = metadata_index
+        self.chroma_filter_max_ids = chroma_filter_max_ids
+        self.chroma_filter_overfetch = chroma_filter_overfetch
+
+        # Optional ContextPacker: fits the fused documents into a token budget
+        self.context_packer = context_packer
+
+        # 3. prompt -> llm -> parser, run step by step so every stage is timed
         self.prompt = get_anime_prompt()
+        self.output_parser = StrOutputParser()
+
+    @staticmethod
+    def _post_filter(retriever, docs, filters):
+        # Chroma's where clauses are coarser than the bitmaps: re-check its hits exactly
+        if filters is None or not isinstance(retriever, VectorStoreRetriever):
+            return docs
+        return [d for d in docs if filters.matches_metadata(d.metadata)][:retriever.search_kwargs.get("k", 4)]
+
+    def _timed_retrieve(self, stage: str, retriever, query: str, filter_kwargs: dict, filters=None):
+        with stage_timer(stage):
+            return self._post_filter(retriever, retriever.invoke(query, **filter_kwargs), filters)
+
+    def _filter_kwargs(self, retriever, candidates, filters=None) -> dict:
+        # The on-disk indexes score candidate positions directly; Chroma takes where clauses
+        if candidates is None:
+            return {}
+        if not isinstance(retriever, VectorStoreRetriever):
+            return {"candidates": candidates}
+        mal_ids = np.unique(self.metadata_index.mal_ids[candidates])
+        if len(mal_ids) <= self.chroma_filter_max_ids:
+            return {"filter": {"mal_id": {"$in": mal_ids.tolist()}}}
+        return self._chroma_where(retriever, filters)
+
+    def _chroma_where(self, retriever, filters) -> dict:
+        """
+        Broad filters in Chroma's own terms (a long $in list is slower than these):
+        score range and ids as a metadata 'where', required genres as substring
+        tests on the chunk text. Exclusions are left to the exact post-filter, so
+        the search over-fetches.
+        """
+        where = []
+        if filters.min_score is not None:
+            where.append({"score": {"$gte": filters.min_score}})
+        if filters.max_score is not None:
+            where.append({"score": {"$lte": filters.max_score}})
+        if filters.mal_ids:
+            where.append({"mal_id": {"$in": list(filters.mal_ids)}})
+        contains = [{"$contains": self.metadata_index.canonical_genre(g)} for g in filters.genres]
 
-        # 3. Construct a simplified Chain that expects a pre-processed context
-        self.chain = (
-            {
-                "context": RunnablePassthrough(),
-                "question": RunnablePassthrough()
-            }
-            | self.prompt
-            | self.llm
-            | StrOutputParser()
+        kwargs = {"k": retriever.search_kwargs.get("k", 4) * self.chroma_filter_overfetch}
+        if where:
+            kwargs["filter"] = where[0] if len(where) == 1 else {"$and": where}
+        if contains:
+            kwargs["where_document"] = contains[0] if len(contains) == 1 else {"$and": contains}
+        return kwargs
+
+    def _candidates(self, options: RetrievalOptions):
+        """Sorted document positions allowed by the request's filters (None = unfiltered)."""
+        if options.filters is None or not options.filters.active():
+            return None
+        if self.metadata_index is None:
+            raise ValueError("Metadata filters need a metadata index.")
+        with stage_timer("filter"):
+            return self.metadata_index.candidates(options.filters)
+
+    def _fuse(self, dense_docs, sparse_docs, options: RetrievalOptions):
+        # B. Weighted reciprocal-rank fusion keyed on stable document ids
+        with stage_timer("merge"):
+            return reciprocal_rank_fusion(
+                [dense_docs, sparse_docs],
+                [options.dense_weight, options.sparse_weight],
+                top_k=options.top_k,
+                rrf_k=self.rrf_k
+            )
+
+    def _format_context(self, docs) -> str:
+        # C. Format as a single block of context, packed to the token budget when configured
+        if self.context_packer is None:
+            return "\n\n".join([doc.page_content for doc in docs])
+
+        packed = self.context_packer.pack(docs)
+        CONTEXT_TOKENS.labels(kind="retrieved").inc(packed.tokens_in)
+        CONTEXT_TOKENS.labels(kind="packed").inc(packed.tokens_out)
+        CONTEXT_TOKENS_SAVED.observe(packed.tokens_saved)
+        logger.info(f"Context packed: {packed.tokens_in} -> {packed.tokens_out} tokens "
+                    f"({packed.tokens_saved} saved, {packed.dropped} documents dropped)")
+        return packed.text
+
+    def retrieve(self, query: str, options: RetrievalOptions = None):
+        """Manual Hybrid Search: both retrievers run concurrently, then get fused."""
+        options = options or self.default_options
+
+        candidates = self._candidates(options)
+        if candidates is not None and not len(candidates):
+            return []
+
+        # A. Fetch from both sources in parallel
+        dense_future = self.executor.submit(
+            self._timed_retrieve, "dense_retrieval", self.dense_retriever, query,
+            self._filter_kwargs(self.dense_retriever, candidates, options.filters), options.filters
+        )
+        sparse_future = self.executor.submit(
+            self._timed_retrieve, "sparse_retrieval", self.sparse_retriever, query,
+            self._filter_kwargs(self.sparse_retriever, candidates)
         )
+        return self._fuse(dense_future.result(), sparse_future.result(), options)
 
-    def get_recommendation(self, query: str):
-        """Manual Hybrid Search: Merges results before LLM processing"""
-        # A. Fetch from both sources
-        dense_docs = self.dense_retriever.invoke(query)
-        sparse_docs = self.sparse_retriever.invoke(query)
-        
-        # B. Merge and remove duplicates (Standard RAG practice)
-        all_docs = dense_docs + sparse_docs
-        unique_docs = list({doc.page_content: doc for doc in all_docs}.values())
-        
-        # C. Format as a single block of context
-        context_text = "\n\n".join([doc.page_content for doc in unique_docs])
-        
-        # D. Invoke chain with prepared context
-        return self.chain.invoke({"context": context_text, "question": query})
\ No newline at end of file
+    async def aretrieve(self, query: str, options: RetrievalOptions = None, deadline=None):
+        options = options or self.default_options
+        loop = asyncio.get_running_loop()
+
+        candidates = self._candidates(options)
+        if candidates is not None and not len(candidates):
+            return []
+
+        # A. Fetch from both sources in parallel; wall time is the slower of the two
+        both = asyncio.gather(
+            loop.run_in_executor(
+                self.executor, self._timed_retrieve, "dense_retrieval", self.dense_retriever, query,
+                self._filter_kwargs(self.dense_retriever, candidates, options.filters), options.filters
+            ),
+            loop.run_in_executor(
+                self.executor, self._timed_retrieve, "sparse_retrieval", self.sparse_retriever, query,
+                self._filter_kwargs(self.sparse_retriever, candidates)
+            )
+        )
+        try:
+            dense_docs, sparse_docs = await asyncio.wait_for(
+                both, timeout=deadline.time_left("retrieval") if deadline else None
+            )
+        except asyncio.TimeoutError:
+            DEADLINE_EXCEEDED.labels(stage="retrieval").inc()
+            raise DeadlineExceeded("retrieval")
+        return self._fuse(dense_docs, sparse_docs, options)
+
+    def retrieve_batch(self, queries, options: RetrievalOptions = None):
+        """
+        Retrieval for many queries (offline batch runs). The on-disk dense index
+        embeds and scores the whole batch at once; other retrievers fan out
+        over the retrieval pool.
+        """
+        options = options or self.default_options
+        queries = list(queries)
+        candidates = self._candidates(options)
+        if candidates is not None and not len(candidates):
+            return [[] for _ in queries]
+        config = {"max_concurrency": self.retrieval_workers}
+
+        with stage_timer("dense_retrieval"):
+            if candidates is None and hasattr(self.dense_retriever, "batch_documents"):
+                dense_docs = self.dense_retriever.batch_documents(queries)
+            else:
+                dense_docs = [
+                    self._post_filter(self.dense_retriever, docs, options.filters)
+                    for docs in self.dense_retriever.batch(
+                        queries, config, **self._filter_kwargs(self.dense_retriever, candidates, options.filters)
+                    )
+                ]
+        with stage_timer("sparse_retrieval"):
+            sparse_docs = self.sparse_retriever.batch(
+                queries, config, **self._filter_kwargs(self.sparse_retriever, candidates)
+            )
+        return [self._fuse(d, s, options) for d, s in zip(dense_docs, sparse_docs)]
+
+    async def agenerate_batch(self, queries, docs_per_query, max_concurrency: int = 4):
+        """
+        One generation per query through the chat model's async batch path, at most
+        `max_concurrency` in flight. Failed calls come back as the exception.
+        """
+        loop = asyncio.get_running_loop()
+        prompts = await loop.run_in_executor(
+            self.executor, lambda: [self._render_prompt(q, docs) for q, docs in zip(queries, docs_per_query)]
+        )
+        with stage_timer("llm_total"):
+            messages = await self.llm.abatch(
+                prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True
+            )
+        return [m if isinstance(m, Exception) else self.output_parser.invoke(m) for m in messages]
+
+    def _render_prompt(self, query: str, docs):
+        # D. Fill the prompt with the prepared context
+        with stage_timer("prompt_render"):
+            return self.prompt.invoke({"context": self._format_context(docs), "question": query})
+
+    def _generate(self, query: str, options: RetrievalOptions):
+        prompt_value = self._render_prompt(query, self.retrieve(query, options))
+
+        # E. Stream internally so time-to-first-token is observable on the blocking path too
+        start = time.perf_counter()
+        chunks = []
+        with stage_timer("llm_total"):
+            for chunk in self.llm.stream(prompt_value):
+                if not chunks:
+                    observe_stage("llm_first_token", time.perf_counter() - start)
+                chunks.append(self.output_parser.invoke(chunk))
+        return "".join(chunks)
+
+    async def _agenerate(self, query: str, options: RetrievalOptions, deadline=None):
+        chunks = [chunk async for chunk in self._astream_llm(query, options, deadline)]
+        return "".join(chunks)
+
+    async def _astream_llm(self, query: str, options: RetrievalOptions, deadline=None):
+        docs = await self.aretrieve(query, options, deadline)
+        # Context packing reads neighbour chunks and runs MMR: CPU and store I/O, off the loop
+        loop = asyncio.get_running_loop()
+        prompt_value = await loop.run_in_executor(self.executor, self._render_prompt, query, docs)
+        time_left = (lambda: deadline.time_left("generation")) if deadline else (lambda: None)
+
+        start = time.perf_counter()
+        stream = None
+        try:
+            with stage_timer("llm_total"):
+                stream, chunk = await self._first_chunk(prompt_value, time_left)
+                observe_stage("llm_first_token", time.perf_counter() - start)
+                while chunk is not None:
+                    yield self.output_parser.invoke(chunk)
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=time_left())
+                    except StopAsyncIteration:
+                        chunk = None
+        except asyncio.TimeoutError:
+            DEADLINE_EXCEEDED.labels(stage="generation").inc()
+            raise DeadlineExceeded("generation", docs)
+        finally:
+            if stream is not None:
+                await stream.aclose()
+
+    async def _first_chunk(self, prompt_value, time_left):
+        """
+        Starts the primary stream and, if no token arrives within `hedge_delay`,
+        a hedged one; returns (stream, first chunk) of whichever answers first and
+        closes the other. Raises asyncio.TimeoutError when the generation slice runs out.
+        """
+        streams, pending = {}, {}
+
+        def launch(label, llm):
+            streams[label] = llm.astream(prompt_value)
+            pending[asyncio.ensure_future(streams[label].__anext__())] = label
+
+        launch("primary", self.llm)
+        hedge_at = time.monotonic() + self.hedge_delay if self.hedge_delay > 0 else None
+        winner = None
+        try:
+            while True:
+                timeout = time_left()
+                if hedge_at is not None:
+                    until_hedge = max(0.0, hedge_at - time.monotonic())
+                    timeout = until_hedge if timeout is None else min(timeout, until_hedge)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    label = pending.pop(task)
+                    try:
+                        chunk = task.result()
+                    except StopAsyncIteration:
+                        chunk = None
+                    except Exception as e:
+                        if pending:
+                            logger.warning(f"{label} LLM call failed, waiting on the other: {str(e)}")
+                            continue
+                        raise
+                    if len(streams) > 1:
+                        LLM_HEDGES.labels(winner=label).inc()
+                    winner = label
+                    return streams[label], chunk
+
+                if done:
+                    continue
+                remaining = time_left()
+                if hedge_at is not None and time.monotonic() >= hedge_at and (remaining is None or remaining > 0):
+                    logger.info(f"No first token after {self.hedge_delay:.1f}s; sending a hedged request.")
+                    hedge_at = None
+                    launch("hedge", self.fallback_llm or self.llm)
+                    continue
+                raise asyncio.TimeoutError()
+        finally:
+            # Every stream but the winner is closed: losers still waiting on a first
+            # chunk are cancelled first, and one whose first chunk raised is closed too
+            for task in pending:
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+            for label, stream in streams.items():
+                if label == winner:
+                    continue
+                try:
+                    await stream.aclose()
+                except Exception as e:
+                    logger.warning(f"Closing the {label} LLM stream failed: {str(e)}")
+
+    def get_recommendation(self, query: str, options: RetrievalOptions = None):
+        options = options or self.default_options
+        if self.cache is None:
+            return self._generate(query, options)
+        return self.cache.get_or_compute(
+            query, lambda: self._generate(query, options), scope=options.cache_scope()
+        )
+
+    async def aget_recommendation(self, query: str, options: RetrievalOptions = None, deadline=None):
+        """
+        Awaitable variant: retrieval runs in the executor, generation streams
+        (hedged). With a Deadline, running out raises DeadlineExceeded.
+        """
+        options = options or self.default_options
+        if self.cache is None:
+            return await self._agenerate(query, options, deadline)
+        try:
+            # Waiting on another request's identical call is bounded by this request's own budget
+            return await self.cache.aget_or_compute(
+                query, lambda: self._agenerate(query, options, deadline), scope=options.cache_scope(),
+                timeout=deadline.time_left("generation") if deadline else None
+            )
+        except asyncio.TimeoutError:
+            DEADLINE_EXCEEDED.labels(stage="generation").inc()
+            raise DeadlineExceeded("generation")
+
+    async def astream_recommendation(self, query: str, options: RetrievalOptions = None, deadline=None):
+        """Yields raw LLM tokens as they are generated (used by the SSE endpoint)."""
+        options = options or self.default_options
+        scope = options.cache_scope()
+        loop = asyncio.get_running_loop()
+
+        embedding = None
+        if self.cache is not None:
+            cached, embedding = await loop.run_in_executor(
+                self.executor, self.cache.lookup, query, scope
+            )
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async for chunk in self._astream_llm(query, options, deadline):
+            chunks.append(chunk)
+            yield chunk
+
+        if self.cache is not None:
+            self.cache.store(query, "".join(chunks), embedding, scope=scope)
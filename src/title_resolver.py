@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_name(title: str) -> str:
+    """Case/accents/punctuation-insensitive form used for matching."""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(ch for ch in title if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", title.lower()).strip()
+
+
+def trigrams(normalized: str):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndexWriter:
+    """Collects (MAL_ID, Name, Score) while rows stream through the build."""
+
+    def __init__(self):
+        self.entries = []
+
+    def tap(self, row_batches):
+        """Passes row batches through unchanged, recording each title on the way."""
+        for batch in row_batches:
+            for doc in batch:
+                meta = doc.metadata
+                self.entries.append([int(meta["MAL_ID"]), meta["Name"], meta.get("Score")])
+            yield batch
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+
+
+class TitleResolver:
+    """
+    Maps free-text LLM titles to MAL_IDs without calling Jikan.
+
+    Lookup order: exact name -> normalized name -> character-trigram fuzzy match
+    (Dice coefficient over an inverted trigram index). Anything below
+    `min_similarity` is reported as unresolved, which usually means a hallucination.
+    """
+
+    def __init__(self, entries, min_similarity: float = 0.6):
+        self.min_similarity = min_similarity
+        self.mal_ids = [e[0] for e in entries]
+        self.names = [e[1] for e in entries]
+        self.scores = [e[2] for e in entries]
+
+        self.exact = {}
+        self.normalized = {}
+        postings = {}
+        sizes = []
+        for i, name in enumerate(self.names):
+            self.exact.setdefault(name, i)
+            norm = normalize_name(name)
+            self.normalized.setdefault(norm, i)
+            grams = trigrams(norm)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+
+        self.gram_sizes = np.asarray(sizes, dtype=np.int32)
+        self.postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+    @classmethod
+    def load(cls, path: str, min_similarity: float = 0.6):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        return cls(entries, min_similarity)
+
+    def _entry(self, i: int, match: str, similarity: float) -> dict:
+        return {
+            "mal_id": self.mal_ids[i],
+            "name": self.names[i],
+            "score": self.scores[i],
+            "match": match,
+            "similarity": similarity,
+        }
+
+    def resolve(self, title: str):
+        """Returns the matched entry as a dict, or None when nothing is close enough."""
+        title = title.strip()
+        if title in self.exact:
+            return self._entry(self.exact[title], "exact", 1.0)
+
+        norm = normalize_name(title)
+        if not norm:
+            return None
+        if norm in self.normalized:
+            return self._entry(self.normalized[norm], "normalized", 1.0)
+
+        grams = trigrams(norm)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return None
+
+        candidates, shared = np.unique(np.concatenate(hits), return_counts=True)
+        dice = 2.0 * shared / (len(grams) + self.gram_sizes[candidates])
+        best = int(np.argmax(dice))
+        if dice[best] < self.min_similarity:
+            return None
+        return self._entry(int(candidates[best]), "fuzzy", float(dice[best]))
+
+    def resolve_many(self, titles):
+        """Returns (resolved: {title: entry}, unresolved: [title, ...])."""
+        resolved, unresolved = {}, []
+        for title in titles:
+            entry = self.resolve(title)
+            if entry is None:
+                unresolved.append(title)
+            else:
+                resolved[title] = entry
+        if unresolved:
+            logger.warning(f"Unresolved (likely hallucinated) titles: {unresolved}")
+        return resolved, unresolved
+
+
+def load_title_resolver(path: str):
+    """Loads the build-time title index, or returns None when it has not been built."""
+    if not os.path.exists(path):
+        logger.warning(f"Title index {path} not found; metadata falls back to Jikan search.")
+        return None
+    resolver = TitleResolver.load(path)
+    logger.info(f"Title resolver loaded with {len(resolver.names)} titles.")
+    return resolver
@@ -1,32 +1,242 @@
+import hashlib
+import json
+import time
+from contextlib import ExitStack
+
 from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_huggingface import HuggingFaceEmbeddings
+from src.bm25_index import BM25IndexWriter, build_sparse_index
+from src.document_store import DocumentStoreWriter
+from src.dense_index import DenseIndexWriter
+from utils.logger import get_logger
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = get_logger(__name__)
+
+# Chroma rejects very large add/delete calls, so writes go out in slices
+WRITE_BATCH_SIZE = 1000
+
 class VectorStoreBuilder:
-    def __init__(self,csv_path:str,persist_dir:str="chroma_db"):
+    def __init__(self,csv_path:str,persist_dir:str="chroma_db",model_name:str="all-MiniLM-L6-v2",embedding=None):
         self.csv_path = csv_path
         self.persist_dir = persist_dir
-        self.embedding = HuggingFaceEmbeddings(model_name = "all-MiniLM-L6-v2")
+        self.model_name = model_name
+        # Any LangChain Embeddings can be injected (benchmarks use a stub); loaded lazily otherwise
+        self._embedding = embedding
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            # Imported here: pulls in torch / sentence-transformers, which serving only needs once loading
+            from langchain_huggingface import HuggingFaceEmbeddings
+            self._embedding = HuggingFaceEmbeddings(model_name = self.model_name)
+        return self._embedding
+
+    @staticmethod
+    def row_metadata(metadata: dict) -> dict:
+        """Structured fields kept on every chunk for filtering (Chroma rejects None values)."""
+        score = metadata.get("Score")
+        try:
+            # Raw catalogs may carry the score as text ('Unknown' for unscored titles)
+            score = float(score) if score not in (None, "") else None
+        except ValueError:
+            score = None
+        if score is not None and score != score:
+            score = None
+        fields = {"name": metadata.get("Name"), "score": score, "genres": metadata.get("Genres")}
+        return {key: value for key, value in fields.items() if value is not None}
+
+    @staticmethod
+    def assign_ids(texts):
+        """
+        Gives every chunk a deterministic id '<MAL_ID>-<chunk>' and tags it with
+        a hash of its whole source row (text and structured fields), so rebuilds
+        can tell what changed.
+        """
+        rows = {}
+        for doc in texts:
+            rows.setdefault(str(doc.metadata["MAL_ID"]), []).append(doc)
+
+        for mal_id, chunks in rows.items():
+            fields = VectorStoreBuilder.row_metadata(chunks[0].metadata)
+            row_hash = hashlib.sha1(
+                ("\x00".join(c.page_content for c in chunks) + "\x00" + json.dumps(fields, sort_keys=True))
+                .encode("utf-8")
+            ).hexdigest()
+            for chunk_index, doc in enumerate(chunks):
+                doc.metadata = {
+                    "mal_id": int(mal_id),
+                    "chunk": chunk_index,
+                    "content_hash": row_hash,
+                    "doc_id": f"{mal_id}-{chunk_index}",
+                    **fields,
+                }
+        return texts
     
-    def build_and_save_vectorstore(self):
-        loader = CSVLoader(
-            file_path=self.csv_path,
-            encoding='utf-8',
-            metadata_columns=[]
+    def split_batches(self, row_batches):
+        """Splits each streamed batch of row Documents into id-tagged chunks."""
+        splitter = CharacterTextSplitter(chunk_size=1000,chunk_overlap=0)
+        for rows in row_batches:
+            yield self.assign_ids(splitter.split_documents(rows))
+
+    @staticmethod
+    def _indexed_state(db):
+        """What is already indexed (ids + row hashes only, no embeddings)."""
+        existing = db.get(include=["metadatas"])
+        indexed_hashes = {}
+        indexed_ids = {}
+        legacy_ids = []
+        for doc_id, meta in zip(existing["ids"], existing["metadatas"]):
+            meta = meta or {}
+            if "content_hash" not in meta:
+                # Legacy chunk from a build without ids; it would only ever duplicate
+                legacy_ids.append(doc_id)
+                continue
+            indexed_hashes[meta["mal_id"]] = meta["content_hash"]
+            indexed_ids.setdefault(meta["mal_id"], []).append(doc_id)
+        return indexed_hashes, indexed_ids, legacy_ids
+
+    @staticmethod
+    def _delete(db, ids):
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            db.delete(ids=ids[i:i + WRITE_BATCH_SIZE])
+    
+    def build_incremental(self, chunk_batches, batch_size: int = 64, workers: int = None,
+                          write_batch: int = 1024, docstore_dir: str = None, bm25_dir: str = None,
+                          pool=None):
+        """
+        Incremental, idempotent build over a stream of chunk batches.
+
+        Only rows that are new or whose content hash changed get embedded; rows that
+        no longer appear in the stream are deleted. Embedding runs in a
+        multi-process pool and is written to Chroma batch by batch. When sparse
+        index dirs are given, the document store and BM25 index are written from
+        the same pass. `pool` replaces the EmbeddingPool (benchmarks/tests inject
+        StubEmbeddingPool).
+        """
+        db = self.load_vector_store()
+        indexed_hashes, indexed_ids, legacy_ids = self._indexed_state(db)
+        self._delete(db, legacy_ids)
+
+        store_writer = DocumentStoreWriter(docstore_dir) if docstore_dir else None
+        bm25_writer = BM25IndexWriter() if bm25_dir else None
+
+        seen = set()
+        pending = []
+        counts = {"chunks": 0, "embedded": 0, "changed_rows": 0, "removed_rows": 0}
+        start = time.perf_counter()
+
+        with ExitStack() as stack:
+            pool_started = False
+
+            def flush(docs):
+                nonlocal pool, pool_started
+                # The pool (and its worker processes) only starts once something needs embedding
+                if not pool_started:
+                    if pool is None:
+                        from src.embedding_pool import EmbeddingPool
+                        pool = EmbeddingPool(self.model_name, batch_size=batch_size, workers=workers)
+                    stack.enter_context(pool)
+                    pool_started = True
+                self.embed_and_upsert(db, pool, docs)
+                counts["embedded"] += len(docs)
+
+            for batch in chunk_batches:
+                counts["chunks"] += len(batch)
+                changed = set()
+                for doc in batch:
+                    mal_id = doc.metadata["mal_id"]
+                    seen.add(mal_id)
+                    if indexed_hashes.get(mal_id) != doc.metadata["content_hash"]:
+                        changed.add(mal_id)
+                        pending.append(doc)
+                    if store_writer is not None:
+                        store_writer.add(doc.page_content, doc.metadata, doc.metadata["doc_id"])
+                    if bm25_writer is not None:
+                        bm25_writer.add(doc.page_content)
+
+                # Old chunks of changed rows go first; the chunk count may have shrunk
+                counts["changed_rows"] += len(changed)
+                self._delete(db, [i for m in changed for i in indexed_ids.get(m, [])])
+
+                while len(pending) >= write_batch:
+                    flush(pending[:write_batch])
+                    pending = pending[write_batch:]
+
+            if pending:
+                flush(pending)
+
+        # Rows that disappeared from the source
+        removed = set(indexed_hashes) - seen
+        counts["removed_rows"] = len(removed)
+        self._delete(db, [i for m in removed for i in indexed_ids.get(m, [])])
+
+        if store_writer is not None:
+            store_writer.close()
+        if bm25_writer is not None:
+            bm25_writer.save(bm25_dir)
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Index build done in {elapsed:.1f}s: {counts['chunks']} chunks seen, "
+            f"{counts['changed_rows']} new/changed rows ({counts['embedded']} chunks embedded), "
+            f"{counts['removed_rows']} removed rows, {len(legacy_ids)} legacy chunks dropped."
         )
+        return counts
 
-        data = loader.load()
-        splitter = CharacterTextSplitter(chunk_size=1000,chunk_overlap=0)
-        texts = splitter.split_documents(data)
+    def embed_and_upsert(self, db, pool, docs):
+        """Embeds one batch with the worker pool and writes it straight into Chroma."""
+        vectors = pool.embed([doc.page_content for doc in docs])
+        self.upsert_vectors(db, docs, vectors)
+
+        logger.info(f"Embedded {pool.documents_embedded} chunks so far ({pool.docs_per_second:.1f} docs/sec)")
+
+    @staticmethod
+    def upsert_vectors(db, docs, vectors):
+        """Writes precomputed embeddings (with ids, text and metadata) into Chroma."""
+        for j in range(0, len(docs), WRITE_BATCH_SIZE):
+            sub = docs[j:j + WRITE_BATCH_SIZE]
+            db._collection.upsert(
+                ids=[doc.metadata["doc_id"] for doc in sub],
+                embeddings=vectors[j:j + WRITE_BATCH_SIZE],
+                documents=[doc.page_content for doc in sub],
+                metadatas=[doc.metadata for doc in sub]
+            )
+
+    def build_sparse_index(self, texts, docstore_dir: str = "docstore", bm25_dir: str = "bm25_index"):
+        """Writes the memory-mapped document store + BM25 index next to the vector store."""
+        build_sparse_index(texts, docstore_dir, bm25_dir)
 
-        db = Chroma.from_documents(texts,self.embedding,persist_directory=self.persist_dir)
-        # db.persist()
+    @staticmethod
+    def stored_embeddings(db, ids) -> dict:
+        """Looks up already-computed embeddings by chunk id (missing ids are absent)."""
+        found = db._collection.get(ids=list(ids), include=["embeddings"])
+        return dict(zip(found["ids"], found["embeddings"]))
 
-    def load_vector_store(self):
-        return Chroma(persist_directory=self.persist_dir,embedding_function=self.embedding)
+    @staticmethod
+    def export_dense_index(db, store, index_dir: str, dtype: str = "float32"):
+        """
+        Copies the embeddings Chroma already holds into a memory-mapped DenseIndex
+        whose rows follow the document store's positions (nothing is re-embedded).
+        """
+        if not len(store):
+            raise ValueError("Document store is empty; nothing to export.")
 
+        writer = None
+        for i in range(0, len(store), WRITE_BATCH_SIZE):
+            ids = store.ids[i:i + WRITE_BATCH_SIZE]
+            found = VectorStoreBuilder.stored_embeddings(db, ids)
+            missing = [doc_id for doc_id in ids if doc_id not in found]
+            if missing:
+                raise ValueError(f"{len(missing)} chunks have no stored embedding (e.g. {missing[0]}); rebuild the index.")
+            if writer is None:
+                writer = DenseIndexWriter(index_dir, store.ids, dim=len(found[ids[0]]), dtype=dtype)
+            writer.write([found[doc_id] for doc_id in ids])
+        writer.close()
+        logger.info(f"Dense index exported: {len(store)} x {writer.dim} {dtype} vectors in {index_dir}")
 
+    def load_vector_store(self, embedding=None):
+        # Imported here: the build helpers above work with any store that has Chroma's interface
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=self.persist_dir,embedding_function=embedding or self.embedding)
@@ -50,28 +50,40 @@ async function handleRecommendation() {
   narrativeContainer.innerHTML = "";
 
   try {
+    // Stream the recommendation: titles arrive first, then each analysis section
     const response = await fetch(
-      `/api/recommend?query=${encodeURIComponent(query)}`,
+      `/api/recommend/stream?query=${encodeURIComponent(query)}`,
     );
-    const data = await response.json();
-
-    if (!data.success) throw new Error(data.error);
 
-    const metadataPromises = data.titles.map((title) => fetchMetadata(title));
-    const metadataResults = await Promise.all(metadataPromises);
+    if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.detail || data.error || `HTTP ${response.status}`);
+    }
 
-    metadataResults.forEach((meta, index) => {
-      if (meta && !meta.error) {
-        renderAnimeCard(meta, index);
+    const revealResults = () => {
+      statusBox.classList.add("hidden");
+      resultsContainer.classList.remove("hidden");
+    };
+
+    await readEventStream(response, (event, data) => {
+      if (event === "titles") {
+        revealResults();
+        // Kick off poster lookups right away (one batch call); each card fills its own slot
+        const slots = data.titles.map(() => {
+          const slot = document.createElement("div");
+          posterGrid.appendChild(slot);
+          return slot;
+        });
+        loadPosterGrid(data.titles, slots);
+      } else if (event === "section") {
+        revealResults();
+        renderNarrativeBox(data.text, data.index + 1);
+      } else if (event === "error") {
+        throw new Error(data.error);
       }
     });
 
-    data.explanations.forEach((exp, index) => {
-      renderNarrativeBox(exp, index + 1);
-    });
-
     statusBox.classList.add("hidden");
-    resultsContainer.classList.remove("hidden");
   } catch (error) {
     console.error("AI Engine Error:", error);
     alert("The Connoisseur is having trouble: " + error.message);
@@ -79,34 +91,129 @@ async function handleRecommendation() {
   }
 }
 
-// 3. METADATA HELPER
-async function fetchMetadata(title) {
+// 2a. "MORE LIKE THIS" (precomputed neighbours, no LLM call)
+async function showSimilar(malId, title) {
+  const statusBox = document.getElementById("status-box");
+  const resultsContainer = document.getElementById("results-container");
+  const posterGrid = document.getElementById("poster-grid");
+  const narrativeContainer = document.getElementById("narrative-container");
+
   try {
-    const res = await fetch(`/api/metadata?title=${encodeURIComponent(title)}`);
-    return await res.json();
+    const response = await fetch(`/api/similar?id=${malId}&k=10`);
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.detail || `HTTP ${response.status}`);
+
+    statusBox.classList.add("hidden");
+    resultsContainer.classList.remove("hidden");
+    posterGrid.innerHTML = "";
+    narrativeContainer.innerHTML = "";
+    renderNarrativeBox(`Titles most similar to **${data.title || title}**.`, 1);
+
+    const titles = data.similar.map((item) => item.title);
+    const slots = titles.map(() => {
+      const slot = document.createElement("div");
+      posterGrid.appendChild(slot);
+      return slot;
+    });
+    loadPosterGrid(titles, slots);
+    resultsContainer.scrollIntoView({ behavior: "smooth" });
+  } catch (error) {
+    console.error("Similar titles error:", error);
+    alert("Could not load similar titles: " + error.message);
+  }
+}
+
+// 2b. SERVER-SENT EVENTS READER
+// fetch() + ReadableStream instead of EventSource so HTTP errors (429/503) stay visible
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      frame.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
+// 3. METADATA HELPERS
+// One /api/metadata/batch round trip per result page; titles still pending at the
+// server deadline get a single follow-up batch (by then they are usually cached).
+async function loadPosterGrid(titles, slots, retried = false) {
+  const batch = await fetchMetadataBatch(titles);
+
+  titles.forEach((title, index) => {
+    if (batch.pending.includes(title) && !retried) return;
+    const meta = batch.results[title];
+    if (meta && !meta.error) {
+      renderAnimeCard(meta, index, slots[index]);
+    } else {
+      slots[index].remove();
+    }
+  });
+
+  if (batch.pending.length && !retried) {
+    const pendingTitles = titles.filter((t) => batch.pending.includes(t));
+    const pendingSlots = pendingTitles.map((t) => slots[titles.indexOf(t)]);
+    loadPosterGrid(pendingTitles, pendingSlots, true);
+  }
+}
+
+async function fetchMetadataBatch(titles) {
+  try {
+    const res = await fetch("/api/metadata/batch", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ titles }),
+    });
+    const data = await res.json();
+    return { results: data.results || {}, pending: data.pending || [] };
   } catch (e) {
-    return { error: e.message };
+    return { results: {}, pending: [] };
   }
 }
 
 // 4. DOM COMPONENT CREATORS
-function renderAnimeCard(meta, index) {
+function renderAnimeCard(meta, index, slot = null) {
   const grid = document.getElementById("poster-grid");
   const card = document.createElement("div");
   card.className = "anime-card";
   card.style.animationDelay = `${index * 200}ms`;
 
   card.innerHTML = `
-        <img src="${meta.image}" alt="${meta.title}" loading="lazy">
+        ${meta.image ? `<img src="${meta.image}" alt="${meta.title}" loading="lazy">` : ""}
         <div class="anime-card-content">
             <h3>${meta.title}</h3>
             <p style="color: #fbbf24; margin-bottom: 15px;">
                 <span style="font-size: 1.2rem;">★</span> Score: ${meta.score}
             </p>
             <a href="${meta.url}" target="_blank" class="mal-link-btn">View on MAL</a>
+            ${meta.mal_id ? `<button class="mal-link-btn similar-btn">More like this</button>` : ""}
         </div>
     `;
-  grid.appendChild(card);
+  if (meta.mal_id) {
+    card.querySelector(".similar-btn").onclick = () => showSimilar(meta.mal_id, meta.title);
+  }
+  if (slot) {
+    slot.replaceWith(card);
+  } else {
+    grid.appendChild(card);
+  }
 }
 
 function renderNarrativeBox(text, rank) {
@@ -210,14 +317,13 @@ async function loadTrendingData() {
         .join("");
     }
 
-    // Fetch Popular Characters (Direct Jikan call for simplicity)
-    const charRes = await fetch(
-      "https://api.jikan.moe/v4/top/characters?limit=4",
-    );
+    // Fetch Popular Characters (served from the server-side snapshot)
+    const charRes = await fetch("/api/top-characters");
     const charData = await charRes.json();
 
-    if (charData.data) {
+    if (charData.success) {
       charContainer.innerHTML = charData.data
+        .slice(0, 4)
         .map(
           (char, index) => `
                 <div class="list-item">
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the app's packages (src, utils, pipeline, config) from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(scope="session")
+def jikan_url():
+    """Base URL of the local Jikan stand-in (tests/jikan_stub.py)."""
+    from tests.jikan_stub import serve
+
+    url, server, thread = serve()
+    yield url
+    server.should_exit = True
+    thread.join()
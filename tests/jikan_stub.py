@@ -0,0 +1,69 @@
+"""A local stand-in for the Jikan API, served by uvicorn (see the `jikan_url` fixture)."""
+import asyncio
+import socket
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+HITS = Counter()
+
+# Knobs for /top/anime: every answer is tagged with `version`
+TOP_ANIME = {"version": 1, "delay": 0.0, "fail": False}
+
+
+def anime(mal_id: int, title: str) -> dict:
+    return {
+        "mal_id": mal_id,
+        "images": {"jpg": {"large_image_url": f"https://img.example/{mal_id}.jpg"}},
+        "score": 8.5,
+        "url": f"https://myanimelist.net/anime/{mal_id}",
+        "title_english": None,
+        "title": title,
+    }
+
+
+async def search(request):
+    """Jikan's /anime?q= search, with a few special titles."""
+    q = request.query_params["q"]
+    HITS[q] += 1
+    if q == "Rate Limited" and HITS[q] == 1:
+        return JSONResponse({"status": 429}, status_code=429, headers={"Retry-After": "0.05"})
+    if q == "Nothing":
+        return JSONResponse({"data": []})
+    if q == "Slow":
+        await asyncio.sleep(0.5)
+    return JSONResponse({"data": [anime(HITS.total(), q)]})
+
+
+async def top_anime(request):
+    """Two pages of two ranked titles each."""
+    page = int(request.query_params.get("page", 1))
+    HITS["/top/anime"] += 1
+    await asyncio.sleep(TOP_ANIME["delay"])
+    if TOP_ANIME["fail"]:
+        return JSONResponse({"status": 500}, status_code=500)
+    ranks = (2 * page - 1, 2 * page)
+    return JSONResponse({"data": [
+        {**anime(rank, f"Top {rank} v{TOP_ANIME['version']}"), "rank": rank} for rank in ranks
+    ]})
+
+
+def serve():
+    """Starts the stand-in on a free port; returns (base_url, server, thread)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    app = Starlette(routes=[Route("/anime", search), Route("/top/anime", top_anime)])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server, thread
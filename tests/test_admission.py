@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from utils.admission import AdmissionController, QueueFullError, QueueTimeoutError
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _hold(admission, release: asyncio.Event):
+    async with admission.slot():
+        await release.wait()
+
+
+def test_requests_beyond_slots_and_queue_are_rejected_immediately():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, release))
+        queued = asyncio.create_task(_hold(admission, release))
+        await asyncio.sleep(0.01)
+        assert (admission.active, admission.waiting) == (1, 1)
+
+        with pytest.raises(QueueFullError):
+            async with admission.slot():
+                pass
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return admission
+
+    admission = _run(main())
+    assert (admission.active, admission.waiting) == (0, 0)
+
+
+def test_queued_request_runs_once_a_slot_frees_up():
+    order = []
+
+    async def work(admission, name, delay):
+        async with admission.slot():
+            order.append(f"{name} start")
+            await asyncio.sleep(delay)
+            order.append(f"{name} end")
+
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=1)
+        await asyncio.gather(work(admission, "first", 0.05), work(admission, "second", 0))
+
+    _run(main())
+    assert order == ["first start", "first end", "second start", "second end"]
+
+
+def test_waiting_too_long_times_out_and_leaves_the_queue():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(admission, release))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(QueueTimeoutError):
+            async with admission.slot():
+                pass
+        assert (admission.active, admission.waiting) == (1, 0)
+
+        release.set()
+        await running
+        async with admission.slot():  # the slot is usable again
+            assert admission.active == 1
+        return admission
+
+    admission = _run(main())
+    assert (admission.active, admission.waiting) == (0, 0)
+
+
+def test_slot_is_released_when_the_request_fails_or_is_cancelled():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+        with pytest.raises(RuntimeError):
+            async with admission.slot():
+                raise RuntimeError("LLM down")
+
+        task = asyncio.create_task(_hold(admission, asyncio.Event()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        async with admission.slot():
+            pass
+        return admission
+
+    admission = _run(main())
+    assert (admission.active, admission.waiting) == (0, 0)
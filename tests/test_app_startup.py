@@ -0,0 +1,32 @@
+import asyncio
+import os
+
+import app.main as main
+from utils import jikan_client
+
+
+def test_jikan_client_and_cache_are_created_in_the_lifespan(tmp_path, monkeypatch):
+    assert main.jikan is None  # importing app.main builds no client and opens no cache
+
+    cache_path = str(tmp_path / "cache" / "metadata.sqlite3")
+    monkeypatch.setattr(jikan_client, "METADATA_CACHE_PATH", cache_path)
+    monkeypatch.setattr(jikan_client, "_shared_cache", None)
+    # Only the client is under test: no background loading or Jikan refreshes
+    for name in ("startup", "top_anime_snapshot", "top_characters_snapshot"):
+        monkeypatch.setattr(getattr(main, name), "start", lambda: None)
+    resolver = object()
+    monkeypatch.setattr(main, "title_resolver", resolver)  # e.g. loaded before a fork
+    monkeypatch.setattr(main, "jikan", None)
+
+    async def run():
+        lifespan = main.lifespan(main.app)
+        await lifespan.__anext__()
+        client = main.jikan
+        assert client.resolver is resolver and client._client is not None
+        assert os.path.exists(cache_path)
+        await anext(lifespan, None)
+        return client
+
+    client = asyncio.run(run())
+    assert client._client is None
+    jikan_client._shared_cache.close()
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from langchain_core.documents import Document
+
+from benchmarks.stubs import stub_llm
+from pipeline.batch_recommend import pending_queries, read_queries, run_batches
+from src.output_parser import parse_recommendation
+from src.recommendation_cache import read_prewarm_file
+from src.recommender import AnimeRecommender
+
+QUERIES = ["ninjas", "space pirates", "slice of life", "giant robots", "cooking battles"]
+DOCS = [Document(page_content="Title: Naruto.. Overview: Ninjas.", metadata={"mal_id": 20, "doc_id": "20-0"})]
+
+
+class BatchPipeline:
+    """
+    Just enough of AnimeRecommendationPipeline for run_batches, over a real
+    recommender and the stub LLM. Generation for batch number `stall_batch`
+    never returns, so the run can be killed there.
+    """
+
+    def __init__(self, stall_batch=None):
+        self.recommender = AnimeRecommender(
+            chroma_retriever=None, sparse_retriever=None, api_key="", model_name="", llm=stub_llm()
+        )
+        self.recommender.retrieve_batch = lambda queries, options=None: [DOCS for _ in queries]
+        self.generated = []
+        self.stalled = asyncio.Event()
+        generate = self.recommender.agenerate_batch
+
+        async def agenerate_batch(queries, docs_per_query, max_concurrency=4):
+            self.generated.append(list(queries))
+            if len(self.generated) == stall_batch:
+                self.stalled.set()
+                await asyncio.Event().wait()
+            return await generate(queries, docs_per_query, max_concurrency)
+
+        self.recommender.agenerate_batch = agenerate_batch
+
+    @staticmethod
+    def parse(raw_output):
+        return parse_recommendation(raw_output)
+
+    @property
+    def scope(self):
+        return self.recommender.default_options.cache_scope()
+
+
+def _written(path):
+    return [query for query, _, _ in read_prewarm_file(str(path))]
+
+
+def test_resume_skips_queries_written_before_the_run_was_killed(tmp_path):
+    out = tmp_path / "prewarm" / "cache.jsonl"
+    first = BatchPipeline(stall_batch=2)
+
+    async def killed_run():
+        run = asyncio.create_task(run_batches(first, QUERIES, str(out), batch_size=2, concurrency=2))
+        await first.stalled.wait()
+        run.cancel()  # killed while the second batch is generating
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(killed_run())
+    assert first.generated == [QUERIES[:2], QUERIES[2:4]]
+    assert _written(out) == QUERIES[:2]  # the first batch was checkpointed
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"query": "slice of li')  # a record torn by the kill
+
+    pending = pending_queries(QUERIES, str(out), first.scope)
+    assert pending == QUERIES[2:]
+
+    second = BatchPipeline()
+    done, failed = asyncio.run(run_batches(second, pending, str(out), batch_size=2, concurrency=2))
+
+    assert (done, failed) == (3, 0)
+    assert second.generated == [QUERIES[2:4], QUERIES[4:]]  # nothing answered twice
+    assert _written(out) == QUERIES
+    assert pending_queries(QUERIES, str(out), second.scope) == []
+
+
+def test_answers_for_other_retrieval_settings_are_not_reused(tmp_path):
+    out = tmp_path / "cache.jsonl"
+    pipeline = BatchPipeline()
+    asyncio.run(run_batches(pipeline, QUERIES[:2], str(out), batch_size=2, concurrency=2))
+
+    assert pending_queries([" NINJAS ", "robots"], str(out), pipeline.scope) == ["robots"]
+    assert pending_queries(QUERIES[:2], str(out), ("other", "scope")) == QUERIES[:2]
+
+
+def test_read_queries_drops_blank_lines_and_normalized_duplicates(tmp_path):
+    txt = tmp_path / "queries.txt"
+    txt.write_text("ninjas\n\n  Ninjas \nspace pirates\n", encoding="utf-8")
+    jsonl = tmp_path / "queries.jsonl"
+    jsonl.write_text("\n".join(json.dumps({"query": q}) for q in ["robots", "ROBOTS", "cooking"]), encoding="utf-8")
+
+    assert read_queries(str(txt)) == ["ninjas", "space pirates"]
+    assert read_queries(str(jsonl)) == ["robots", "cooking"]
@@ -0,0 +1,70 @@
+import math
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src.bm25_index import BM25Index, BM25IndexWriter, tokenize
+
+VOCAB = ["ninja", "space", "dark", "school", "romance", "mecha", "detective", "magic", "idol", "sports"]
+
+
+def brute_force_scores(texts, query, k1=1.5, b=0.75):
+    """Textbook BM25 (Lucene IDF), one full pass over every document."""
+    docs = [tokenize(t) for t in texts]
+    n, avgdl = len(docs), sum(map(len, docs)) / len(docs)
+    df = Counter(term for doc in docs for term in set(doc))
+    scores = []
+    for doc in docs:
+        tf, score = Counter(doc), 0.0
+        for term in tokenize(query):
+            if tf[term]:
+                idf = math.log((n - df[term] + 0.5) / (df[term] + 0.5) + 1.0)
+                score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(doc) / avgdl))
+        scores.append(score)
+    return np.asarray(scores)
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    rng = random.Random(3)
+    texts = [" ".join(rng.choices(VOCAB, k=rng.randint(3, 30))) for _ in range(400)]
+    writer = BM25IndexWriter()
+    for text in texts:
+        writer.add(text)
+    index_dir = str(tmp_path_factory.mktemp("bm25"))
+    writer.save(index_dir)
+    return texts, BM25Index(index_dir)
+
+
+@pytest.mark.parametrize("query", ["ninja", "dark detective", "space mecha magic", "idol idol sports"])
+def test_search_matches_brute_force(corpus, query):
+    texts, index = corpus
+    expected = brute_force_scores(texts, query)
+    results = index.search(query, k=10)
+
+    assert len(results) == 10
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    # The 10 best scores agree, and each returned document carries its true score
+    np.testing.assert_allclose(scores, np.sort(expected)[::-1][:10], rtol=1e-5)
+    for position, score in results:
+        assert score == pytest.approx(expected[position], rel=1e-5)
+
+
+def test_candidates_restrict_scoring(corpus):
+    texts, index = corpus
+    candidates = np.arange(0, 400, 7)
+    expected = brute_force_scores(texts, "romance school")
+    results = index.search("romance school", k=5, candidates=candidates)
+
+    assert {p for p, _ in results} <= set(candidates.tolist())
+    best = sorted(candidates, key=lambda p: -expected[p])[:5]
+    np.testing.assert_allclose([s for _, s in results], expected[best], rtol=1e-5)
+
+
+def test_unknown_terms_and_empty_candidates(corpus):
+    _, index = corpus
+    assert index.search("zzz unknown") == []
+    assert index.search("ninja", candidates=np.array([], dtype=np.int64)) == []
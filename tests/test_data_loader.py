@@ -0,0 +1,56 @@
+import pytest
+
+from src.data_loader import AnimeDataLoader
+
+CSV = (
+    "MAL_ID,Name,Score,Genres,sypnopsis\n"
+    "1,Cowboy Bebop,8.78,\"Action, Sci-Fi\",Bounty hunters in space.\n"
+    "5,Broken,7.0,Drama,Too,many,fields\n"
+    "20,Naruto,7.91,\"Action, Comedy\",A ninja village.\n"
+    "21,No Synopsis,8.5,Action,\n"
+    "1,Cowboy Bebop again,8.78,Action,Duplicate id.\n"
+    "30,Evangelion,Unknown,\"Mecha, Drama\",\"Pilots, angels, \"\"instrumentality\"\".\"\n"
+    "31,Also broken\n"
+    "40,One field too many,7.5,Drama,A synopsis.,extra\n"
+    "41,Last,6.1,Comedy,The end.\n"
+)
+
+
+def _load(tmp_path, chunksize):
+    path = tmp_path / "anime.csv"
+    path.write_text(CSV, encoding="utf-8")
+    loader = AnimeDataLoader(str(path), chunksize=chunksize)
+    docs = [doc for batch in loader.iter_batches() for doc in batch]
+    return loader, docs
+
+
+# Small chunks put over-long rows at chunk starts, where the C parser does not flag them itself
+@pytest.mark.parametrize("chunksize", [1, 2, 3, 100])
+def test_every_row_is_emitted_or_counted(tmp_path, chunksize):
+    loader, docs = _load(tmp_path, chunksize)
+
+    assert [doc.metadata["MAL_ID"] for doc in docs] == [1, 20, 30, 41]
+    assert loader.stats.as_dict() == {
+        "rows_read": 7,
+        "bad_lines": 2,
+        "missing_fields": 2,
+        "duplicate_ids": 1,
+        "rows_emitted": 4,
+    }
+
+
+def test_documents_keep_text_shape_and_structured_metadata(tmp_path):
+    _, docs = _load(tmp_path, 100)
+
+    assert docs[0].page_content == (
+        "combined_info: Title: Cowboy Bebop.. Overview: Bounty hunters in space.Genres: Action, Sci-Fi"
+    )
+    assert docs[0].metadata == {"MAL_ID": 1, "Name": "Cowboy Bebop", "Score": 8.78, "Genres": "Action, Sci-Fi"}
+    assert docs[2].metadata["Score"] is None  # "Unknown" is not a score
+
+
+def test_missing_required_column_raises(tmp_path):
+    path = tmp_path / "anime.csv"
+    path.write_text("MAL_ID,Name\n1,Cowboy Bebop\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="sypnopsis"):
+        list(AnimeDataLoader(str(path)).iter_batches())
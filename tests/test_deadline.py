@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from utils.deadline import Deadline, parse_split
+
+
+def test_split_is_normalized_over_the_request_stages():
+    assert parse_split("retrieval:1,generation:3") == {"retrieval": 0.25, "generation": 0.75}
+    assert parse_split("generation:2") == {"retrieval": 0.0, "generation": 1.0}
+
+
+@pytest.mark.parametrize("spec", ["retrieval:0.15,metadata:0.1", "retrieval:0,generation:0"])
+def test_unknown_stages_and_empty_budgets_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_split(spec)
+
+
+def test_generation_gets_the_whole_remaining_budget():
+    deadline = Deadline(10, parse_split("retrieval:0.15,generation:0.85"))
+
+    assert deadline.time_left("retrieval") == pytest.approx(1.5, abs=0.05)
+    assert deadline.time_left("generation") == pytest.approx(deadline.remaining(), abs=0.05)
+    assert not deadline.expired
+
+
+def test_spent_stages_report_zero():
+    deadline = Deadline(0.05, {"retrieval": 0.5, "generation": 0.5})
+    time.sleep(0.06)
+
+    assert deadline.time_left("retrieval") == deadline.time_left("generation") == 0.0
+    assert deadline.expired
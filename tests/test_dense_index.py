@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from src import dense_index
+from src.dense_index import DenseIndex, DenseIndexWriter
+from src.document_store import DocumentStore, DocumentStoreWriter
+
+N_DOCS, DIM = 50, 16
+IDS = [f"{i}-0" for i in range(N_DOCS)]
+
+
+def _build(index_dir, dtype="float32", n_docs=N_DOCS, write_batch=16):
+    vectors = np.random.default_rng(0).normal(size=(n_docs, DIM)).astype(np.float32)
+    writer = DenseIndexWriter(str(index_dir), IDS[:n_docs], dim=DIM, dtype=dtype)
+    for start in range(0, n_docs, write_batch):
+        writer.write(vectors[start:start + write_batch])
+    writer.close()
+    return DenseIndex(str(index_dir))
+
+
+def _brute_force(index, query, k, candidates=None):
+    """Cosine top-k over the stored rows, one at a time."""
+    rows = range(len(index.matrix)) if candidates is None else candidates
+    query = np.asarray(query, dtype=np.float64)
+    query /= np.linalg.norm(query)
+    scores = {int(p): float(np.asarray(index.matrix[p], dtype=np.float64) @ query) for p in rows}
+    return sorted(scores, key=scores.get, reverse=True)[:k], scores
+
+
+QUERIES = np.random.default_rng(1).normal(size=(6, DIM))
+
+
+@pytest.fixture(params=["float32", "float16"])
+def index(request, tmp_path, monkeypatch):
+    # Small blocks so float16 scoring goes through several upcast blocks
+    monkeypatch.setattr(dense_index, "SCORE_BLOCK_ROWS", 7)
+    return _build(tmp_path / request.param, request.param)
+
+
+def test_rows_are_stored_normalized(index):
+    norms = np.linalg.norm(np.asarray(index.matrix, dtype=np.float32), axis=1)
+    assert norms == pytest.approx(np.ones(N_DOCS), abs=1e-3)
+    assert index.matrix.dtype == np.dtype(index.meta["dtype"])
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_search_matches_brute_force_cosine(index, k):
+    for query in QUERIES:
+        expected, scores = _brute_force(index, query, k)
+        hits = index.search(query * 3.0, k)  # query norm must not matter
+
+        assert [p for p, _ in hits] == expected
+        assert [s for _, s in hits] == pytest.approx([scores[p] for p in expected], abs=1e-4)
+
+
+def test_candidates_restrict_the_search(index):
+    candidates = np.arange(3, N_DOCS, 4)
+    for query in QUERIES:
+        expected, _ = _brute_force(index, query, 5, candidates)
+        hits = index.search(query, 5, candidates=candidates)
+
+        assert [p for p, _ in hits] == expected
+        assert set(p for p, _ in hits) <= set(candidates.tolist())
+    assert index.search(QUERIES[0], 5, candidates=np.array([], dtype=np.int64)) == []
+
+
+def test_search_batch_agrees_with_search(index):
+    batched = index.search_batch(QUERIES, k=7)
+
+    assert len(batched) == len(QUERIES)
+    for query, hits in zip(QUERIES, batched):
+        single = index.search(query, 7)
+        assert [p for p, _ in hits] == [p for p, _ in single]
+        assert [s for _, s in hits] == pytest.approx([s for _, s in single], abs=1e-5)
+    assert index.search_batch(np.empty((0, DIM))) == []
+
+
+def test_k_larger_than_the_index_returns_every_row(tmp_path):
+    index = _build(tmp_path, n_docs=4)
+
+    hits = index.search(QUERIES[0], k=10)
+    assert sorted(p for p, _ in hits) == [0, 1, 2, 3]
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert [p for p, _ in index.search_batch(QUERIES[:1], k=10)[0]] == [p for p, _ in hits]
+    assert len(index.search(QUERIES[0], k=10, candidates=[1, 2])) == 2
+
+
+def test_incomplete_index_is_rejected(tmp_path):
+    writer = DenseIndexWriter(str(tmp_path), IDS[:3], dim=DIM)
+    writer.write(np.ones((2, DIM)))
+    with pytest.raises(ValueError):
+        writer.close()
+    assert not DenseIndex.exists(str(tmp_path))
+
+
+def test_matches_checks_the_document_store_alignment(tmp_path):
+    index = _build(tmp_path / "dense", n_docs=5)
+
+    def store(name, ids):
+        writer = DocumentStoreWriter(str(tmp_path / name))
+        for doc_id in ids:
+            writer.add(f"text {doc_id}", {}, doc_id)
+        writer.close()
+        return DocumentStore(str(tmp_path / name))
+
+    assert index.matches(store("same", IDS[:5]))
+    assert not index.matches(store("reordered", [IDS[1], IDS[0], *IDS[2:5]]))
+    assert not index.matches(store("longer", IDS[:6]))
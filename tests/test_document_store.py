@@ -0,0 +1,37 @@
+from src.document_store import DocumentStore, DocumentStoreWriter
+from src.fingerprint import ids_fingerprint
+
+
+def _write(store_dir, rows):
+    writer = DocumentStoreWriter(str(store_dir))
+    for doc_id, text, meta in rows:
+        writer.add(text, meta, doc_id)
+    writer.close()
+    return DocumentStore(str(store_dir))
+
+
+def test_round_trip_by_position_and_id(tmp_path):
+    rows = [
+        ("20-0", "Naruto. Ninja village", {"mal_id": 20, "genres": "Action"}),
+        ("1-0", "Cowboy Bebop — space bounty hunters", {"mal_id": 1, "score": 8.8}),
+        ("1-1", "日本語のテキスト", {}),
+    ]
+    store = _write(tmp_path, rows)
+
+    assert len(store) == 3
+    assert list(store.ids) == ["20-0", "1-0", "1-1"]
+    assert store.metadatas[1] == {"mal_id": 1, "score": 8.8}
+    assert store.metadatas[-1] == {}
+    assert store.fingerprint == ids_fingerprint(["20-0", "1-0", "1-1"])
+
+    for position, (doc_id, text, meta) in enumerate(rows):
+        assert store.position(doc_id) == position
+        doc = store.get_document(position)
+        assert doc.page_content == text
+        assert doc.metadata == {**meta, "doc_id": doc_id}
+    assert store.position("1") is None and store.position("999-0") is None
+
+
+def test_empty_store(tmp_path):
+    store = _write(tmp_path, [])
+    assert len(store) == 0 and list(store.ids) == [] and store.position("x") is None
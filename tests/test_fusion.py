@@ -0,0 +1,54 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.fusion import RetrievalOptions, reciprocal_rank_fusion
+
+
+@pytest.mark.parametrize("dense_weight, sparse_weight", [(1.0, 0.0), (0.0, 1.0), (0.3, 2.0)])
+def test_options_accept_any_nonzero_weighting(dense_weight, sparse_weight):
+    options = RetrievalOptions(dense_weight=dense_weight, sparse_weight=sparse_weight)
+    assert options.cache_scope()[:2] == (dense_weight, sparse_weight)
+
+
+@pytest.mark.parametrize("dense_weight, sparse_weight", [(0.0, 0.0), (-1.0, 1.0), (1.0, -0.5)])
+def test_options_reject_weightings_that_retrieve_nothing(dense_weight, sparse_weight):
+    with pytest.raises(ValueError):
+        RetrievalOptions(dense_weight=dense_weight, sparse_weight=sparse_weight)
+
+
+def _doc(doc_id):
+    return Document(page_content=f"text of {doc_id}", metadata={"doc_id": doc_id})
+
+
+def _ids(docs):
+    return [doc.metadata["doc_id"] for doc in docs]
+
+
+def test_documents_found_by_both_retrievers_rank_first():
+    dense = [_doc("a"), _doc("b"), _doc("c")]
+    sparse = [_doc("d"), _doc("c"), _doc("e")]
+
+    assert _ids(reciprocal_rank_fusion([dense, sparse], [1.0, 1.0], top_k=3)) == ["c", "a", "d"]
+
+
+@pytest.mark.parametrize("weights, expected", [((2.0, 1.0), ["a", "b"]), ((1.0, 2.0), ["b", "a"])])
+def test_weights_decide_between_disagreeing_lists(weights, expected):
+    dense = [_doc("a"), _doc("b")]
+    sparse = [_doc("b"), _doc("a")]
+
+    assert _ids(reciprocal_rank_fusion([dense, sparse], weights)) == expected
+
+
+def test_zero_weight_lists_are_ignored():
+    dense = [_doc("a")]
+    sparse = [_doc("b"), _doc("c")]
+
+    assert _ids(reciprocal_rank_fusion([dense, sparse], [0.0, 1.0])) == ["b", "c"]
+
+
+def test_same_chunk_merges_across_lists_and_top_k_applies():
+    dense_a = _doc("a")
+    fused = reciprocal_rank_fusion([[dense_a, _doc("b")], [_doc("a"), _doc("c")]], [1.0, 1.0], top_k=2)
+
+    assert _ids(fused) == ["a", "b"]  # ties keep first-seen order
+    assert fused[0] is dense_a
@@ -0,0 +1,147 @@
+import json
+import os
+
+import pytest
+
+from utils import jikan_client
+from utils.index_versions import IndexVersions
+from utils.metadata_cache import MetadataCache
+
+
+def _build(versions, files=None):
+    """Creates a complete version (manifest written) and returns its paths."""
+    paths = versions.new_version()
+    for name, content in (files or {}).items():
+        path = os.path.join(paths.chroma_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    versions.write_manifest(paths.version, {"documents": 0})
+    return paths
+
+
+@pytest.fixture
+def versions(tmp_path):
+    return IndexVersions(str(tmp_path / "indexes"))
+
+
+def test_only_complete_versions_can_be_activated(versions):
+    complete = _build(versions)
+    unfinished = versions.new_version()
+
+    assert versions.versions() == [complete.version]
+    with pytest.raises(ValueError):
+        versions.activate(unfinished.version)
+    assert versions.current() is None
+
+    versions.activate(complete.version)
+    assert versions.current() == complete.version
+    assert versions.resolve() == complete
+
+
+def test_resolve_falls_back_to_the_legacy_layout(versions):
+    assert versions.resolve().version is None
+
+
+def test_rollback_activates_the_previous_version(versions):
+    first, second = _build(versions), _build(versions)
+    versions.activate(second.version)
+
+    assert versions.rollback() == first.version
+    assert versions.current() == first.version
+    with pytest.raises(ValueError):
+        versions.rollback()
+
+
+def test_prune_keeps_the_newest_and_the_live_version(versions):
+    built = [_build(versions).version for _ in range(4)]
+    versions.activate(built[0])
+
+    assert versions.prune(keep=2) == built[1:3]
+    assert versions.versions() == [built[0], built[3]]
+    assert versions.prune(keep=2) == []
+
+
+def test_seeding_without_current_means_a_full_build(versions):
+    paths = versions.new_version()
+
+    assert versions.seed_vector_store(paths) is None
+    assert not os.path.exists(paths.chroma_dir)
+
+
+def test_seeding_copies_the_live_vector_store(versions):
+    live = _build(versions, {"chroma.sqlite3": "live", "segment/data_level0.bin": "vectors"})
+    versions.activate(live.version)
+    paths = versions.new_version()
+
+    assert versions.seed_vector_store(paths) == live.version
+    with open(os.path.join(paths.chroma_dir, "segment", "data_level0.bin"), encoding="utf-8") as f:
+        assert f.read() == "vectors"
+
+    # A copy, not a hard link: the build writes into it in place
+    with open(os.path.join(paths.chroma_dir, "chroma.sqlite3"), "w", encoding="utf-8") as f:
+        f.write("rebuilt")
+    with open(os.path.join(live.chroma_dir, "chroma.sqlite3"), encoding="utf-8") as f:
+        assert f.read() == "live"
+
+
+def test_sync_client_resolver_follows_current(versions, tmp_path, monkeypatch):
+    def build_with_titles(names):
+        paths = _build(versions)
+        with open(paths.title_index_path, "w", encoding="utf-8") as f:
+            json.dump([[i, name, 8.0] for i, name in enumerate(names, 1)], f)
+        versions.activate(paths.version)
+
+    monkeypatch.setattr(jikan_client, "IndexVersions", lambda: versions)
+    monkeypatch.setattr(jikan_client, "_shared_cache", MetadataCache(str(tmp_path / "metadata.sqlite3")))
+    monkeypatch.setattr(jikan_client, "_sync_client", None)
+    monkeypatch.setattr(jikan_client, "_resolver_version", object())
+
+    build_with_titles(["Naruto"])
+    client = jikan_client.get_sync_client()
+    assert client.resolve("Naruto")["mal_id"] == 1
+    assert jikan_client.get_sync_client().resolver is client.resolver
+
+    build_with_titles(["Bleach", "Naruto"])
+    assert jikan_client.get_sync_client() is client
+    assert client.resolve("Naruto")["mal_id"] == 2
+    client.close()
+
+
+def test_rebuild_with_one_changed_row_embeds_one_document(versions, tmp_path):
+    pytest.importorskip("chromadb")
+    pytest.importorskip("langchain_community.vectorstores")
+    from benchmarks.stubs import HashingEmbeddings, StubEmbeddingPool
+    from benchmarks.synthetic_catalog import write_catalog
+    from src.data_loader import AnimeDataLoader
+    from src.vector_store import VectorStoreBuilder
+
+    csv_path = write_catalog(str(tmp_path / "catalog.csv"), rows=20, synopsis_words=20,
+                             vocabulary=[f"word{i}" for i in range(50)])
+    embedding = HashingEmbeddings()
+
+    def build(paths):
+        builder = VectorStoreBuilder("", persist_dir=paths.chroma_dir, embedding=embedding)
+        pool = StubEmbeddingPool(embedding)
+        counts = builder.build_incremental(builder.split_batches(AnimeDataLoader(csv_path).iter_batches()),
+                                           pool=pool)
+        versions.write_manifest(paths.version, {"documents": counts["chunks"]})
+        versions.activate(paths.version)
+        return counts, pool
+
+    first = versions.new_version()
+    counts, pool = build(first)
+    assert counts["changed_rows"] == 20 and pool.documents_embedded == counts["embedded"]
+
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        lines = f.readlines()
+    lines[5] = lines[5].rstrip("\r\n") + " Now with a new ending.\r\n"  # synopsis is the last column
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(lines)
+
+    second = versions.new_version()
+    assert versions.seed_vector_store(second) == first.version
+    counts, pool = build(second)
+
+    assert counts["changed_rows"] == 1
+    assert counts["embedded"] == pool.documents_embedded == 1
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from config.config import METADATA_NEGATIVE_TTL_SECONDS
+from tests.jikan_stub import HITS
+from utils.jikan_client import JikanClient
+from utils.metadata_cache import MetadataCache
+from utils.rate_limiter import TokenBucket
+
+
+class ThreadRecordingCache(MetadataCache):
+    """MetadataCache that records which threads touch SQLite."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, value, ttl_seconds=None):
+        self.threads.append(threading.current_thread())
+        super().set(key, value, ttl_seconds)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ThreadRecordingCache(str(tmp_path / "metadata.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def _client(url, cache):
+    return JikanClient(base_url=url, cache=cache, limiter=TokenBucket(1000, 100), backoff=0.01)
+
+
+def _run(client, coro_fn):
+    async def main():
+        try:
+            return threading.current_thread(), await coro_fn()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_429_is_retried_after_retry_after(jikan_url, cache):
+    client = _client(jikan_url, cache)
+
+    _, meta = _run(client, lambda: client.search_anime("Rate Limited"))
+
+    assert meta["title"] == "Rate Limited"
+    assert HITS["Rate Limited"] == 2
+
+
+def test_misses_are_cached_with_the_negative_ttl(jikan_url, cache):
+    client = _client(jikan_url, cache)
+
+    async def twice():
+        return [await client.search_anime("Nothing"), await client.search_anime("nothing ")]
+
+    loop_thread, results = _run(client, twice)
+    touched = list(cache.threads)
+
+    assert results == [None, None]
+    assert HITS["Nothing"] == 1
+    assert cache.get("anime:nothing") == (True, None)
+    expires_at = cache._connection().execute(
+        "SELECT expires_at FROM metadata WHERE key = 'anime:nothing'").fetchone()[0]
+    assert expires_at - time.time() == pytest.approx(METADATA_NEGATIVE_TTL_SECONDS, abs=60)
+    assert touched and all(t is not loop_thread for t in touched)
+
+
+def test_batch_returns_at_the_deadline_and_finishes_in_the_background(jikan_url, cache):
+    client = _client(jikan_url, cache)
+
+    async def batch():
+        start = time.monotonic()
+        results, pending = await client.search_many(["Naruto", "Slow", "Naruto"], deadline=0.2)
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0.6)  # the slow lookup keeps going and lands in the cache
+        return results, pending, elapsed
+
+    loop_thread, (results, pending, elapsed) = _run(client, batch)
+    touched = list(cache.threads)
+
+    assert elapsed < 0.4
+    assert list(results) == ["Naruto"] and results["Naruto"]["title"] == "Naruto"
+    assert pending == ["Slow"]
+    assert cache.get("anime:slow")[1]["title"] == "Slow"
+    assert touched and all(t is not loop_thread for t in touched)
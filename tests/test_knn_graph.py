@@ -0,0 +1,84 @@
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+import app.main as main
+from src.dense_index import DenseIndex, DenseIndexWriter
+from src.document_store import DocumentStore, DocumentStoreWriter
+from src.knn_graph import KnnGraph, build_knn_graph
+
+# (doc_id, mal_id, name, genres, embedding); Bebop has two chunks that average out
+CHUNKS = [
+    ("1-0", 1, "Cowboy Bebop", "Action, Sci-Fi", [1.0, 0.0, 0.0]),
+    ("1-1", 1, "Cowboy Bebop", "Action, Sci-Fi", [1.0, 0.1, 0.0]),
+    ("2-0", 2, "Toradora", "Romance", [0.9, 0.44, 0.0]),
+    ("3-0", 3, "Trigun", "Action, Sci-Fi", [0.8, 0.6, 0.0]),
+    ("4-0", 4, "Nichijou", "Comedy", [0.0, 0.0, 1.0]),
+]
+
+
+@pytest.fixture(scope="module")
+def indexes(tmp_path_factory):
+    root = tmp_path_factory.mktemp("knn")
+    store_writer = DocumentStoreWriter(str(root / "docstore"))
+    for doc_id, mal_id, name, genres, _ in CHUNKS:
+        store_writer.add(f"Title: {name}", {"mal_id": mal_id, "name": name, "genres": genres}, doc_id)
+    store_writer.close()
+    dense_writer = DenseIndexWriter(str(root / "dense"), [c[0] for c in CHUNKS], dim=3)
+    dense_writer.write([c[4] for c in CHUNKS])
+    dense_writer.close()
+    return root, DenseIndex(str(root / "dense")), DocumentStore(str(root / "docstore"))
+
+
+def _graph(indexes, name, **kwargs):
+    root, dense, store = indexes
+    build_knn_graph(dense, store, str(root / name), **kwargs)
+    return KnnGraph(str(root / name))
+
+
+def test_every_title_gets_its_neighbours_but_never_itself(indexes):
+    graph = _graph(indexes, "plain", n_neighbors=10, genre_weight=0.0)
+
+    assert len(graph) == 4 and graph.meta["n_neighbors"] == 3  # capped at n_titles - 1
+    for mal_id in (1, 2, 3, 4):
+        neighbours = graph.neighbors(mal_id)
+        assert len(neighbours) == 3 and mal_id not in [m for m, _, _ in neighbours]
+        assert [s for _, _, s in neighbours] == sorted((s for _, _, s in neighbours), reverse=True)
+    assert graph.name(1) == "Cowboy Bebop"
+
+
+def test_genre_overlap_reorders_close_neighbours(indexes):
+    by_embedding = _graph(indexes, "cosine", genre_weight=0.0)
+    blended = _graph(indexes, "blended", genre_weight=0.5)
+
+    assert [m for m, _, _ in by_embedding.neighbors(1)] == [2, 3, 4]
+    assert [m for m, _, _ in blended.neighbors(1)] == [3, 2, 4]  # Trigun shares both genres
+    assert blended.neighbors(1)[0][1] == "Trigun"
+
+
+def test_k_truncates_and_unknown_ids_return_none(indexes):
+    graph = _graph(indexes, "truncated", genre_weight=0.0)
+
+    assert [m for m, _, _ in graph.neighbors(1, k=1)] == [2]
+    assert graph.neighbors(999) is None and graph.name(999) is None
+    assert graph.neighbors(0) is None
+
+
+def test_similar_endpoint(indexes, monkeypatch):
+    graph = _graph(indexes, "endpoint", genre_weight=0.0)
+    monkeypatch.setattr(main, "knn_graph", graph)
+
+    response = asyncio.run(main.get_similar(id=1, k=2))
+    assert response["title"] == "Cowboy Bebop" and response["count"] == 2
+    assert [s["mal_id"] for s in response["similar"]] == [2, 3]
+
+    with pytest.raises(HTTPException) as unknown:
+        asyncio.run(main.get_similar(id=999, k=2))
+    assert unknown.value.status_code == 404
+
+    monkeypatch.setattr(main, "knn_graph", None)
+    with pytest.raises(HTTPException) as missing:
+        asyncio.run(main.get_similar(id=1, k=2))
+    assert missing.value.status_code == 503
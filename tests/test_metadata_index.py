@@ -0,0 +1,116 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from src.fingerprint import ids_fingerprint
+from src.metadata_index import MetadataFilter, MetadataIndex, build_metadata_index
+from src.recommender import AnimeRecommender
+
+class Store:
+    """The ids / metadatas / len() a DocumentStore offers to index builders."""
+
+    def __init__(self, ids, metadatas):
+        self.ids, self.metadatas = ids, metadatas
+        self.fingerprint = ids_fingerprint(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+GENRES = ["Action", "Comedy", "Drama", "Romance", "Sci-Fi", "Slice of Life"]
+
+
+@pytest.fixture(scope="module")
+def catalog(tmp_path_factory):
+    rng = random.Random(7)
+    metadatas = []
+    for mal_id in range(1, 301):
+        meta = {"mal_id": mal_id, "name": f"Title {mal_id}",
+                "genres": ", ".join(rng.sample(GENRES, rng.randint(0, 3)))}
+        if rng.random() > 0.1:
+            meta["score"] = round(rng.uniform(4, 9.5), 2)
+        # Two chunks per title share its metadata
+        metadatas += [meta, meta]
+    store = Store([f"{m['mal_id']}-{i % 2}" for i, m in enumerate(metadatas)], metadatas)
+    index_dir = str(tmp_path_factory.mktemp("metadata_index"))
+    build_metadata_index(store, index_dir)
+    return store, MetadataIndex(index_dir)
+
+
+FILTERS = [
+    MetadataFilter(genres=("Action",)),
+    MetadataFilter(genres=("action", "Comedy")),
+    MetadataFilter(exclude_genres=("Drama",)),
+    MetadataFilter(genres=("Romance",), exclude_genres=("Comedy", "Sci-Fi")),
+    MetadataFilter(min_score=7.0),
+    MetadataFilter(max_score=6.0),
+    MetadataFilter(min_score=6.5, max_score=8.0, genres=("Slice of Life",)),
+    MetadataFilter(mal_ids=(3, 17, 250, 9999)),
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_candidates_match_brute_force(catalog, filters):
+    store, index = catalog
+    expected = [i for i, meta in enumerate(store.metadatas) if filters.matches_metadata(meta)]
+    assert index.candidates(filters).tolist() == expected
+
+
+def test_inactive_filter_and_unknown_genre(catalog):
+    _, index = catalog
+    assert index.candidates(MetadataFilter()) is None
+    assert index.candidates(MetadataFilter(genres=("Mecha",))).tolist() == []
+    assert index.unknown_genres(["action", "Mecha"]) == ["Mecha"]
+    assert index.canonical_genre("slice of life") == "Slice of Life"
+
+
+def test_index_tracks_the_store_it_was_built_from(catalog):
+    store, index = catalog
+    assert index.matches(store)
+    assert not index.matches(Store(list(reversed(store.ids)), store.metadatas))
+
+
+def _chroma_recommender(index, max_ids):
+    store = InMemoryVectorStore(DeterministicFakeEmbedding(size=8))
+    return AnimeRecommender(
+        chroma_retriever=store.as_retriever(search_kwargs={"k": 5}), sparse_retriever=None, api_key="",
+        model_name="", llm=FakeListChatModel(responses=["x"]), metadata_index=index,
+        chroma_filter_max_ids=max_ids, chroma_filter_overfetch=4
+    )
+
+
+def test_chroma_gets_id_list_for_narrow_filters(catalog):
+    _, index = catalog
+    filters = MetadataFilter(mal_ids=(3, 17))
+    recommender = _chroma_recommender(index, max_ids=10)
+    kwargs = recommender._filter_kwargs(recommender.dense_retriever, index.candidates(filters), filters)
+    assert kwargs == {"filter": {"mal_id": {"$in": [3, 17]}}}
+
+
+def test_chroma_gets_native_where_for_broad_filters(catalog):
+    store, index = catalog
+    filters = MetadataFilter(genres=("action",), exclude_genres=("Drama",), min_score=6.0)
+    recommender = _chroma_recommender(index, max_ids=10)
+    kwargs = recommender._filter_kwargs(recommender.dense_retriever, index.candidates(filters), filters)
+    assert kwargs == {
+        "k": 20,
+        "filter": {"score": {"$gte": 6.0}},
+        "where_document": {"$contains": "Action"},
+    }
+
+    # Substring hits are re-checked exactly and trimmed back to k
+    docs = [SimpleNamespace(metadata=meta) for meta in store.metadatas]
+    kept = recommender._post_filter(recommender.dense_retriever, docs, filters)
+    assert len(kept) == 5 and all(filters.matches_metadata(d.metadata) for d in kept)
+
+
+def test_on_disk_indexes_get_candidate_positions(catalog):
+    _, index = catalog
+    recommender = _chroma_recommender(index, max_ids=10)
+    candidates = np.array([1, 2, 3])
+    assert recommender._filter_kwargs(object(), candidates)["candidates"] is candidates
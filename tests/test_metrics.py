@@ -0,0 +1,111 @@
+import asyncio
+
+from langchain_core.documents import Document
+from prometheus_client.parser import text_string_to_metric_families
+
+import app.main as main
+from benchmarks.stubs import stub_llm
+from src.recommender import AnimeRecommender
+from utils.metrics import IN_FLIGHT
+
+DOCS = [Document(page_content="Title: Naruto.. Overview: Ninjas.", metadata={"mal_id": 20, "doc_id": "20-0"})]
+ROUTE = "/api/recommend/stream"
+
+
+class StreamingPipeline:
+    """Just enough of AnimeRecommendationPipeline for the SSE endpoint, over a real recommender."""
+
+    def __init__(self):
+        self.recommender = AnimeRecommender(
+            chroma_retriever=None, sparse_retriever=None, api_key="", model_name="",
+            llm=stub_llm(first_token_delay=0.05, token_delay=0.001)
+        )
+
+        async def aretrieve(query, options=None, deadline=None):
+            return DOCS
+
+        self.recommender.aretrieve = aretrieve
+
+    def retrieval_options(self, *args):
+        return None
+
+    def filter_matches(self, options):
+        return None
+
+    async def astream_recommend(self, query, options, deadline):
+        async for chunk in self.recommender.astream_recommendation(query, options, deadline):
+            yield chunk
+
+
+def _request(path, query_string=b"", on_body=None):
+    """Runs one GET through the whole ASGI app (middleware included); returns the body."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query_string, "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+    chunks = []
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            if on_body:
+                on_body()
+
+    asyncio.run(main.app(scope, receive, send))
+    return b"".join(chunks)
+
+
+def _scrape():
+    """{(metric name, frozen labels): value} from GET /metrics."""
+    samples = {}
+    for family in text_string_to_metric_families(_request("/metrics").decode()):
+        for sample in family.samples:
+            samples[sample.name, frozenset(sample.labels.items())] = sample.value
+    return samples
+
+
+def _value(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0.0)
+
+
+def test_streamed_request_is_in_flight_until_its_body_ends(monkeypatch):
+    monkeypatch.setattr(main, "pipeline_instance", StreamingPipeline())
+    idle = IN_FLIGHT._value.get()
+    in_flight_while_streaming = []
+
+    def on_body():
+        in_flight_while_streaming.append(IN_FLIGHT._value.get())
+
+    before = _scrape()
+    body = _request(ROUTE, b"query=ninjas", on_body=on_body)
+    after = _scrape()
+
+    assert b"event: done" in body
+    # The handler returned long before the last frame; the request was still counted
+    assert in_flight_while_streaming and min(in_flight_while_streaming) == idle + 1
+    assert IN_FLIGHT._value.get() == idle
+
+    def delta(name, **labels):
+        return _value(after, name, **labels) - _value(before, name, **labels)
+
+    assert delta("anime_http_requests_total", method="GET", route=ROUTE, status="200") == 1
+    assert delta("anime_http_request_duration_seconds_count", route=ROUTE) == 1
+    # Latency covers the whole stream, first-token wait included
+    assert delta("anime_http_request_duration_seconds_sum", route=ROUTE) >= 0.05
+    for stage in ("prompt_render", "llm_first_token", "llm_total", "parse"):
+        assert delta("anime_stage_duration_seconds_count", stage=stage) == 1, stage
+    assert delta("anime_stage_duration_seconds_sum", stage="llm_first_token") >= 0.05
+    assert delta("anime_stage_duration_seconds_sum", stage="llm_total") >= 0.05
+
+
+def test_unmatched_routes_are_counted_once_they_are_sent():
+    before = _scrape()
+    _request("/no/such/page")
+    after = _scrape()
+
+    name, labels = "anime_http_requests_total", {"method": "GET", "route": "unmatched", "status": "404"}
+    assert _value(after, name, **labels) - _value(before, name, **labels) == 1
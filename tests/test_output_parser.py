@@ -0,0 +1,85 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.output_parser import RecommendationStreamParser, parse_recommendation, retrieval_only_recommendation
+
+ANSWER = (
+    "Naruto, Bleach , One Piece\n"
+    "|||**[Naruto]**\nA ninja who never gives up.\n"
+    "|||**[Bleach]**\nSoul reapers and hollows.\n"
+    "|||**[One Piece]**\nPirates chasing a treasure."
+)
+
+
+def _stream(text, cuts):
+    """Feeds `text` split at the given offsets; returns (events, parser)."""
+    parser = RecommendationStreamParser()
+    events = []
+    bounds = [0, *cuts, len(text)]
+    for start, end in zip(bounds, bounds[1:]):
+        events += parser.feed(text[start:end])
+    events += parser.close()
+    return events, parser
+
+
+def test_parse_recommendation_splits_titles_and_sections():
+    titles, sections = parse_recommendation(ANSWER)
+
+    assert titles == ["Naruto", "Bleach", "One Piece"]
+    assert sections == [
+        "**[Naruto]**\nA ninja who never gives up.",
+        "**[Bleach]**\nSoul reapers and hollows.",
+        "**[One Piece]**\nPirates chasing a treasure.",
+    ]
+
+
+@pytest.mark.parametrize("step", [1, 2, 3, 7, 50])
+def test_any_chunking_yields_the_same_events(step):
+    whole, _ = _stream(ANSWER, [])
+    chunked, parser = _stream(ANSWER, list(range(step, len(ANSWER), step)))
+
+    assert chunked == whole
+    assert [event for event, _ in chunked] == ["titles", "section", "section", "section"]
+    assert (parser.titles, parser.sections) == parse_recommendation(ANSWER)
+
+
+def test_titles_are_emitted_before_the_stream_ends():
+    parser = RecommendationStreamParser()
+
+    assert parser.feed("Naruto, Ble") == []
+    assert parser.feed("ach\n|||**[Naruto]**\nNin") == [("titles", ["Naruto", "Bleach"])]
+    assert parser.feed("jas.|||") == [("section", "**[Naruto]**\nNinjas.")]
+
+
+def test_title_line_may_end_at_the_delimiter_instead_of_a_newline():
+    assert parse_recommendation("Naruto, Bleach|||One.|||Two.") == (["Naruto", "Bleach"], ["One.", "Two."])
+
+
+def test_empty_sections_are_dropped():
+    assert parse_recommendation("Naruto\n||| |||Ninjas.|||\n") == (["Naruto"], ["Ninjas."])
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("", ([], [])),
+    ("   \n", ([], [])),
+    ("Naruto, Bleach", (["Naruto", "Bleach"], [])),
+])
+def test_degenerate_answers(raw, expected):
+    assert parse_recommendation(raw) == expected
+
+
+def test_retrieval_only_recommendation_dedupes_titles_in_fusion_order():
+    docs = [
+        Document(page_content="Title: Naruto.. Overview: A ninja village. Genres: Action",
+                 metadata={"mal_id": 20, "name": "Naruto"}),
+        Document(page_content="Title: Naruto.. Overview: Second chunk. Genres: Action",
+                 metadata={"mal_id": 20, "name": "Naruto"}),
+        Document(page_content="Title: Bleach.. Overview: Soul reapers. Genres: Action", metadata={}),
+    ]
+
+    titles, explanations = retrieval_only_recommendation(docs)
+
+    assert titles == ["Naruto", "Bleach"]
+    assert explanations[0] == "**[Naruto]**\nA ninja village."
+    assert len(explanations) == 2
+    assert retrieval_only_recommendation(docs, limit=1)[0] == ["Naruto"]
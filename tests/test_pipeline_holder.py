@@ -0,0 +1,69 @@
+import pytest
+
+from utils.pipeline_holder import PipelineHolder
+
+
+class FakePipeline:
+    def __init__(self, index_version):
+        self.index_version = index_version
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def holder():
+    loads = []
+
+    def load(index_version):
+        loads.append(index_version)
+        return FakePipeline(index_version)
+
+    holder = PipelineHolder(load)
+    holder.loads = loads
+    return holder
+
+
+def test_same_version_is_loaded_once(holder):
+    first = holder.get("v1")
+
+    assert holder.get("v1") is first
+    with holder.use("v1") as pipeline:
+        assert pipeline is first
+    assert holder.loads == ["v1"] and not first.closed
+
+
+def test_legacy_layout_version_none_is_a_real_version(holder):
+    assert holder.get(None).index_version is None
+    holder.get(None)
+    assert holder.loads == [None]
+
+
+def test_new_version_closes_the_idle_previous_pipeline(holder):
+    v1 = holder.get("v1")
+    v2 = holder.get("v2")
+
+    assert v1.closed and not v2.closed
+    assert holder.pipeline is v2 and holder.index_version == "v2"
+
+
+def test_previous_pipeline_is_closed_when_its_last_user_finishes(holder):
+    with holder.use("v1") as v1:
+        with holder.use("v1"):
+            v2 = holder.get("v2")  # another session saw the new CURRENT
+            assert not v1.closed
+        assert not v1.closed
+    assert v1.closed and not v2.closed
+
+
+def test_failed_load_keeps_the_previous_pipeline(holder):
+    v1 = holder.get("v1")
+
+    def broken(index_version):
+        raise RuntimeError("index is corrupt")
+
+    holder.load = broken
+    with pytest.raises(RuntimeError):
+        holder.get("v2")
+    assert holder.pipeline is v1 and not v1.closed and holder.index_version == "v1"
@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.query_embedding import QueryEmbeddingService
+
+
+class RecordingEmbeddings(Embeddings):
+    """Records every encoded batch; `gate` holds encoding back until it is set."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.encoding = threading.Event()
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.encoding.set()
+        self.gate.wait()
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("encoder crashed")
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def service_factory():
+    services = []
+
+    def make(embeddings, **kwargs):
+        service = QueryEmbeddingService(embeddings, **kwargs)
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        service.embeddings.gate.set()  # never leave the dispatcher blocked on a failed test
+        service.close()
+
+
+def _wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_concurrent_identical_queries_share_one_encode(service_factory):
+    embeddings = RecordingEmbeddings()
+    service = service_factory(embeddings, max_wait_ms=1)
+    embeddings.gate.clear()
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(service.embed_query, "ninjas") for _ in range(8)]
+        _wait_for(lambda: service._inflight)
+        time.sleep(0.05)  # let the other callers join the in-flight query
+        embeddings.gate.set()
+        results = [f.result() for f in futures]
+
+    assert results == [[6.0, 1.0]] * 8
+    assert embeddings.batches == [["ninjas"]]
+
+
+def test_batches_are_cut_at_max_batch(service_factory):
+    embeddings = RecordingEmbeddings()
+    service = service_factory(embeddings, max_batch=2, max_wait_ms=50)
+    embeddings.gate.clear()
+
+    with ThreadPoolExecutor(6) as pool:
+        first = pool.submit(service.embed_query, "warm")
+        assert embeddings.encoding.wait(2)
+        # Queued while "warm" is encoding, so they form the next batches
+        futures = [pool.submit(service.embed_query, q) for q in ("a", "b", "c", "d", "e")]
+        _wait_for(lambda: service._queue.qsize() == 5)
+        embeddings.gate.set()
+        first.result()
+        [f.result() for f in futures]
+
+    assert [len(b) for b in embeddings.batches] == [1, 2, 2, 1]
+    assert sorted(q for b in embeddings.batches[1:] for q in b) == ["a", "b", "c", "d", "e"]
+
+
+def test_batches_are_cut_at_max_wait(service_factory):
+    embeddings = RecordingEmbeddings()
+    service = service_factory(embeddings, max_batch=32, max_wait_ms=150)
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(service.embed_query, "a")]
+        time.sleep(0.03)
+        futures.append(pool.submit(service.embed_query, "b"))  # within the window
+        time.sleep(0.4)
+        futures.append(pool.submit(service.embed_query, "c"))  # after it closed
+        [f.result() for f in futures]
+
+    assert embeddings.batches == [["a", "b"], ["c"]]
+
+
+def test_lru_hits_skip_the_encoder(service_factory):
+    embeddings = RecordingEmbeddings()
+    service = service_factory(embeddings, cache_size=2, max_wait_ms=0)
+
+    for query in ("a", "a", "bb", "a", "ccc", "bb"):
+        service.embed_query(query)
+
+    # "a" was touched last before "ccc" came in, so "bb" was the one evicted
+    assert embeddings.batches == [["a"], ["bb"], ["ccc"], ["bb"]]
+    assert service.stats()["cached"] == 2
+
+
+def test_encoder_errors_reach_every_waiter(service_factory):
+    embeddings = RecordingEmbeddings(fail=True)
+    service = service_factory(embeddings, max_wait_ms=20)
+    embeddings.gate.clear()
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(service.embed_query, q) for q in ("a", "a", "b", "c")]
+        _wait_for(lambda: len(service._inflight) == 3)
+        embeddings.gate.set()
+        errors = [f.exception(timeout=2) for f in futures]
+
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert service._inflight == {}
+
+    embeddings.fail = False
+    assert service.embed_query("a") == [1.0, 1.0]  # nothing was cached or left in flight
+
+
+def test_service_restarts_after_close(service_factory):
+    embeddings = RecordingEmbeddings()
+    service = service_factory(embeddings, max_wait_ms=0)
+
+    assert service.embed_query("a") == [1.0, 1.0]
+    service.close()
+    assert service._thread is None
+
+    assert service.embed_query("bb") == [2.0, 1.0]
+    assert service._thread is not None and service._thread.is_alive()
+    assert embeddings.batches == [["a"], ["bb"]]
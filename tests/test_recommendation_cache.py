@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src import recommendation_cache
+from src.recommendation_cache import RecommendationCache
+from utils.deadline import DeadlineExceeded
+
+VECTORS = {
+    "ninjas": [1.0, 0.0, 0.0],
+    "ninja fights": [0.99, 0.14, 0.0],
+    "shinobi": [0.97, 0.0, 0.24],
+    "space cowboys": [0.0, 1.0, 0.0],
+}
+
+
+def embed(query):
+    return VECTORS.get(RecommendationCache.normalize(query), [0.0, 0.0, 1.0])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(recommendation_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_exact_hits_ignore_case_and_whitespace():
+    cache = RecommendationCache()
+    cache.store("Ninjas", "answer")
+
+    assert cache.lookup("  ninjas ")[0] == "answer"
+    assert cache.lookup("NINJAS")[0] == "answer"
+    assert cache.stats()["exact_hits"] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = RecommendationCache(ttl_seconds=60)
+    cache.store("ninjas", "answer")
+
+    clock.now += 59
+    assert cache.lookup("ninjas")[0] == "answer"
+    clock.now += 2
+    assert cache.lookup("ninjas")[0] is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = RecommendationCache(max_entries=2)
+    cache.store("a", "A")
+    cache.store("b", "B")
+    cache.lookup("a")  # a is now more recent than b
+    cache.store("c", "C")
+
+    assert [cache.lookup(q)[0] for q in ("a", "b", "c")] == ["A", None, "C"]
+
+
+def test_answers_are_only_reused_within_their_scope():
+    cache = RecommendationCache(embed_fn=embed)
+    cache.store("ninjas", "dense answer", scope=(1.0, 0.0))
+
+    assert cache.lookup("ninjas", scope=(1.0, 0.0))[0] == "dense answer"
+    assert cache.lookup("ninjas", scope=(0.0, 1.0))[0] is None
+    assert cache.lookup("ninja fights", scope=(0.0, 1.0))[0] is None
+
+
+def test_semantic_tier_matches_close_queries_only():
+    cache = RecommendationCache(embed_fn=embed, similarity_threshold=0.95)
+    cache.store("ninjas", "answer")
+
+    assert cache.lookup("ninja fights")[0] == "answer"
+    assert cache.lookup("space cowboys")[0] is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_semantic_tier_skips_expired_matches_and_evicts_them(clock):
+    cache = RecommendationCache(embed_fn=embed, similarity_threshold=0.95)
+    cache.store("ninjas", "stale", ttl_seconds=10)
+    cache.store("shinobi", "fresh", ttl_seconds=100)
+
+    assert cache.lookup("ninja fights")[0] == "stale"  # the closest match while it is live
+    clock.now += 11
+    assert cache.lookup("ninja fights")[0] == "fresh"
+    assert cache.stats()["entries"] == 1 and cache.stats()["semantic_hits"] == 2
+    clock.now += 100
+    assert cache.lookup("ninja fights")[0] is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_preloaded_answers_never_expire_and_add_capacity(clock):
+    cache = RecommendationCache(max_entries=1, ttl_seconds=60)
+    assert cache.preload([("ninjas", "old", ()), ("ninjas", "new", ()), ("space", "S", ())]) == 2
+
+    clock.now += 10 ** 6
+    cache.store("live", "L")
+    assert [cache.lookup(q)[0] for q in ("ninjas", "space", "live")] == ["new", "S", "L"]
+
+
+# --- Coalescing ---
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_misses_share_one_call():
+    cache = RecommendationCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_compute("ninjas", compute) for _ in range(5)))
+
+    assert _run(main()) == ["answer"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_a_real_failure_is_shared_with_followers():
+    cache = RecommendationCache()
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("LLM down")
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_compute("ninjas", compute) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert [type(r) for r in _run(main())] == [RuntimeError] * 3
+
+
+@pytest.mark.parametrize("leader_failure", ["cancelled", "deadline"])
+def test_followers_take_over_when_the_leader_gives_up(leader_failure):
+    cache = RecommendationCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            if leader_failure == "deadline":
+                raise DeadlineExceeded("generation")
+            await asyncio.sleep(10)  # cancelled below
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_compute("ninjas", compute))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.aget_or_compute("ninjas", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        if leader_failure == "cancelled":
+            await asyncio.sleep(0.06)
+            leader.cancel()
+        results = await asyncio.gather(leader, *followers, return_exceptions=True)
+        return results
+
+    results = _run(main())
+    expected = asyncio.CancelledError if leader_failure == "cancelled" else DeadlineExceeded
+    assert isinstance(results[0], expected)
+    assert results[1:] == ["answer"] * 3
+    assert len(calls) == 2  # one follower became the new leader, the others joined it
+
+
+def test_follower_wait_is_bounded_by_its_own_timeout():
+    cache = RecommendationCache()
+
+    async def compute():
+        await asyncio.sleep(0.3)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_compute("ninjas", compute))
+        await asyncio.sleep(0.01)
+        start = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await cache.aget_or_compute("ninjas", compute, timeout=0.05)
+        waited = time.monotonic() - start
+        return waited, await leader
+
+    waited, leader_result = _run(main())
+    assert waited < 0.2
+    assert leader_result == "answer"
+    assert cache.lookup("ninjas")[0] == "answer"
+
+
+def test_sync_followers_retry_when_the_leader_is_interrupted():
+    cache = RecommendationCache()
+    started = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            started.set()
+            time.sleep(0.05)
+            raise KeyboardInterrupt
+        return "answer"
+
+    def lead():
+        with pytest.raises(KeyboardInterrupt):
+            cache.get_or_compute("ninjas", compute)
+
+    leader = threading.Thread(target=lead)
+    leader.start()
+    started.wait()
+    assert cache.get_or_compute("ninjas", compute) == "answer"
+    leader.join()
+    assert len(calls) == 2
+
+
+def test_coalescing_is_per_scope():
+    cache = RecommendationCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(cache.aget_or_compute("ninjas", compute, scope=("a",)),
+                                    cache.aget_or_compute("ninjas", compute, scope=("b",)))
+
+    _run(main())
+    assert len(calls) == 2
+    assert cache.stats()["coalesced"] == 0
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+import app.main as main
+from benchmarks.stubs import STUB_RESPONSE, LatencyChatModel, stub_llm
+from src.context_packer import ContextPacker
+from src.metadata_index import MetadataFilter
+from src.output_parser import parse_recommendation
+from src.recommender import AnimeRecommender
+from utils.deadline import Deadline, DeadlineExceeded
+
+HEDGE_RESPONSE = "Hedge Title\n|||**[Hedge Title]**\nFrom the fallback model."
+
+DOCS = [
+    Document(page_content=f"Title: Anime {i}.. Overview: Story number {i}. Genres: Action",
+             metadata={"mal_id": i, "doc_id": f"{i}-0"})
+    for i in range(1, 6)
+]
+
+
+def _recommender(llm=None, **kwargs):
+    recommender = AnimeRecommender(
+        chroma_retriever=None, sparse_retriever=None, api_key="", model_name="",
+        llm=llm or stub_llm(), **kwargs
+    )
+
+    async def aretrieve(query, options=None, deadline=None):
+        return DOCS
+
+    recommender.aretrieve = aretrieve
+    return recommender
+
+
+def test_context_packing_runs_off_the_event_loop():
+    threads = []
+
+    def embedding_lookup(ids):
+        # Stands in for the synchronous vector store read done while packing
+        threads.append(threading.current_thread())
+        return {doc_id: [1.0, float(n)] for n, doc_id in enumerate(ids)}
+
+    recommender = _recommender(context_packer=ContextPacker(token_budget=200, embedding_lookup=embedding_lookup))
+
+    async def main():
+        return threading.current_thread(), await recommender._agenerate("ninjas", recommender.default_options)
+
+    loop_thread, answer = asyncio.run(main())
+    assert answer == STUB_RESPONSE
+    assert threads and all(t is not loop_thread for t in threads)
+    assert all(t.name.startswith("retrieval") for t in threads)
+
+
+class TrackingChatModel(LatencyChatModel):
+    """LatencyChatModel that records streams started and streams closed before finishing."""
+
+    started: list = []
+    closed: list = []
+
+    async def _astream(self, *args, **kwargs):
+        self.started.append(self.responses[0])
+        finished = False
+        try:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+            finished = True
+        finally:
+            if not finished:
+                self.closed.append(self.responses[0])
+
+
+def _generate(recommender, deadline=None):
+    async def run():
+        start = time.monotonic()
+        answer = await recommender._agenerate("ninjas", recommender.default_options, deadline)
+        return answer, time.monotonic() - start
+
+    return asyncio.run(run())
+
+
+def test_hedge_fires_after_the_delay_and_the_slow_primary_is_closed():
+    primary = TrackingChatModel(responses=[STUB_RESPONSE], first_token_delay=1.0, started=[], closed=[])
+    recommender = _recommender(llm=primary, fallback_llm=stub_llm(HEDGE_RESPONSE), hedge_delay=0.05)
+
+    answer, elapsed = _generate(recommender)
+
+    assert answer == HEDGE_RESPONSE
+    assert elapsed < 0.5
+    assert primary.closed == [STUB_RESPONSE]
+
+
+def test_primary_wins_without_a_hedge():
+    fallback = TrackingChatModel(responses=[HEDGE_RESPONSE], started=[], closed=[])
+    recommender = _recommender(llm=stub_llm(), fallback_llm=fallback, hedge_delay=0.2)
+
+    answer, elapsed = _generate(recommender)
+
+    assert answer == STUB_RESPONSE
+    assert elapsed < 0.2
+    assert fallback.started == []
+
+
+def test_failed_first_chunk_falls_through_to_the_other_stream():
+    class FailingChatModel(LatencyChatModel):
+        async def _astream(self, *args, **kwargs):
+            await asyncio.sleep(self.first_token_delay)
+            raise RuntimeError("upstream 500")
+            yield  # pragma: no cover
+
+    primary = FailingChatModel(responses=[""], first_token_delay=0.1)
+    hedge = TrackingChatModel(responses=[HEDGE_RESPONSE], first_token_delay=0.15, started=[], closed=[])
+    recommender = _recommender(llm=primary, fallback_llm=hedge, hedge_delay=0.05)
+
+    answer, _ = _generate(recommender)
+
+    assert answer == HEDGE_RESPONSE
+    assert hedge.closed == []  # the winner is read to the end, not closed early
+
+
+def test_generation_deadline_raises_with_the_retrieved_documents():
+    recommender = _recommender(llm=LatencyChatModel(responses=[STUB_RESPONSE], first_token_delay=1.0))
+    deadline = Deadline(0.2, {"retrieval": 0.5, "generation": 0.5})
+
+    with pytest.raises(DeadlineExceeded) as raised:
+        _generate(recommender, deadline)
+
+    assert raised.value.stage == "generation"
+    assert raised.value.documents == DOCS
+
+
+class RecommenderPipeline:
+    """Just enough of AnimeRecommendationPipeline for the API handlers."""
+
+    def __init__(self, recommender):
+        self.recommender = recommender
+
+    def retrieval_options(self, *args):
+        return None
+
+    def filter_matches(self, options):
+        return None
+
+    async def arecommend(self, query, options=None, deadline=None):
+        return await self.recommender.aget_recommendation(query, options, deadline)
+
+    @staticmethod
+    def parse(raw):
+        return parse_recommendation(raw)
+
+
+def test_api_answers_from_retrieval_when_generation_times_out(monkeypatch):
+    recommender = _recommender(llm=LatencyChatModel(responses=[STUB_RESPONSE], first_token_delay=1.0))
+    monkeypatch.setattr(main, "pipeline_instance", RecommenderPipeline(recommender))
+    monkeypatch.setattr(main, "REQUEST_DEADLINE_SECONDS", 0.2)
+
+    response = asyncio.run(main.get_recommendation(
+        query="ninjas", dense_weight=None, sparse_weight=None, top_k=None, filters=MetadataFilter()
+    ))
+
+    assert response["degraded"] is True
+    assert response["titles"] == [f"Anime {i}" for i in range(1, 6)]
+    assert response["explanations"][0] == "**[Anime 1]**\nStory number 1."
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import app.main as main
+from src.metadata_index import MetadataFilter
+
+
+class SlowPipeline:
+    """Streams one chunk per 50 ms; records whether generation ever started."""
+
+    def __init__(self):
+        self.started = False
+
+    def retrieval_options(self, *args):
+        return None
+
+    def filter_matches(self, options):
+        return None
+
+    async def astream_recommend(self, query, options, deadline):
+        self.started = True
+        for chunk in ["Naruto, Bleach\n", "|||Ninjas.", "|||Reapers."]:
+            await asyncio.sleep(0.05)
+            yield chunk
+
+
+def _scope(spec_version):
+    return {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/recommend/stream", "raw_path": b"/api/recommend/stream",
+        "query_string": b"query=ninjas", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    pipeline = SlowPipeline()
+    monkeypatch.setattr(main, "pipeline_instance", pipeline)
+    return pipeline
+
+
+def test_slot_is_released_after_a_full_stream(pipeline):
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(10)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(main.app(_scope("2.4"), receive, send))
+
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    assert b"event: done" in body
+    assert main.admission.active == 0
+
+
+@pytest.mark.parametrize("spec_version", ["2.0", "2.4"])
+def test_slot_is_released_when_client_leaves_before_the_body(pipeline, spec_version):
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        # The socket is already gone by the time the response starts
+        raise OSError("connection reset")
+
+    async def run():
+        response = await main.stream_recommendation(
+            query="ninjas", dense_weight=None, sparse_weight=None, top_k=None, filters=MetadataFilter()
+        )
+        assert main.admission.active == 1
+        with pytest.raises(Exception):
+            await response(_scope(spec_version), receive, send)
+        # Released by the response itself, not whenever the unstarted generator gets collected
+        assert main.admission.active == 0
+
+    asyncio.run(run())
+    assert not pipeline.started
@@ -0,0 +1,70 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.title_resolver import TitleIndexWriter, TitleResolver, load_title_resolver, normalize_name
+
+ENTRIES = [
+    [5114, "Fullmetal Alchemist: Brotherhood", 9.19],
+    [1535, "Death Note", 8.63],
+    [20, "Naruto", 7.91],
+    [1735, "Naruto: Shippuuden", 8.16],
+    [4181, "Clannad: After Story", 8.96],
+    [32281, "Kimi no Na wa.", 8.96],
+]
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return TitleResolver(ENTRIES)
+
+
+def test_normalize_name_ignores_case_accents_and_punctuation():
+    assert normalize_name("  Pokémon: The FIRST Movie!! ") == "pokemon the first movie"
+
+
+@pytest.mark.parametrize("title, mal_id, match", [
+    ("Death Note", 1535, "exact"),
+    (" Naruto ", 20, "exact"),
+    ("death note", 1535, "normalized"),
+    ("Kimi no Na wa", 32281, "normalized"),
+    ("Fullmetal Alchemist Brotherhod", 5114, "fuzzy"),
+    ("Naruto Shippuden", 1735, "fuzzy"),
+])
+def test_resolve_matches(resolver, title, mal_id, match):
+    entry = resolver.resolve(title)
+
+    assert (entry["mal_id"], entry["match"]) == (mal_id, match)
+    if match == "fuzzy":
+        assert resolver.min_similarity <= entry["similarity"] < 1.0
+    else:
+        assert entry["similarity"] == 1.0
+
+
+@pytest.mark.parametrize("title", ["Space Cowboy Odyssey 3000", "", "!!!", "Zz"])
+def test_unknown_titles_are_unresolved(resolver, title):
+    assert resolver.resolve(title) is None
+
+
+def test_resolve_many_splits_resolved_and_unresolved(resolver):
+    resolved, unresolved = resolver.resolve_many(["Naruto", "Made Up Show", "death note"])
+
+    assert {title: entry["mal_id"] for title, entry in resolved.items()} == {"Naruto": 20, "death note": 1535}
+    assert unresolved == ["Made Up Show"]
+
+
+def test_writer_round_trips_through_load(tmp_path):
+    batches = [[Document(page_content="", metadata={"MAL_ID": str(m), "Name": n, "Score": s})
+                for m, n, s in ENTRIES[:3]], []]
+    writer = TitleIndexWriter()
+    assert list(writer.tap(iter(batches))) == batches
+
+    path = str(tmp_path / "nested" / "title_index.json")
+    writer.save(path)
+    loaded = load_title_resolver(path)
+
+    assert loaded.resolve("Death Note")["mal_id"] == 1535
+    assert loaded.names == [n for _, n, _ in ENTRIES[:3]]
+
+
+def test_missing_index_means_no_resolver(tmp_path):
+    assert load_title_resolver(str(tmp_path / "missing.json")) is None
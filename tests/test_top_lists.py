@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from tests.jikan_stub import HITS, TOP_ANIME
+from utils.jikan_client import JikanClient
+from utils.rate_limiter import TokenBucket
+from utils.top_lists import TopListSnapshot, fetch_top_anime
+
+OLD = [{"rank": 1, "title": "From disk", "score": 9.0}]
+
+
+@pytest.fixture(autouse=True)
+def top_anime_upstream():
+    TOP_ANIME.update(version=1, delay=0.0, fail=False)
+    HITS["/top/anime"] = 0
+    yield TOP_ANIME
+
+
+def _write_snapshot(path, data, age_seconds):
+    path.write_text(json.dumps({"data": data, "updated_at": time.time() - age_seconds}), encoding="utf-8")
+
+
+def _run(jikan_url, snapshot_path, scenario, refresh_interval=60):
+    """Runs `scenario(snapshot)` against the stub with a real JikanClient."""
+    async def main():
+        client = JikanClient(base_url=jikan_url, limiter=TokenBucket(1000, 100))
+        snapshot = TopListSnapshot("top-anime", lambda: fetch_top_anime(client), str(snapshot_path),
+                                   refresh_interval)
+        try:
+            return await scenario(snapshot)
+        finally:
+            await snapshot.stop()
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+def _titles(data):
+    return [item["title"] for item in data]
+
+
+def test_cold_start_serves_the_disk_snapshot_without_calling_jikan(jikan_url, tmp_path):
+    path = tmp_path / "top_anime.json"
+    _write_snapshot(path, OLD, age_seconds=5)
+
+    async def scenario(snapshot):
+        snapshot.start()
+        data = await snapshot.get()
+        await asyncio.sleep(0.05)  # give the background loop its chance to (not) refresh
+        return data
+
+    assert _run(jikan_url, path, scenario) == OLD
+    assert HITS["/top/anime"] == 0
+
+
+def test_first_start_without_a_snapshot_fetches_once_and_persists(jikan_url, tmp_path):
+    path = tmp_path / "top_anime.json"
+
+    async def scenario(snapshot):
+        return await asyncio.gather(snapshot.get(), snapshot.get(), snapshot.get())
+
+    results = _run(jikan_url, path, scenario)
+
+    assert [_titles(r) for r in results] == [["Top 1 v1", "Top 2 v1", "Top 3 v1", "Top 4 v1"]] * 3
+    assert HITS["/top/anime"] == 2  # one refresh, two pages, shared by all three readers
+    assert _titles(json.loads(path.read_text(encoding="utf-8"))["data"])[0] == "Top 1 v1"
+
+
+def test_stale_snapshot_is_served_while_it_revalidates(jikan_url, tmp_path, top_anime_upstream):
+    path = tmp_path / "top_anime.json"
+    _write_snapshot(path, OLD, age_seconds=120)
+    top_anime_upstream.update(version=2, delay=0.2)
+
+    async def scenario(snapshot):
+        snapshot.load_from_disk()
+        start = time.monotonic()
+        stale = await snapshot.get()
+        waited = time.monotonic() - start
+        await asyncio.sleep(0.5)
+        return stale, waited, await snapshot.get()
+
+    stale, waited, fresh = _run(jikan_url, path, scenario)
+
+    assert stale == OLD and waited < 0.1
+    assert _titles(fresh)[0] == "Top 1 v2"
+    assert _titles(json.loads(path.read_text(encoding="utf-8"))["data"])[0] == "Top 1 v2"
+
+
+def test_failed_refresh_keeps_serving_the_last_snapshot(jikan_url, tmp_path, top_anime_upstream):
+    path = tmp_path / "top_anime.json"
+    _write_snapshot(path, OLD, age_seconds=120)
+    on_disk = path.read_text(encoding="utf-8")
+    top_anime_upstream.update(fail=True)
+
+    async def scenario(snapshot):
+        snapshot.load_from_disk()
+        updated_at = snapshot.updated_at
+        first = await snapshot.get()
+        await asyncio.sleep(0.2)
+        return first, await snapshot.get(), snapshot.updated_at == updated_at
+
+    first, second, unchanged = _run(jikan_url, path, scenario)
+
+    assert first == second == OLD and unchanged
+    assert HITS["/top/anime"] >= 1
+    assert path.read_text(encoding="utf-8") == on_disk
+
+
+def test_failure_with_nothing_to_serve_is_raised(jikan_url, tmp_path, top_anime_upstream):
+    top_anime_upstream.update(fail=True)
+
+    async def scenario(snapshot):
+        with pytest.raises(Exception):
+            await snapshot.get()
+        return snapshot.data
+
+    assert _run(jikan_url, tmp_path / "top_anime.json", scenario) is None
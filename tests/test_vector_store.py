@@ -0,0 +1,111 @@
+import pytest
+from langchain_core.documents import Document
+
+from benchmarks.stubs import StubEmbeddingPool
+from src.vector_store import VectorStoreBuilder
+
+
+class FakeCollection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.upserted = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserted.extend(ids)
+        for doc_id, vector, text, meta in zip(ids, embeddings, documents, metadatas):
+            self.rows[doc_id] = (list(vector), text, dict(meta))
+
+
+class FakeStore:
+    """In-memory stand-in for the Chroma calls build_incremental makes."""
+
+    def __init__(self):
+        self.rows = {}
+        self._collection = FakeCollection(self.rows)
+        self.deleted = []
+
+    def get(self, include=()):
+        return {"ids": list(self.rows), "metadatas": [meta for _, _, meta in self.rows.values()]}
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        for doc_id in ids:
+            self.rows.pop(doc_id, None)
+
+
+def _row(mal_id, text, score=8.0, genres="Action"):
+    return Document(page_content=text, metadata={"MAL_ID": mal_id, "Name": f"Anime {mal_id}",
+                                                 "Score": score, "Genres": genres})
+
+
+LONG_SYNOPSIS = "A" * 900 + "\n\n" + "B" * 900  # two chunks at chunk_size=1000
+
+
+@pytest.fixture
+def builder(monkeypatch):
+    builder = VectorStoreBuilder(csv_path="unused.csv", embedding=object())
+    builder.store = FakeStore()
+    monkeypatch.setattr(builder, "load_vector_store", lambda embedding=None: builder.store)
+    return builder
+
+
+def _build(builder, rows):
+    pool = StubEmbeddingPool()
+    counts = builder.build_incremental(builder.split_batches([rows[:2], rows[2:]]), pool=pool, write_batch=2)
+    return counts, pool
+
+
+def test_first_build_embeds_every_chunk(builder):
+    counts, pool = _build(builder, [_row(1, "Bounty hunters."), _row(2, LONG_SYNOPSIS), _row(3, "Ninjas.")])
+
+    assert counts == {"chunks": 4, "embedded": 4, "changed_rows": 3, "removed_rows": 0}
+    assert pool.documents_embedded == 4
+    assert sorted(builder.store.rows) == ["1-0", "2-0", "2-1", "3-0"]
+    assert builder.store.rows["1-0"][2]["name"] == "Anime 1"
+
+
+def test_rebuild_upserts_changed_rows_and_deletes_removed_ones(builder):
+    _build(builder, [_row(1, "Bounty hunters."), _row(2, LONG_SYNOPSIS), _row(3, "Ninjas.")])
+    unchanged = builder.store.rows["1-0"]
+    builder.store._collection.upserted.clear()
+    builder.store.deleted.clear()
+
+    # Row 2 shrinks to one chunk, row 3 disappears, rows 4 and 5 are new
+    counts, pool = _build(builder, [_row(1, "Bounty hunters."), _row(2, "Rewritten."), _row(4, "Mecha."),
+                                    _row(5, "Cooking.")])
+    assert counts["removed_rows"] == 1 and counts["chunks"] == 4
+    assert sorted(builder.store._collection.upserted) == ["2-0", "4-0", "5-0"]
+    assert sorted(builder.store.deleted) == ["2-0", "2-1", "3-0"]
+    assert sorted(builder.store.rows) == ["1-0", "2-0", "4-0", "5-0"]
+    assert builder.store.rows["1-0"] is unchanged
+    assert builder.store.rows["2-0"][1] == "Rewritten."
+
+    # A structured field counts as a change too
+    builder.store._collection.upserted.clear()
+    _build(builder, [_row(1, "Bounty hunters."), _row(2, "Rewritten."), _row(4, "Mecha."),
+                     _row(5, "Cooking.", score=9.1)])
+    assert builder.store._collection.upserted == ["5-0"]
+    assert builder.store.rows["5-0"][2]["score"] == 9.1
+
+
+def test_rebuild_without_changes_embeds_nothing(builder):
+    rows = [_row(1, "Bounty hunters."), _row(2, LONG_SYNOPSIS), _row(3, "Ninjas.")]
+    _build(builder, rows)
+    before = dict(builder.store.rows)
+    builder.store.deleted.clear()
+
+    counts, pool = _build(builder, rows)
+
+    assert counts == {"chunks": 4, "embedded": 0, "changed_rows": 0, "removed_rows": 0}
+    assert pool.documents_embedded == 0
+    assert builder.store.deleted == []
+    assert builder.store.rows == before
+
+
+def test_legacy_chunks_without_a_row_hash_are_dropped(builder):
+    builder.store.rows["legacy-uuid"] = ([0.0], "Title: Old build", {"Name": "Old"})
+
+    counts, _ = _build(builder, [_row(1, "Bounty hunters.")])
+
+    assert "legacy-uuid" in builder.store.deleted
+    assert sorted(builder.store.rows) == ["1-0"] and counts["embedded"] == 1
@@ -0,0 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class QueueFullError(Exception):
+    """Raised when the wait queue is already full (maps to HTTP 429)."""
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a request waited too long for a free slot (maps to HTTP 503)."""
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue.
+
+    At most `max_concurrent` requests run at once. Up to `max_queue` more may wait
+    for `queue_timeout` seconds; anything beyond that is rejected immediately so
+    latency under load degrades predictably instead of piling up.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._active = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @asynccontextmanager
+    async def slot(self):
+        # Fast path: reject right away when the queue is saturated
+        if self._active + self._waiting >= self.max_concurrent + self.max_queue:
+            raise QueueFullError("Too many requests waiting for the AI Engine.")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise QueueTimeoutError("Timed out waiting for a free AI Engine slot.")
+        finally:
+            self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
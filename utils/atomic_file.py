@@ -0,0 +1,21 @@
+import os
+import tempfile
+
+
+def write_atomic(path: str, data: str):
+    """
+    Temp file in the same directory + os.replace: readers see the old or the new
+    file, never half. The unique temp name keeps concurrent writers (several
+    workers refreshing the same file) from clobbering each other's temp file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
@@ -0,0 +1,62 @@
+import time
+
+# Stages of one recommendation request, in order (posters are fetched by a separate
+# /api/metadata/batch request with its own deadline)
+DEADLINE_STAGES = ("retrieval", "generation")
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a stage runs out of its share of the request deadline.
+    `documents` carries the fused retrieval results when they were ready, so
+    the caller can still answer with retrieval-only recommendations.
+    """
+
+    def __init__(self, stage: str, documents=None):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+        self.documents = documents or []
+
+
+def parse_split(spec: str) -> dict:
+    """'retrieval:0.15,generation:0.85' -> {stage: share}, normalized to 1."""
+    shares = {}
+    for part in spec.split(","):
+        stage, _, share = part.partition(":")
+        if stage.strip() not in DEADLINE_STAGES:
+            raise ValueError(f"Unknown deadline stage: {stage.strip()!r}")
+        shares[stage.strip()] = float(share)
+    total = sum(shares.values())
+    if total <= 0:
+        raise ValueError("Deadline split must have a positive share.")
+    return {stage: shares.get(stage, 0.0) / total for stage in DEADLINE_STAGES}
+
+
+class Deadline:
+    """
+    End-to-end time budget for one request, split across stages.
+
+    Each stage must finish by its cumulative share of the budget: with a 10s
+    deadline split 0.15 / 0.85, retrieval ends by 1.5s and generation by 10s.
+    Time a stage does not use rolls over to the next one.
+    """
+
+    def __init__(self, seconds: float, split: dict):
+        self.seconds = seconds
+        self.start = time.monotonic()
+        self._ends = {}
+        elapsed_share = 0.0
+        for stage in DEADLINE_STAGES:
+            elapsed_share += split.get(stage, 0.0)
+            self._ends[stage] = self.start + seconds * elapsed_share
+
+    def remaining(self) -> float:
+        return max(0.0, self.start + self.seconds - time.monotonic())
+
+    def time_left(self, stage: str) -> float:
+        """Seconds until `stage` must be done (0 once its slice is spent)."""
+        return max(0.0, self._ends[stage] - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
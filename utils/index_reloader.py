@@ -0,0 +1,104 @@
+import threading
+import time
+
+from utils.logger import get_logger
+from utils.metrics import INDEX_RELOADS
+
+logger = get_logger(__name__)
+
+
+class IndexReloader:
+    """
+    Follows the CURRENT pointer of an IndexVersions root in a running server.
+
+    When the pointer names a version other than the one being served, `load(paths)`
+    builds and warms the replacement in a background thread while requests keep
+    running on the old one; `swap(loaded)` then publishes it and returns the
+    previous instance. That instance is handed to `retire` only after
+    `grace_seconds`, so requests that started on it (each bounded by its
+    deadline) finish first. A version that failed to load is not retried by the
+    watcher until the pointer moves or a reload is requested explicitly.
+    """
+
+    def __init__(self, versions, load, swap, retire=None, poll_seconds: float = 30.0,
+                 grace_seconds: float = 30.0):
+        self.versions = versions
+        self.load = load
+        self.swap = swap
+        self.retire = retire
+        self.poll_seconds = poll_seconds
+        self.grace_seconds = grace_seconds
+
+        self.serving = None
+        self._lock = threading.Lock()
+        self._loading = None
+        self._failed = None
+        self._error = None
+        self._swapped_at = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, serving: str = None):
+        """Records the version already being served and starts the watcher (poll_seconds > 0)."""
+        self.serving = serving
+        if self.poll_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="index-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Index version check failed: {e}")
+
+    def check(self, force: bool = False) -> bool:
+        """Starts a background reload if CURRENT moved; True when one is running."""
+        target = self.versions.current()
+        with self._lock:
+            if self._loading is not None:
+                return True
+            if target is None or target == self.serving or (target == self._failed and not force):
+                return False
+            self._loading = target
+        threading.Thread(target=self._reload, args=(target,), name="index-reload", daemon=True).start()
+        return True
+
+    def _reload(self, version: str):
+        start = time.monotonic()
+        logger.info(f"Loading index version {version} (serving {self.serving or 'legacy'})...")
+        try:
+            loaded = self.load(self.versions.paths(version))
+        except Exception as e:
+            with self._lock:
+                self._loading, self._failed, self._error = None, version, f"{version}: {e}"
+            INDEX_RELOADS.labels(outcome="failed").inc()
+            logger.error(f"Index version {version} failed to load; still serving {self.serving or 'legacy'}: {e}")
+            return
+
+        previous = self.swap(loaded)
+        with self._lock:
+            self.serving, self._loading, self._failed, self._error = version, None, None, None
+            self._swapped_at = time.time()
+        INDEX_RELOADS.labels(outcome="swapped").inc()
+        logger.info(f"Now serving index version {version} (loaded in {time.monotonic() - start:.1f}s).")
+
+        if previous is not None and self.retire is not None:
+            timer = threading.Timer(self.grace_seconds, self.retire, args=(previous,))
+            timer.daemon = True
+            timer.start()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "serving": self.serving,
+                "current": self.versions.current(),
+                "loading": self._loading,
+                "last_error": self._error,
+                "swapped_at": self._swapped_at,
+                "versions": self.versions.versions(),
+            }
@@ -0,0 +1,197 @@
+"""
+Versioned index directories with an atomically flipped pointer.
+
+    indexes/
+      CURRENT                     <- name of the live version (replaced atomically)
+      v20261017-093000/
+        manifest.json             <- written last: a version without it is incomplete
+        chroma_db/ docstore/ bm25_index/ dense_index/ metadata_index/ knn_graph/
+        title_index.json
+
+Every build writes a fresh version next to the live one and only then flips
+CURRENT, so a running server never reads a half-built index. Servers follow the
+pointer (see app/main.py); rollback is a pointer flip too:
+
+    python -m utils.index_versions list
+    python -m utils.index_versions rollback
+    python -m utils.index_versions activate v20261017-093000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.atomic_file import write_atomic
+from config.config import (
+    INDEX_ROOT, INDEX_KEEP_VERSIONS, CHROMA_DIR, DOCSTORE_DIR, BM25_INDEX_DIR, DENSE_INDEX_DIR,
+    METADATA_INDEX_DIR, KNN_GRAPH_DIR, TITLE_INDEX_PATH
+)
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+@dataclass(frozen=True)
+class IndexPaths:
+    """Where each on-disk index of one version lives (version None = legacy flat layout)."""
+    version: Optional[str]
+    chroma_dir: str
+    docstore_dir: str
+    bm25_dir: str
+    dense_dir: str
+    metadata_dir: str
+    knn_graph_dir: str
+    title_index_path: str
+
+    @classmethod
+    def under(cls, version: Optional[str], root: str) -> "IndexPaths":
+        return cls(
+            version=version,
+            chroma_dir=os.path.join(root, "chroma_db"),
+            docstore_dir=os.path.join(root, "docstore"),
+            bm25_dir=os.path.join(root, "bm25_index"),
+            dense_dir=os.path.join(root, "dense_index"),
+            metadata_dir=os.path.join(root, "metadata_index"),
+            knn_graph_dir=os.path.join(root, "knn_graph"),
+            title_index_path=os.path.join(root, "title_index.json"),
+        )
+
+    @classmethod
+    def legacy(cls) -> "IndexPaths":
+        """The pre-versioning directories from config (used until a first versioned build)."""
+        return cls(None, CHROMA_DIR, DOCSTORE_DIR, BM25_INDEX_DIR, DENSE_INDEX_DIR,
+                   METADATA_INDEX_DIR, KNN_GRAPH_DIR, TITLE_INDEX_PATH)
+
+
+class IndexVersions:
+    """Creates, lists, activates and prunes the versions under one root directory."""
+
+    def __init__(self, root: str = INDEX_ROOT):
+        self.root = root
+
+    def paths(self, version: str) -> IndexPaths:
+        return IndexPaths.under(version, os.path.join(self.root, version))
+
+    def new_version(self) -> IndexPaths:
+        """Reserves a fresh, timestamp-named version directory for a build."""
+        os.makedirs(self.root, exist_ok=True)
+        base = time.strftime("v%Y%m%d-%H%M%S")
+        version, n = base, 1
+        while True:
+            try:
+                os.mkdir(os.path.join(self.root, version))
+                return self.paths(version)
+            except FileExistsError:
+                n += 1
+                version = f"{base}-{n}"
+
+    def seed_vector_store(self, paths: IndexPaths) -> Optional[str]:
+        """
+        Copies the live version's Chroma store into `paths` so the build only embeds
+        new or changed rows. Returns the version copied from, or None (no CURRENT:
+        full build). A real copy, not hard links: Chroma rewrites its SQLite and
+        HNSW files in place, which would corrupt the version being served.
+        """
+        current = self.current()
+        if current is None or current == paths.version:
+            return None
+        source = self.paths(current).chroma_dir
+        if not os.path.isdir(source):
+            return None
+        shutil.copytree(source, paths.chroma_dir)
+        return current
+
+    def write_manifest(self, version: str, info: dict):
+        """Marks a finished build; only versions with a manifest can be activated."""
+        manifest = {"version": version, "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), **info}
+        write_atomic(os.path.join(self.root, version, MANIFEST_FILE), json.dumps(manifest, indent=2))
+
+    def manifest(self, version: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.root, version, MANIFEST_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def versions(self) -> list:
+        """Complete versions, oldest first (names sort by build time)."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, MANIFEST_FILE))
+        )
+
+    def current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version: str):
+        if self.manifest(version) is None:
+            raise ValueError(f"Index version {version!r} does not exist or is incomplete.")
+        write_atomic(os.path.join(self.root, CURRENT_FILE), version + "\n")
+
+    def rollback(self) -> str:
+        """Activates the newest complete version older than the live one."""
+        current = self.current()
+        older = [v for v in self.versions() if current is None or v < current]
+        if not older:
+            raise ValueError(f"No version older than {current!r} to roll back to.")
+        self.activate(older[-1])
+        return older[-1]
+
+    def prune(self, keep: int = INDEX_KEEP_VERSIONS) -> list:
+        """Deletes the oldest complete versions beyond `keep`; the live one always stays."""
+        current = self.current()
+        removable = [v for v in self.versions() if v != current]
+        doomed = removable[:max(0, len(removable) - max(keep - 1, 0))]
+        for version in doomed:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+        return doomed
+
+    def resolve(self) -> IndexPaths:
+        """Paths of the live version, or the legacy flat layout before the first versioned build."""
+        current = self.current()
+        return self.paths(current) if current else IndexPaths.legacy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned index directories")
+    parser.add_argument("--root", default=INDEX_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Complete versions; * marks the live one")
+    sub.add_parser("rollback", help="Point CURRENT at the previous version")
+    activate = sub.add_parser("activate", help="Point CURRENT at a given version")
+    activate.add_argument("version")
+    prune = sub.add_parser("prune", help="Delete old versions")
+    prune.add_argument("--keep", type=int, default=INDEX_KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    versions = IndexVersions(args.root)
+    try:
+        if args.command == "list":
+            current = versions.current()
+            for version in versions.versions():
+                manifest = versions.manifest(version)
+                print(f"{'*' if version == current else ' '} {version}  {manifest.get('created_at', '')}  "
+                      f"{manifest.get('documents', '?')} docs")
+        elif args.command == "rollback":
+            print(f"CURRENT -> {versions.rollback()}")
+        elif args.command == "activate":
+            versions.activate(args.version)
+            print(f"CURRENT -> {args.version}")
+        elif args.command == "prune":
+            print("Removed: " + (", ".join(versions.prune(args.keep)) or "nothing"))
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import asyncio
+import re
+import threading
+from concurrent.futures import Future
+
+import httpx
+
+from config.config import (
+    JIKAN_BASE_URL, JIKAN_TIMEOUT_SECONDS, JIKAN_MAX_CONNECTIONS,
+    METADATA_CACHE_PATH, METADATA_CACHE_TTL_SECONDS, METADATA_NEGATIVE_TTL_SECONDS, METADATA_OFFLINE,
+    JIKAN_RATE_PER_SECOND, JIKAN_BURST, JIKAN_MAX_RETRIES, JIKAN_BACKOFF_SECONDS
+)
+from utils.index_versions import IndexVersions
+from utils.logger import get_logger
+from utils.metadata_cache import MetadataCache
+from utils.metrics import JIKAN_RESPONSES, stage_timer
+from utils.rate_limiter import TokenBucket
+
+logger = get_logger(__name__)
+
+
+def normalize_title(title: str) -> str:
+    return re.sub(r"\s+", " ", title.strip().lower())
+
+
+def retry_delay(response: httpx.Response, attempt: int, backoff: float) -> float:
+    """Honors Retry-After when Jikan sends it, otherwise exponential backoff."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff * (2 ** attempt)
+
+
+def parse_anime(anime: dict) -> dict:
+    """Maps a Jikan anime object onto the card fields the front ends render."""
+    return {
+        "image": anime['images']['jpg']['large_image_url'],
+        "score": anime.get('score', 'N/A'),
+        "url": anime['url'],
+        "title": anime['title_english'] or anime['title'],
+        "mal_id": anime.get('mal_id')
+    }
+
+
+def offline_metadata(entry: dict) -> dict:
+    """Card fields built from the local title index alone (no poster available)."""
+    return {
+        "image": None,
+        "score": entry["score"] if entry["score"] is not None else "N/A",
+        "url": f"https://myanimelist.net/anime/{entry['mal_id']}",
+        "title": entry["name"],
+        "mal_id": entry["mal_id"],
+    }
+
+
+class _TitleResolution:
+    """
+    Shared title -> MAL_ID step. With a TitleResolver attached, known titles are
+    fetched (and cached) by id instead of through Jikan's fuzzy `?q=` search,
+    or served entirely from the local index in offline mode.
+    """
+
+    resolver = None
+    offline = METADATA_OFFLINE
+
+    def resolve(self, title: str):
+        return self.resolver.resolve(title) if self.resolver is not None else None
+
+
+class JikanClient(_TitleResolution):
+    """
+    Shared async Jikan client.
+
+    One pooled httpx.AsyncClient for the whole process (opened/closed by the
+    FastAPI lifespan), a persistent SQLite cache in front of title lookups (read
+    and written from worker threads), and
+    request coalescing so concurrent lookups of the same title hit Jikan once.
+    Every upstream request goes through a token bucket that respects Jikan's
+    rate limit, and 429 answers are retried with backoff.
+    """
+
+    def __init__(self, base_url: str = JIKAN_BASE_URL, cache: MetadataCache = None,
+                 timeout: float = JIKAN_TIMEOUT_SECONDS, max_connections: int = JIKAN_MAX_CONNECTIONS,
+                 limiter: TokenBucket = None, max_retries: int = JIKAN_MAX_RETRIES,
+                 backoff: float = JIKAN_BACKOFF_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.limiter = limiter or TokenBucket(JIKAN_RATE_PER_SECOND, JIKAN_BURST)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._inflight = {}
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_json(self, path: str, params: dict = None) -> dict:
+        await self.start()
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.aacquire()
+            try:
+                res = await self._client.get(path, params=params)
+            except httpx.TransportError:
+                JIKAN_RESPONSES.labels(status="transport_error").inc()
+                raise
+            JIKAN_RESPONSES.labels(status=str(res.status_code)).inc()
+            if res.status_code == 429 and attempt < self.max_retries:
+                delay = retry_delay(res, attempt, self.backoff)
+                logger.warning(f"Jikan 429 on {path}; retrying in {delay:.1f}s")
+                self.limiter.penalize(delay)
+                continue
+            res.raise_for_status()
+            return res.json()
+
+    async def _fetch_anime(self, title: str):
+        data = await self.get_json("/anime", {"q": title, "limit": 1})
+        if data.get('data'):
+            return parse_anime(data['data'][0])
+        return None
+
+    async def _fetch_anime_by_id(self, mal_id: int):
+        try:
+            data = await self.get_json(f"/anime/{mal_id}")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        return parse_anime(data['data']) if data.get('data') else None
+
+    async def _lookup(self, cache_key: str, fetch):
+        result = await fetch()
+        if self.cache is not None:
+            ttl = None if result is not None else METADATA_NEGATIVE_TTL_SECONDS
+            # SQLite reads and commits block (fsync, lock waits): keep them off the event loop
+            await asyncio.to_thread(self.cache.set, cache_key, result, ttl)
+        return result
+
+    async def _cached(self, cache_key: str, fetch):
+        if self.cache is not None:
+            found, value = await asyncio.to_thread(self.cache.get, cache_key)
+            if found:
+                return value
+
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._lookup(cache_key, fetch))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+
+        # shield: one caller cancelling must not cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def get_anime(self, mal_id: int):
+        """Card metadata for a known MAL_ID (cached by id)."""
+        return await self._cached(f"anime-id:{mal_id}", lambda: self._fetch_anime_by_id(mal_id))
+
+    async def search_anime(self, title: str):
+        """Card metadata for the best match of `title`, or None when nothing matches."""
+        with stage_timer("metadata_fetch"):
+            return await self._search_anime(title)
+
+    async def _search_anime(self, title: str):
+        entry = self.resolve(title)
+        if entry is not None:
+            if self.offline:
+                return offline_metadata(entry)
+            meta = await self.get_anime(entry["mal_id"])
+            if meta is not None:
+                return meta
+        elif self.offline:
+            return None
+
+        key = normalize_title(title)
+        return await self._cached(f"anime:{key}", lambda: self._fetch_anime(title))
+
+    async def search_many(self, titles, deadline: float):
+        """
+        Looks up many titles concurrently (the token bucket paces the upstream calls).
+        Returns (results, pending): results maps each title resolved within
+        `deadline` seconds to its metadata (or None), pending lists the rest.
+        Pending lookups keep running in the background and land in the cache.
+        """
+        unique = list(dict.fromkeys(titles))
+        tasks = {asyncio.ensure_future(self.search_anime(t)): t for t in unique}
+        if not tasks:
+            return {}, []
+
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+        results = {}
+        for task in done:
+            try:
+                results[tasks[task]] = task.result()
+            except Exception as e:
+                logger.warning(f"Metadata lookup failed for {tasks[task]!r}: {e}")
+                results[tasks[task]] = None
+        for task in pending:
+            # Retrieve the eventual exception so it is never reported as unhandled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return results, [tasks[t] for t in pending]
+
+
+class SyncJikanClient(_TitleResolution):
+    """Blocking counterpart for Streamlit and scripts: pooled httpx.Client + same cache."""
+
+    def __init__(self, base_url: str = JIKAN_BASE_URL, cache: MetadataCache = None,
+                 timeout: float = JIKAN_TIMEOUT_SECONDS, max_connections: int = JIKAN_MAX_CONNECTIONS,
+                 limiter: TokenBucket = None, max_retries: int = JIKAN_MAX_RETRIES,
+                 backoff: float = JIKAN_BACKOFF_SECONDS):
+        self.cache = cache
+        self.limiter = limiter or TokenBucket(JIKAN_RATE_PER_SECOND, JIKAN_BURST)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def get_json(self, path: str, params: dict = None) -> dict:
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                res = self._client.get(path, params=params)
+            except httpx.TransportError:
+                JIKAN_RESPONSES.labels(status="transport_error").inc()
+                raise
+            JIKAN_RESPONSES.labels(status=str(res.status_code)).inc()
+            if res.status_code == 429 and attempt < self.max_retries:
+                delay = retry_delay(res, attempt, self.backoff)
+                logger.warning(f"Jikan 429 on {path}; retrying in {delay:.1f}s")
+                self.limiter.penalize(delay)
+                continue
+            res.raise_for_status()
+            return res.json()
+
+    def _fetch_anime(self, title: str):
+        data = self.get_json("/anime", {"q": title, "limit": 1})
+        if data.get('data'):
+            return parse_anime(data['data'][0])
+        return None
+
+    def _fetch_anime_by_id(self, mal_id: int):
+        try:
+            data = self.get_json(f"/anime/{mal_id}")
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return None
+            raise
+        return parse_anime(data['data']) if data.get('data') else None
+
+    def _cached(self, cache_key: str, fetch):
+        if self.cache is not None:
+            found, value = self.cache.get(cache_key)
+            if found:
+                return value
+
+        with self._lock:
+            future = self._inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[cache_key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fetch()
+            if self.cache is not None:
+                ttl = None if result is not None else METADATA_NEGATIVE_TTL_SECONDS
+                self.cache.set(cache_key, result, ttl)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+
+    def get_anime(self, mal_id: int):
+        return self._cached(f"anime-id:{mal_id}", lambda: self._fetch_anime_by_id(mal_id))
+
+    def search_anime(self, title: str):
+        with stage_timer("metadata_fetch"):
+            return self._search_anime(title)
+
+    def _search_anime(self, title: str):
+        entry = self.resolve(title)
+        if entry is not None:
+            if self.offline:
+                return offline_metadata(entry)
+            meta = self.get_anime(entry["mal_id"])
+            if meta is not None:
+                return meta
+        elif self.offline:
+            return None
+
+        key = normalize_title(title)
+        return self._cached(f"anime:{key}", lambda: self._fetch_anime(title))
+
+    def close(self):
+        self._client.close()
+
+
+_shared_cache = None
+_sync_client = None
+_resolver_version = object()  # index version the sync resolver was loaded from; never equals a real one
+_singleton_lock = threading.Lock()
+
+
+def get_metadata_cache() -> MetadataCache:
+    global _shared_cache
+    with _singleton_lock:
+        if _shared_cache is None:
+            _shared_cache = MetadataCache(METADATA_CACHE_PATH, METADATA_CACHE_TTL_SECONDS)
+        return _shared_cache
+
+
+def get_sync_client() -> SyncJikanClient:
+    """
+    Process-wide blocking client (Streamlit, utils.metadata_fetcher). Its title
+    resolver follows the live index version and is reloaded when CURRENT moves.
+    """
+    global _sync_client, _resolver_version
+    cache = get_metadata_cache()
+    versions = IndexVersions()
+    current = versions.current()
+    with _singleton_lock:
+        if _sync_client is None:
+            _sync_client = SyncJikanClient(cache=cache)
+        if current != _resolver_version:
+            from src.title_resolver import load_title_resolver
+            _sync_client.resolver = load_title_resolver(versions.resolve().title_index_path)
+            _resolver_version = current
+        return _sync_client
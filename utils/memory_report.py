@@ -0,0 +1,85 @@
+"""
+Per-process memory for a (gunicorn) server tree, from /proc/<pid>/smaps_rollup.
+
+    python -m utils.memory_report <master_pid>
+
+RSS counts every resident page, shared or not, so it overstates what each
+worker costs. USS (private pages only) is what a worker really adds: pages
+shared with the master copy-on-write (preloaded model weights) and file-backed
+pages in the page cache (memory-mapped indexes) are not counted. PSS splits
+shared pages evenly, so the PSS total is the tree's real footprint.
+"""
+import argparse
+import os
+import sys
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def process_memory(pid: int = None) -> dict:
+    """{"rss", "pss", "uss", "shared"} in MB for one process (Linux only)."""
+    pid = pid or os.getpid()
+    kb = dict.fromkeys(FIELDS, 0)
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in kb:
+                kb[name] = int(value.split()[0])
+    mb = lambda value: round(value / 1024, 1)
+    return {
+        "rss": mb(kb["Rss"]),
+        "pss": mb(kb["Pss"]),
+        "uss": mb(kb["Private_Clean"] + kb["Private_Dirty"]),
+        "shared": mb(kb["Shared_Clean"] + kb["Shared_Dirty"]),
+    }
+
+
+def child_pids(pid: int) -> list:
+    """Direct children of `pid` (the gunicorn workers)."""
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children", encoding="utf-8") as f:
+            children.extend(int(child) for child in f.read().split())
+    return sorted(children)
+
+
+def tree_report(master_pid: int) -> dict:
+    """Memory of the master and each worker, plus what one more worker costs."""
+    master = {"pid": master_pid, **process_memory(master_pid)}
+    workers = []
+    for pid in child_pids(master_pid):
+        try:
+            workers.append({"pid": pid, **process_memory(pid)})
+        except FileNotFoundError:
+            continue  # worker exited between listing and reading
+    return {
+        "master": master,
+        "workers": workers,
+        "total_pss": round(master["pss"] + sum(w["pss"] for w in workers), 1),
+        # A new worker starts as a fork of the master: its private pages are the marginal cost
+        "mean_worker_uss": round(sum(w["uss"] for w in workers) / len(workers), 1) if workers else 0.0,
+    }
+
+
+def format_report(report: dict) -> str:
+    rows = [("master", report["master"])] + [("worker", w) for w in report["workers"]]
+    lines = [f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}{'shared MB':>11}"]
+    for role, p in rows:
+        lines.append(f"{role:<8}{p['pid']:>8}{p['rss']:>10}{p['pss']:>10}{p['uss']:>10}{p['shared']:>11}")
+    lines.append(f"Total PSS: {report['total_pss']} MB | per added worker (mean USS): "
+                 f"{report['mean_worker_uss']} MB")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker memory of a pre-forked server")
+    parser.add_argument("pid", type=int, help="PID of the gunicorn master")
+    args = parser.parse_args()
+    try:
+        print(format_report(tree_report(args.pid)))
+    except FileNotFoundError:
+        sys.exit(f"No such process (or no /proc/<pid>/smaps_rollup): {args.pid}")
+
+
+if __name__ == "__main__":
+    main()
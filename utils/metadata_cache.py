@@ -0,0 +1,65 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class MetadataCache:
+    """
+    Persistent key/value cache for Jikan metadata, stored in a local SQLite file
+    so it survives restarts. Every entry carries its own expiry time.
+    """
+
+    def __init__(self, db_path: str = "cache/metadata.sqlite3", ttl_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pid = None
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+
+    def _connection(self):
+        # SQLite handles must not cross a fork (gunicorn preload): each process opens its own
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str):
+        """Returns (found, value). `value` may legitimately be None (a cached miss)."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key: str, value, ttl_seconds: float = None):
+        expires_at = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM metadata WHERE expires_at < ?", (time.time(),))
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
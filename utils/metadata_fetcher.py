@@ -1,18 +1,16 @@
-import requests
+from utils.jikan_client import get_sync_client
 
 def fetch_anime_details(title):
-    """Fetches poster, rating, and MAL link from Jikan API."""
+    """Fetches poster, rating, and MAL link from Jikan API (pooled + cached)."""
     try:
-        url = f"https://api.jikan.moe/v4/anime?q={title}&limit=1"
-        response = requests.get(url).json()
-        if response['data']:
-            anime = response['data'][0]
+        meta = get_sync_client().search_anime(title)
+        if meta:
             return {
-                "image": anime['images']['jpg']['large_image_url'],
-                "rating": anime['score'],
-                "url": anime['url'], # MyAnimeList link
-                "title": anime['title_english'] or anime['title']
+                "image": meta['image'],
+                "rating": meta['score'],
+                "url": meta['url'], # MyAnimeList link
+                "title": meta['title']
             }
     except Exception as e:
         print(f"Error fetching {title}: {e}")
-    return None
\ No newline at end of file
+    return None
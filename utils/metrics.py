@@ -0,0 +1,205 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    start_http_server
+)
+
+from utils.deadline import DeadlineExceeded
+
+# Set by gunicorn.conf.py: every worker writes its samples to files here and
+# /metrics aggregates them, whichever worker serves the scrape
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Function-backed gauges are re-sampled into the shared files this often
+GAUGE_REFRESH_SECONDS = 1.0
+
+# Recommendation stages, in request order
+STAGES = (
+    "filter", "dense_retrieval", "sparse_retrieval", "merge", "prompt_render",
+    "llm_first_token", "llm_total", "parse", "metadata_fetch"
+)
+
+# Sub-millisecond retrieval up to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_LATENCY = Histogram(
+    "anime_stage_duration_seconds", "Latency of each recommendation stage", ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("anime_stage_errors_total", "Recommendation stages that raised", ["stage"])
+
+RECOMMENDATIONS = Counter(
+    "anime_recommendations_total", "Recommendation requests by mode and outcome", ["mode", "outcome"]
+)
+RECOMMENDATION_LATENCY = Histogram(
+    "anime_recommendation_duration_seconds", "End-to-end recommendation latency", ["mode"],
+    buckets=LATENCY_BUCKETS
+)
+
+CACHE_LOOKUPS = Counter(
+    "anime_cache_lookups_total", "Recommendation cache lookups (exact_hit, semantic_hit, miss, coalesced)",
+    ["result"]
+)
+CACHE_HIT_RATIO = Gauge(
+    "anime_cache_hit_ratio", "Exact + semantic hits over all cache lookups", multiprocess_mode="liveall"
+)
+
+HTTP_REQUESTS = Counter("anime_http_requests_total", "HTTP requests served", ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "anime_http_request_duration_seconds", "HTTP request latency", ["route"], buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "anime_http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum"
+)
+ADMISSION_ACTIVE = Gauge(
+    "anime_admission_active", "Recommendation requests holding an engine slot", multiprocess_mode="livesum"
+)
+QUEUE_DEPTH = Gauge(
+    "anime_admission_queue_depth", "Recommendation requests waiting for an engine slot",
+    multiprocess_mode="livesum"
+)
+
+QUERY_EMBED_LOOKUPS = Counter(
+    "anime_query_embedding_lookups_total", "Query embeddings by source (cache_hit, coalesced, encoded)",
+    ["result"]
+)
+QUERY_EMBED_BATCH_SIZE = Histogram(
+    "anime_query_embedding_batch_size", "Queries encoded per batched forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+CONTEXT_TOKENS = Counter(
+    "anime_context_tokens_total", "Estimated prompt-context tokens retrieved vs. sent after packing", ["kind"]
+)
+CONTEXT_TOKENS_SAVED = Histogram(
+    "anime_context_tokens_saved", "Estimated context tokens removed by packing per request",
+    buckets=(0, 50, 100, 250, 500, 1000, 2000, 4000)
+)
+
+LLM_HEDGES = Counter(
+    "anime_llm_hedges_total", "Hedged LLM requests by which call produced the first token", ["winner"]
+)
+DEADLINE_EXCEEDED = Counter(
+    "anime_deadline_exceeded_total", "Requests that ran out of deadline, by stage", ["stage"]
+)
+
+INDEX_RELOADS = Counter(
+    "anime_index_reloads_total", "Hot swaps to a new index version, by outcome", ["outcome"]
+)
+
+JIKAN_RESPONSES = Counter(
+    "anime_jikan_responses_total", "Upstream Jikan responses by status (429s and transport errors included)",
+    ["status"]
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Times one recommendation stage; failures are counted instead of observed."""
+    start = time.perf_counter()
+    try:
+        yield
+    except (GeneratorExit, asyncio.CancelledError):
+        raise
+    except BaseException:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    observe_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def track_recommendation(mode: str):
+    """Counts one recommendation request (sync / async / stream) and its latency."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "success"
+    except (GeneratorExit, asyncio.CancelledError):
+        outcome = "cancelled"
+        raise
+    except DeadlineExceeded:
+        outcome = "deadline"
+        raise
+    finally:
+        RECOMMENDATIONS.labels(mode=mode, outcome=outcome).inc()
+        RECOMMENDATION_LATENCY.labels(mode=mode).observe(time.perf_counter() - start)
+
+
+_sampled_gauges = []
+_refresher_pid = None
+
+
+def gauge_function(gauge: Gauge, fn):
+    """
+    Backs a gauge with a callback. Single-process this is `set_function`; in
+    multiprocess mode callbacks are invisible to the aggregated scrape, so each
+    worker copies the value into the shared files every GAUGE_REFRESH_SECONDS.
+    """
+    if not MULTIPROCESS:
+        gauge.set_function(fn)
+        return
+    # A later callback replaces the earlier one (e.g. after a hot-swapped pipeline)
+    _sampled_gauges[:] = [(g, f) for g, f in _sampled_gauges if g is not gauge]
+    _sampled_gauges.append((gauge, fn))
+
+
+def _refresh_gauges():
+    for gauge, fn in _sampled_gauges:
+        try:
+            gauge.set(fn())
+        except Exception:
+            pass
+
+
+def start_gauge_refresher():
+    """Starts the per-process sampler thread (call after fork, once per worker)."""
+    global _refresher_pid
+    if not MULTIPROCESS or _refresher_pid == os.getpid():
+        return
+    _refresher_pid = os.getpid()
+
+    def run():
+        while True:
+            _refresh_gauges()
+            time.sleep(GAUGE_REFRESH_SECONDS)
+
+    threading.Thread(target=run, name="gauge-refresher", daemon=True).start()
+
+
+def render_metrics():
+    """Returns (payload, content_type) for a /metrics response."""
+    if MULTIPROCESS:
+        _refresh_gauges()
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int) -> bool:
+    """
+    Serves /metrics on a side port for processes without their own HTTP API
+    (Streamlit). Safe to call on every script rerun; only the first call binds.
+    """
+    global _server_started
+    if port <= 0:
+        return False
+    with _server_lock:
+        if not _server_started:
+            start_http_server(port)
+            _server_started = True
+    return True
@@ -0,0 +1,75 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_UNLOADED = object()  # never equals a real index version (None is the legacy layout)
+
+
+class PipelineHolder:
+    """
+    The one live pipeline of a process that has no background reloader
+    (Streamlit). `load(index_version)` builds the pipeline the first time a
+    version is asked for; the one it replaces is handed to `retire` as soon as
+    the last `use` block running on it exits, instead of waiting to be
+    garbage-collected with its embedder and retrieval threads still running.
+    """
+
+    def __init__(self, load, retire=None):
+        self.load = load
+        self.retire = retire or (lambda pipeline: pipeline.close())
+
+        self.index_version = _UNLOADED
+        self.pipeline = None
+        self._lock = threading.Lock()
+        self._active = Counter()  # id(pipeline) -> `use` blocks running on it
+        self._retiring = {}       # id(pipeline) -> replaced pipeline still in use
+
+    def get(self, index_version):
+        """Loads (or switches to) `index_version` without holding on to the pipeline."""
+        with self.use(index_version) as pipeline:
+            return pipeline
+
+    @contextmanager
+    def use(self, index_version):
+        """The pipeline for `index_version`; it is not retired while the block runs."""
+        with self._lock:
+            retired = self._switch(index_version)
+            pipeline = self.pipeline
+            self._active[id(pipeline)] += 1
+        self._retire(retired)
+        try:
+            yield pipeline
+        finally:
+            retired = None
+            with self._lock:
+                self._active[id(pipeline)] -= 1
+                if not self._active[id(pipeline)]:
+                    del self._active[id(pipeline)]
+                    retired = self._retiring.pop(id(pipeline), None)
+            self._retire(retired)
+
+    def _switch(self, index_version):
+        """Under the lock: loads a new version; returns the replaced pipeline if nothing uses it."""
+        if index_version == self.index_version:
+            return None
+        # A failed load raises here and keeps serving the previous version
+        pipeline = self.load(index_version)
+        previous, self.pipeline, self.index_version = self.pipeline, pipeline, index_version
+        if previous is None:
+            return None
+        if self._active[id(previous)]:
+            self._retiring[id(previous)] = previous
+            return None
+        return previous
+
+    def _retire(self, pipeline):
+        if pipeline is None:
+            return
+        try:
+            self.retire(pipeline)
+        except Exception as e:
+            logger.error(f"Failed to close a replaced pipeline: {str(e)}")
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class StartupLoader:
+    """
+    Runs named startup phases (title index, imports, model/index load, warmup)
+    in a background thread so the web server can bind immediately.
+
+    Phases run in order; a failing phase is retried with capped exponential
+    backoff, resuming from that phase. `status()` feeds the readiness probe.
+
+    `preload(until)` runs the leading phases synchronously instead (the gunicorn
+    master does this before forking); `start()` then resumes after them.
+    """
+
+    def __init__(self, phases, retry_seconds: float = 5.0, max_retry_seconds: float = 60.0):
+        self.phases = list(phases)
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._started_at = None
+        self._phase = "pending"
+        self._completed = []
+        self._attempt = 0
+        self._error = None
+        self._ready = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def preload(self, until: str) -> bool:
+        """
+        Runs phases in the calling thread up to (not including) `until`. Stops at
+        the first failure without retrying; the background loader resumes there.
+        """
+        self._started_at = self._started_at or time.monotonic()
+        for name, fn in self.phases[len(self._completed):]:
+            if name == until:
+                break
+            self._phase = name
+            self._attempt += 1
+            start = time.monotonic()
+            try:
+                fn()
+            except Exception as e:
+                self._error = f"{name}: {e}"
+                logger.error(f"Preload phase '{name}' failed; workers will retry it: {e}")
+                return False
+            self._record(name, time.monotonic() - start)
+        return True
+
+    def _record(self, name: str, seconds: float):
+        self._completed.append({"phase": name, "seconds": round(seconds, 3)})
+        logger.info(f"Startup phase '{name}' done in {seconds:.2f}s")
+        self._error = None
+
+    def start(self):
+        if self._thread is None:
+            self._started_at = self._started_at or time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="startup-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _run(self):
+        index = len(self._completed)
+        delay = self.retry_seconds
+        while index < len(self.phases) and not self._stop.is_set():
+            name, fn = self.phases[index]
+            self._phase = name
+            self._attempt += 1
+            start = time.monotonic()
+            try:
+                fn()
+            except Exception as e:
+                self._error = f"{name}: {e}"
+                logger.error(f"Startup phase '{name}' failed (retrying in {delay:.0f}s): {e}")
+                if self._stop.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_retry_seconds)
+                continue
+
+            self._record(name, time.monotonic() - start)
+            index += 1
+            delay = self.retry_seconds
+
+        if index == len(self.phases):
+            self._phase = "ready"
+            self._ready.set()
+
+    def status(self) -> dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        return {
+            "ready": self.ready,
+            "phase": self._phase,
+            "completed": list(self._completed),
+            "remaining": [name for name, _ in self.phases[len(self._completed):]],
+            "attempts": self._attempt,
+            "last_error": self._error,
+            "elapsed_seconds": round(elapsed, 3),
+        }
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import time
+
+from utils.atomic_file import write_atomic
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TopListSnapshot:
+    """
+    In-process snapshot of a Jikan ranking, refreshed in the background.
+
+    Reads never wait on Jikan once a copy exists: a stale snapshot is served
+    while a refresh runs (stale-while-revalidate). Every good copy is persisted
+    to disk so a cold start can serve the last one immediately.
+    """
+
+    def __init__(self, name: str, fetch, snapshot_path: str, refresh_interval: float):
+        self.name = name
+        self.fetch = fetch
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.data = None
+        self.updated_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def is_stale(self) -> bool:
+        return time.time() - self.updated_at > self.refresh_interval
+
+    def load_from_disk(self):
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self.data = snapshot["data"]
+            self.updated_at = snapshot["updated_at"]
+            logger.info(f"Loaded {self.name} snapshot from disk ({len(self.data)} items).")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {self.name} snapshot: {e}")
+
+    def _persist(self):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        write_atomic(self.snapshot_path, json.dumps({"data": self.data, "updated_at": self.updated_at}))
+
+    async def refresh(self):
+        if self._refresh_lock.locked():
+            # Someone is already refreshing; just wait for their result
+            async with self._refresh_lock:
+                return
+        async with self._refresh_lock:
+            data = await self.fetch()
+            if not data:
+                raise ValueError(f"Empty {self.name} response from Jikan.")
+            self.data = data
+            self.updated_at = time.time()
+            await asyncio.to_thread(self._persist)  # fsync'd write, kept off the event loop
+            logger.info(f"Refreshed {self.name} snapshot ({len(data)} items).")
+
+    async def _refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"{self.name} refresh failed, keeping last snapshot: {e}")
+
+    async def get(self):
+        if self.data is None:
+            # Nothing to serve yet (first ever start): this one request has to wait
+            await self.refresh()
+        elif self.is_stale and not self._refresh_lock.locked():
+            asyncio.create_task(self._refresh_quietly())
+        return self.data
+
+    async def _run(self):
+        while True:
+            if self.data is None or self.is_stale:
+                await self._refresh_quietly()
+            await asyncio.sleep(max(1.0, self.updated_at + self.refresh_interval - time.time()))
+
+    def start(self):
+        self.load_from_disk()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+async def _fetch_pages(jikan, path: str, pages=(1, 2)):
+    # Both pages are fetched concurrently (the Jikan rate limiter still paces them)
+    responses = await asyncio.gather(*(jikan.get_json(path, {"page": p}) for p in pages))
+    items = []
+    for page_data in responses:
+        items.extend(page_data.get('data', []))
+    return items
+
+
+async def fetch_top_anime(jikan):
+    all_anime = await _fetch_pages(jikan, "/top/anime")
+    final_data = sorted(all_anime, key=lambda x: x.get('rank') or 10**9)[:50]
+    return [
+        {
+            "rank": i + 1,
+            "title": a['title_english'] or a['title'],
+            "score": a['score']
+        } for i, a in enumerate(final_data)
+    ]
+
+
+async def fetch_top_characters(jikan):
+    all_chars = await _fetch_pages(jikan, "/top/characters")
+    return [
+        {
+            "rank": i + 1,
+            "name": c['name'],
+            "anime": c['about'] if 'about' in c else "N/A"
+        } for i, c in enumerate(all_chars[:50])
+    ]